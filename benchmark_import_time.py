@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""导入耗时基准测试：检查启动时的导入耗时是否超出预算，以及按需加载的模块是否被提前导入
+
+每次在新的子进程中用 python -X importtime 导入目标模块，取多次运行的中位数。
+超出预算、目标导入失败或按需加载的模块被提前导入时以退出码1结束，可用于CI
+（本地缺少图形界面依赖时可加 --allow-missing 跳过导入失败的目标）。
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# 目标模块: (说明, 默认预算毫秒)
+TARGETS = {
+    "core.chat_service": ("无界面服务", 300),
+    "main": ("图形界面", 1500),
+}
+
+# 只应在首次使用时导入的模块（导入目标模块后不应出现在sys.modules中）
+LAZY_MODULES = [
+    "flask",
+    "werkzeug",
+    "jieba",
+    "pyttsx3",
+    "pynvml",
+    "psutil",
+    "websocket",
+    "servers.api_server",
+    "servers.main_server",
+    "servers.memory_server",
+    "servers.agent_server",
+    "servers.monitor_server",
+    "communication.chat_ws_client",
+    "core.api_app",
+    "core.external_calls",
+    "core.web_search",
+    "core.port_scanner",
+    "gui.tts",
+    "gui.dashboard",
+    "gui.port_scanner",
+]
+
+# 子进程中执行的代码：导入目标模块后输出已加载的按需模块
+PROBE = """
+import sys
+import {target}
+lazy = {lazy!r}
+print("LOADED=" + ",".join(name for name in lazy if name in sys.modules))
+"""
+
+
+def measure(target):
+    """在新进程中导入一次目标模块
+
+    Args:
+        target: 目标模块名
+
+    Returns:
+        (总耗时毫秒, 最慢的模块列表[(毫秒, 模块名)], 被提前导入的按需模块列表)
+
+    Raises:
+        RuntimeError: 目标模块导入失败（如缺少依赖）
+    """
+    code = PROBE.format(target=target, lazy=LAZY_MODULES)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=PROJECT_ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        error = result.stderr.strip().splitlines()
+        raise RuntimeError(error[-1] if error else f"退出码 {result.returncode}")
+
+    # importtime输出格式: "import time: self [us] | cumulative | imported package"
+    total_us = 0
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|", 2)
+        cumulative = int(cumulative)
+        # 分隔符后的第一个空格之后无缩进的行是顶层导入，其累计耗时之和即为总耗时
+        name = name[1:].rstrip()
+        if not name.startswith(" "):
+            total_us += cumulative
+        modules.append((cumulative / 1000, name.strip()))
+
+    loaded = []
+    for line in result.stdout.splitlines():
+        if line.startswith("LOADED="):
+            loaded = [name for name in line[len("LOADED="):].split(",") if name]
+
+    modules.sort(reverse=True)
+    return total_us / 1000, modules, loaded
+
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="导入耗时基准测试")
+    parser.add_argument("--runs", type=int, default=5, help="每个目标的运行次数（取中位数）")
+    parser.add_argument("--top", type=int, default=10, help="显示最慢的模块数")
+    parser.add_argument("--target", action="append", choices=sorted(TARGETS), help="只测试指定目标（可重复）")
+    parser.add_argument("--allow-missing", action="store_true", help="目标导入失败时跳过而不是判为失败")
+    for target, (_, budget) in TARGETS.items():
+        option = "--budget-" + target.replace(".", "-").replace("_", "-")
+        parser.add_argument(option, type=float, default=budget, dest="budget_" + target.replace(".", "_"),
+                            help=f"{target} 的导入耗时预算（毫秒，默认{budget}）")
+    return parser.parse_args()
+
+
+def main():
+    """主函数"""
+    args = parse_args()
+    failed = False
+
+    for target in args.target or list(TARGETS):
+        description, _ = TARGETS[target]
+        budget = getattr(args, "budget_" + target.replace(".", "_"))
+        print(f"== {target}（{description}）")
+
+        try:
+            # 先导入一次预热，生成.pyc并填充磁盘缓存
+            measure(target)
+            samples = [measure(target) for _ in range(args.runs)]
+        except RuntimeError as e:
+            # 依赖缺失或导入出错视为不通过，除非显式允许跳过
+            if args.allow_missing:
+                print(f"  跳过: 导入失败（{e}）")
+            else:
+                print(f"  失败: 导入失败（{e}）")
+                failed = True
+            continue
+
+        totals = [total for total, _, _ in samples]
+        median = statistics.median(totals)
+        # 展示耗时最接近中位数的一次运行的明细
+        _, modules, loaded = min(samples, key=lambda sample: abs(sample[0] - median))
+
+        status = "通过" if median <= budget else "超出预算"
+        print(f"  导入耗时: 中位数 {median:.1f}ms（最小 {min(totals):.1f}ms，最大 {max(totals):.1f}ms），"
+              f"预算 {budget:.0f}ms - {status}")
+        print(f"  最慢的{args.top}个模块（累计耗时）:")
+        for elapsed, name in modules[:args.top]:
+            print(f"    {elapsed:8.1f}ms  {name}")
+
+        if loaded:
+            print(f"  按需加载的模块被提前导入: {', '.join(loaded)}")
+            failed = True
+        if median > budget:
+            failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""记忆表示的内存基准测试：比较旧版字典表示与按列存放的紧凑表示（UserMemories）占用的内存
+
+用tracemalloc统计构建全部用户记忆时实际分配的内存，并与记忆服务器统计中的估算值（memory_bytes）对比。
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils.memory_columns import UserMemories
+
+
+def make_content(user, index):
+    """生成测试用的记忆内容（每条记忆一个独立的字符串）"""
+    return f"用户{user}的第{index}条记忆：今天讨论了模型部署和上下文长度的设置"
+
+
+def build_legacy(users, memories):
+    """旧版表示：每个用户一个字典列表，每条记忆保存timestamp和格式化的created_at"""
+    store = {}
+    now = time.time()
+    for user in range(users):
+        items = []
+        for index in range(memories):
+            timestamp = now + index
+            items.append({
+                'content': make_content(user, index),
+                'role': 'user',
+                'timestamp': timestamp,
+                'created_at': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp))
+            })
+        store[f"user-{user}"] = items
+    return store
+
+
+def build_columns(users, memories):
+    """紧凑表示：每个用户一个 UserMemories（按列存放）
+
+    Returns:
+        (记忆数据, 按UserMemories.nbytes()估算的字节数)
+    """
+    store = {}
+    now = time.time()
+    memory_id = 0
+    for user in range(users):
+        items = UserMemories()
+        for index in range(memories):
+            memory_id += 1
+            items.append(memory_id, now + index, {'content': make_content(user, index), 'role': 'user'})
+        store[sys.intern(f"user-{user}")] = items
+    return store, sum(items.nbytes() for items in store.values())
+
+
+def measure(build, *args):
+    """统计构建数据时分配的内存
+
+    Returns:
+        (构建结果, 分配的字节数)
+    """
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = build(*args)
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return result, after - before
+
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="记忆表示的内存基准测试")
+    parser.add_argument("--users", type=int, default=200, help="用户数")
+    parser.add_argument("--memories", type=int, default=1000, help="每个用户的记忆数")
+    return parser.parse_args()
+
+
+def main():
+    """主函数"""
+    args = parse_args()
+    total = args.users * args.memories
+    print(f"用户数: {args.users}，每个用户记忆数: {args.memories}，共 {total} 条记忆")
+
+    legacy, legacy_bytes = measure(build_legacy, args.users, args.memories)
+    del legacy
+    (columns, estimated), column_bytes = measure(build_columns, args.users, args.memories)
+    del columns
+
+    print(f"  旧版字典表示: {legacy_bytes / 1024 / 1024:8.1f} MB（每条 {legacy_bytes / total:6.0f} 字节）")
+    print(f"  按列紧凑表示: {column_bytes / 1024 / 1024:8.1f} MB（每条 {column_bytes / total:6.0f} 字节）")
+    print(f"  节省: {(1 - column_bytes / legacy_bytes) * 100:.1f}%")
+    print(f"  memory_bytes估算值: {estimated / 1024 / 1024:8.1f} MB（占实测的 {estimated / column_bytes * 100:.0f}%）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+import websocket
+import json
+import threading
+import queue
+import uuid
+from typing import Optional, Callable, Dict, Any
+
+class ChatWebSocketTransportError(ConnectionError):
+    """WebSocket连接在请求过程中断开或发送失败（与服务器返回的错误区分）"""
+
+    def __init__(self, message: str, request_sent: bool = False):
+        """
+        Args:
+            message: 错误信息
+            request_sent: 请求是否已发出（已发出时对端可能已经开始生成）
+        """
+        super().__init__(message)
+        self.request_sent = request_sent
+
+
+class ChatWebSocketClient:
+    """聊天WebSocket客户端，在一个长连接上通过请求ID复用多个并发聊天请求"""
+
+    def __init__(self, url: str, api_key: str, timeout: int = 60):
+        """
+        初始化聊天WebSocket客户端
+
+        Args:
+            url: WebSocket地址（例如 ws://host:5000/api/chat/ws）
+            api_key: 对端分配的API Key
+            timeout: 建立连接和等待单个回复片段的超时时间（秒）
+        """
+        self.url = url
+        self.api_key = api_key
+        self.timeout = timeout
+        self.ws = None
+        self.connected = False
+        self.connect_lock = threading.Lock()
+        self.send_lock = threading.Lock()
+        # 等待中的请求 {request_id: Queue}
+        self.pending: Dict[str, queue.Queue] = {}
+        self.pending_lock = threading.Lock()
+
+    def connect(self):
+        """建立WebSocket连接（已连接时直接返回）"""
+        with self.connect_lock:
+            if self.connected:
+                return
+
+            separator = '&' if '?' in self.url else '?'
+            self.ws = websocket.create_connection(
+                f"{self.url}{separator}AccessKeyId={self.api_key}",
+                timeout=self.timeout
+            )
+            # 读取线程阻塞等待消息，超时由各请求自行控制
+            self.ws.settimeout(None)
+            self.connected = True
+
+            self.reader_thread = threading.Thread(target=self._read_loop, daemon=True)
+            self.reader_thread.start()
+
+    def _read_loop(self):
+        """读取服务器消息并按请求ID分发"""
+        try:
+            while self.connected:
+                raw = self.ws.recv()
+                if not raw:
+                    break
+                try:
+                    payload = json.loads(raw)
+                except json.JSONDecodeError:
+                    continue
+
+                with self.pending_lock:
+                    result_queue = self.pending.get(payload.get('id'))
+                if result_queue:
+                    result_queue.put(payload)
+        except Exception as e:
+            if self.connected:
+                print(f"聊天WebSocket连接中断: {str(e)}")
+        finally:
+            self._mark_disconnected("WebSocket connection closed")
+
+    def _mark_disconnected(self, reason: str):
+        """标记连接断开，并通知所有等待中的请求"""
+        self.connected = False
+        with self.pending_lock:
+            pending = list(self.pending.values())
+        for result_queue in pending:
+            result_queue.put({'code': 503, 'message': reason, 'data': None, 'closed': True})
+
+    def _send(self, message: Dict[str, Any]):
+        """发送消息（多线程共享同一连接，需串行化）
+
+        Raises:
+            ChatWebSocketTransportError: 连接已断开，发送失败
+        """
+        try:
+            with self.send_lock:
+                self.ws.send(json.dumps(message, ensure_ascii=False))
+        except (websocket.WebSocketException, OSError) as e:
+            # 连接状态由读取线程在读取失败时更新
+            raise ChatWebSocketTransportError(str(e)) from e
+
+    def chat(self, message: str, model: Optional[str] = None,
+             on_chunk: Optional[Callable[[str], None]] = None,
+             timeout: Optional[int] = None) -> str:
+        """发送聊天请求并等待完整回复
+
+        Args:
+            message: 聊天消息
+            model: 模型名称
+            on_chunk: 流式片段回调，提供时请求服务器逐片段返回
+            timeout: 等待单个回复片段的超时时间（秒），默认使用连接超时
+
+        Returns:
+            完整的AI回复
+
+        Raises:
+            TimeoutError: 等待回复超时（已向服务器发送取消请求）
+            ChatWebSocketTransportError: 连接失败或请求过程中连接断开（request_sent表示请求是否已发出）
+            RuntimeError: 服务器返回错误
+        """
+        try:
+            self.connect()
+        except (websocket.WebSocketException, OSError) as e:
+            raise ChatWebSocketTransportError(str(e)) from e
+
+        request_id = uuid.uuid4().hex
+        result_queue = queue.Queue()
+        with self.pending_lock:
+            self.pending[request_id] = result_queue
+
+        try:
+            self._send({
+                'id': request_id,
+                'Message': message,
+                'Model': model,
+                'stream': on_chunk is not None
+            })
+
+            parts = []
+            while True:
+                try:
+                    payload = result_queue.get(timeout=timeout or self.timeout)
+                except queue.Empty:
+                    # 通知服务器停止生成
+                    try:
+                        self._send({'type': 'cancel', 'id': request_id})
+                    except Exception:
+                        pass
+                    raise TimeoutError("WebSocket request timeout")
+
+                if payload.get('closed'):
+                    raise ChatWebSocketTransportError(
+                        payload.get('message', 'WebSocket connection closed'), request_sent=True
+                    )
+                if payload.get('code') != 200:
+                    raise RuntimeError(payload.get('message', 'Unknown error'))
+
+                data = payload.get('data') or {}
+                chunk = data.get('response', '')
+                if data.get('done', True):
+                    return ''.join(parts) + chunk
+
+                parts.append(chunk)
+                if on_chunk:
+                    on_chunk(chunk)
+        finally:
+            with self.pending_lock:
+                self.pending.pop(request_id, None)
+
+    def close(self):
+        """关闭WebSocket连接"""
+        self.connected = False
+        if self.ws:
+            try:
+                self.ws.close()
+            except Exception:
+                pass
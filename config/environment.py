@@ -26,6 +26,12 @@ class EnvironmentConfig:
     CORRECTION_MODEL = "NEKO_CORRECTION_MODEL"
     EMOTION_MODEL = "NEKO_EMOTION_MODEL"
     VISION_MODEL = "NEKO_VISION_MODEL"
+    EMBEDDING_MODEL = "NEKO_EMBEDDING_MODEL"
+    OLLAMA_URL = "NEKO_OLLAMA_URL"
+    
+    # 记忆配置环境变量
+    MEMORY_TTL = "NEKO_MEMORY_TTL"
+    MEMORY_MAX_LOADED = "NEKO_MEMORY_MAX_LOADED"
     
     @classmethod
     def get(cls, key: str, default: Optional[str] = None) -> Optional[str]:
@@ -100,6 +106,12 @@ class EnvironmentConfig:
         env_vars[cls.CORRECTION_MODEL] = cls.get(cls.CORRECTION_MODEL)
         env_vars[cls.EMOTION_MODEL] = cls.get(cls.EMOTION_MODEL)
         env_vars[cls.VISION_MODEL] = cls.get(cls.VISION_MODEL)
+        env_vars[cls.EMBEDDING_MODEL] = cls.get(cls.EMBEDDING_MODEL)
+        env_vars[cls.OLLAMA_URL] = cls.get(cls.OLLAMA_URL)
+        
+        # 记忆配置
+        env_vars[cls.MEMORY_TTL] = cls.get(cls.MEMORY_TTL)
+        env_vars[cls.MEMORY_MAX_LOADED] = cls.get(cls.MEMORY_MAX_LOADED)
         
         return env_vars
     
@@ -159,5 +171,12 @@ class EnvironmentConfig:
                 f.write(f"{cls.CORRECTION_MODEL}={cls.get(cls.CORRECTION_MODEL, '')}\n")
                 f.write(f"{cls.EMOTION_MODEL}={cls.get(cls.EMOTION_MODEL, '')}\n")
                 f.write(f"{cls.VISION_MODEL}={cls.get(cls.VISION_MODEL, '')}\n")
+                f.write(f"{cls.EMBEDDING_MODEL}={cls.get(cls.EMBEDDING_MODEL, '')}\n")
+                f.write(f"{cls.OLLAMA_URL}={cls.get(cls.OLLAMA_URL, '')}\n\n")
+                
+                # 记忆配置
+                f.write("# 记忆配置\n")
+                f.write(f"{cls.MEMORY_TTL}={cls.get(cls.MEMORY_TTL, '')}\n")
+                f.write(f"{cls.MEMORY_MAX_LOADED}={cls.get(cls.MEMORY_MAX_LOADED, '')}\n")
         except Exception as e:
             print(f"保存环境变量文件失败: {str(e)}")
@@ -0,0 +1 @@
+# Core module initialization
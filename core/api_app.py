@@ -0,0 +1,499 @@
+import json
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import flask
+
+from servers.api_server import client_disconnected, release_worker
+from utils.request_scheduler import SchedulerQueueFull, SchedulerTimeout, PRIORITY_API
+from utils.single_flight import FlightAborted
+from utils.worker_pool import RequestCancelled
+
+
+def create_api_app(service):
+    """创建API应用，支持阿里API调用方式"""
+    app = flask.Flask(__name__)
+
+    # IP访问控制
+    service.api_ip_whitelist = []  # IP白名单（可选）
+    service.api_ip_blacklist = []  # IP黑名单
+
+    def rate_limited_response(retry_after):
+        """构造429响应，附带Retry-After头"""
+        response = flask.jsonify({"code": 429, "message": "Too many requests", "data": None})
+        response.status_code = 429
+        response.headers['Retry-After'] = str(retry_after)
+        return response
+
+    def queue_busy_response(error):
+        """排队已满或排队超时时构造429响应"""
+        response = flask.jsonify({"code": 429, "message": str(error), "data": None})
+        response.status_code = 429
+        response.headers['Retry-After'] = "1"
+        return response
+
+    # API认证中间件
+    @app.before_request
+    def authenticate():
+        # 跳过OPTIONS请求
+        if flask.request.method == 'OPTIONS':
+            return
+
+        # 检查IP黑名单
+        client_ip = flask.request.remote_addr
+        if client_ip in service.api_ip_blacklist:
+            return flask.jsonify({"code": 403, "message": "IP address blocked", "data": None}), 403
+
+        # 检查IP白名单（如果启用）
+        if service.api_ip_whitelist and client_ip not in service.api_ip_whitelist:
+            return flask.jsonify({"code": 403, "message": "IP address not allowed", "data": None}), 403
+
+        # 获取API Key（支持多种认证方式）
+        api_key = None
+
+        # 方式1: Bearer token（标准方式）
+        auth_header = flask.request.headers.get('Authorization')
+        if auth_header and auth_header.startswith('Bearer '):
+            api_key = auth_header[7:]
+
+        # 方式2: 阿里API方式（通过公共参数）
+        if not api_key:
+            # 从查询参数或表单获取
+            api_key = flask.request.args.get('AccessKeyId') or flask.request.form.get('AccessKeyId')
+
+        # 方式3: 从JSON请求体获取（阿里API可能的方式）
+        if not api_key:
+            try:
+                data = flask.request.json
+                if data:
+                    api_key = data.get('AccessKeyId')
+            except:
+                pass
+
+        if not api_key:
+            return flask.jsonify({"code": 401, "message": "Missing API Key", "data": None}), 401
+
+        # 验证API Key（索引查找，过期时间已预先解析）
+        api_key_info = service.api_key_index.validate(api_key)
+
+        if api_key_info is None:
+            return flask.jsonify({"code": 401, "message": "Invalid or expired API Key", "data": None}), 401
+
+        # 检查速率限制（按API Key、按IP和全局三级令牌桶）
+        allowed, retry_after = service.rate_limiter.check(api_key, client_ip)
+        if not allowed:
+            return rate_limited_response(retry_after)
+
+        # 记录API调用统计
+        service.record_api_call(api_key)
+
+    def parse_chat_request():
+        """解析聊天请求（支持JSON、表单和查询参数三种格式）
+
+        Returns:
+            (api_key, message, model)
+        """
+        # 获取API Key
+        api_key = None
+
+        # 从请求中获取API Key
+        if flask.request.is_json:
+            data = flask.request.json
+            api_key = data.get('AccessKeyId')
+        if not api_key:
+            api_key = flask.request.args.get('AccessKeyId') or flask.request.form.get('AccessKeyId')
+        if not api_key:
+            auth_header = flask.request.headers.get('Authorization')
+            if auth_header and auth_header.startswith('Bearer '):
+                api_key = auth_header[7:]
+
+        # 解析请求（支持多种格式）
+        message = None
+        model = service.current_model
+
+        # 方式1: 标准JSON格式
+        if flask.request.is_json:
+            data = flask.request.json
+            message = data.get('message') or data.get('Message')  # 支持阿里API的参数名
+            model = data.get('model', service.current_model) or data.get('Model', service.current_model)
+
+        # 方式2: 表单格式（阿里API可能使用）
+        if not message:
+            message = flask.request.form.get('message') or flask.request.form.get('Message')
+            model = flask.request.form.get('model', service.current_model) or flask.request.form.get('Model', service.current_model)
+
+        # 方式3: 查询参数（阿里API可能使用）
+        if not message:
+            message = flask.request.args.get('message') or flask.request.args.get('Message')
+            model = flask.request.args.get('model', service.current_model) or flask.request.args.get('Model', service.current_model)
+
+        return api_key, message, model
+
+    def cache_bypassed():
+        """调用方是否要求跳过回复缓存（Cache-Control: no-cache 或请求参数 cache=false）"""
+        cache_control = flask.request.headers.get('Cache-Control', '').lower()
+        if 'no-cache' in cache_control or 'no-store' in cache_control:
+            return True
+        value = None
+        if flask.request.is_json:
+            data = flask.request.json
+            value = data.get('cache', data.get('Cache'))
+        if value is None:
+            value = flask.request.values.get('cache') or flask.request.values.get('Cache')
+        return value is False or str(value).lower() in ('false', '0', 'no')
+
+    def chat_success(response):
+        """返回阿里API标准格式的聊天结果"""
+        return flask.jsonify({
+            "code": 200,
+            "message": "Success",
+            "data": {
+                "response": response
+            }
+        })
+
+    def run_leader(api_key, request_key, flight, abandoned, fn, *args, **kwargs):
+        """发起者排队占用槽位后把请求交给常驻线程池执行，等待期间定期检查调用方是否放弃
+
+        任务结束（含被取消）时才释放槽位，保证槽位与Ollama实际负载一致；
+        任务函数通过关键字参数cancel_token接收取消令牌，取消时立即中断上游读取。
+
+        Args:
+            abandoned: 返回True时取消任务（如客户端断开、超时）
+
+        Returns:
+            (是否完成, 任务结果)
+
+        Raises:
+            SchedulerQueueFull: 等待队列已满
+            SchedulerTimeout: 排队超时
+        """
+        try:
+            service.request_scheduler.acquire(api_key, PRIORITY_API)
+        except (SchedulerQueueFull, SchedulerTimeout):
+            service.abandon_inflight(request_key, flight)
+            raise
+
+        try:
+            future, cancel_token = service.worker_pool.submit(fn, *args, **kwargs)
+        except Exception:
+            service.request_scheduler.release()
+            service.abandon_inflight(request_key, flight)
+            raise
+
+        def finish_task(_):
+            service.request_scheduler.release()
+            # 任务在开始前被取消时，通知跟随者自行重试
+            service.abandon_inflight(request_key, flight)
+
+        future.add_done_callback(finish_task)
+
+        while True:
+            try:
+                return True, future.result(timeout=0.5)
+            except FutureTimeoutError:
+                if abandoned():
+                    cancel_token.cancel()
+                    return False, None
+
+    # 聊天API端点（支持阿里API格式）
+    @app.route('/api/chat', methods=['POST'])
+    def chat():
+        try:
+            api_key, message, model = parse_chat_request()
+            if not message:
+                return flask.jsonify({"code": 400, "message": "Missing message", "data": None}), 400
+
+            # 占用槽位之前查找缓存，命中时不再联网搜索或排队
+            use_cache = service.response_cache_enabled and not cache_bypassed()
+            request_key = service.chat_request_key(message, model, api_key)
+            if use_cache:
+                cached = service.get_cached_response(message, model, api_key, request_key)
+                if cached is not None:
+                    return chat_success(cached)
+
+            environ = flask.request.environ
+            deadline = time.monotonic() + service.request_timeout
+            # 之后可能长时间跟随相同请求、在调度器中排队或等待生成，让出常驻工作线程，
+            # 由调度器的有界队列（而不是服务器线程池的先进先出队列）决定谁等待
+            release_worker(environ)
+
+            def abandoned():
+                return client_disconnected(environ) or time.monotonic() >= deadline
+
+            # 相同请求正在进行时在本线程跟随其回复，不占用并发槽位和工作线程
+            while True:
+                flight, is_leader = service.join_inflight(request_key)
+                if is_leader:
+                    break
+                try:
+                    response = service.follow_ai_response_sync(flight, message, model, api_key, abandoned)
+                except FlightAborted:
+                    # 发起者在产出任何片段之前放弃，重新加入（可能由本请求发起）
+                    continue
+                if client_disconnected(environ):
+                    return flask.jsonify({"code": 499, "message": "Client closed request", "data": None}), 499
+                if time.monotonic() >= deadline:
+                    return flask.jsonify({"code": 408, "message": "Request timeout", "data": None}), 408
+                return chat_success(response)
+
+            # 只有发起者排队占用槽位；并发已满时排队等待，队列满或等待超时才拒绝
+            try:
+                completed, response = run_leader(
+                    api_key, request_key, flight, abandoned,
+                    service.get_ai_response_sync, message, model, api_key,
+                    use_cache=use_cache, request_key=request_key, flight=flight
+                )
+            except (SchedulerQueueFull, SchedulerTimeout) as e:
+                return queue_busy_response(e)
+
+            if not completed:
+                if client_disconnected(environ):
+                    return flask.jsonify({"code": 499, "message": "Client closed request", "data": None}), 499
+                return flask.jsonify({"code": 408, "message": "Request timeout", "data": None}), 408
+
+            return chat_success(response)
+        except Exception as e:
+            return flask.jsonify({"code": 500, "message": str(e), "data": None}), 500
+
+    # 流式聊天API端点（Server-Sent Events，支持阿里API格式）
+    @app.route('/api/chat/stream', methods=['POST', 'GET'])
+    def chat_stream():
+        try:
+            api_key, message, model = parse_chat_request()
+        except Exception as e:
+            return flask.jsonify({"code": 500, "message": str(e), "data": None}), 500
+        if not message:
+            return flask.jsonify({"code": 400, "message": "Missing message", "data": None}), 400
+
+        def admit():
+            # 只有真正请求Ollama的发起者排队占用槽位，跟随相同请求的不占用
+            service.request_scheduler.acquire(api_key, PRIORITY_API)
+            return service.request_scheduler.release
+
+        try:
+            def sse_event(payload):
+                return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+            def generate():
+                # 生成器结束或关闭时释放槽位
+                chunks = service.stream_ai_response_sync(message, model, api_key, admit=admit)
+                try:
+                    for chunk in chunks:
+                        yield sse_event({
+                            "code": 200,
+                            "message": "Success",
+                            "data": {"response": chunk, "done": False}
+                        })
+                    yield sse_event({
+                        "code": 200,
+                        "message": "Success",
+                        "data": {"response": "", "done": True}
+                    })
+                except (SchedulerQueueFull, SchedulerTimeout) as e:
+                    # 排队已满或排队超时
+                    yield sse_event({"code": 429, "message": str(e), "data": None})
+                except Exception as e:
+                    yield sse_event({"code": 500, "message": str(e), "data": None})
+                finally:
+                    # 客户端提前断开时关闭上游连接，释放Ollama算力
+                    chunks.close()
+
+            # 流式响应持续时间不定，不占用常驻工作线程
+            release_worker(flask.request.environ)
+            response = flask.Response(generate(), mimetype='text/event-stream')
+            response.headers['Cache-Control'] = 'no-cache'
+            response.headers['X-Accel-Buffering'] = 'no'
+            return response
+        except Exception as e:
+            return flask.jsonify({"code": 500, "message": str(e), "data": None}), 500
+
+    # 模型列表API端点（支持阿里API格式）
+    @app.route('/api/models', methods=['GET'])
+    def models():
+        try:
+            models = service.get_available_models(wait=True)
+            # 返回阿里API标准格式
+            return flask.jsonify({
+                "code": 200,
+                "message": "Success",
+                "data": {
+                    "models": models
+                }
+            })
+        except Exception as e:
+            return flask.jsonify({"code": 500, "message": str(e), "data": None}), 500
+
+    # WebSocket聊天API端点（长连接，通过请求ID复用多个并发请求）
+    try:
+        from flask_sock import Sock
+    except ImportError:
+        Sock = None
+
+    if Sock is None:
+        @app.route('/api/chat/ws')
+        def chat_ws():
+            # flask-sock未安装，无法提供WebSocket服务
+            return flask.jsonify({"code": 501, "message": "WebSocket not available, install flask-sock", "data": None}), 501
+    else:
+        sock = Sock(app)
+
+        @sock.route('/api/chat/ws')
+        def chat_ws(ws):
+            # 获取API Key（与认证中间件一致：查询参数AccessKeyId或Bearer token）
+            api_key = flask.request.args.get('AccessKeyId')
+            if not api_key:
+                auth_header = flask.request.headers.get('Authorization')
+                if auth_header and auth_header.startswith('Bearer '):
+                    api_key = auth_header[7:]
+
+            # 验证API Key
+            valid = service.api_key_index.validate(api_key) is not None
+            client_ip = flask.request.remote_addr
+
+            send_lock = threading.Lock()
+            active_requests = {}  # {request_id: threading.Event}
+
+            def send(payload):
+                # 同一连接上的多个请求并发回写，需串行化
+                with send_lock:
+                    ws.send(json.dumps(payload, ensure_ascii=False))
+
+            if not valid:
+                send({"id": None, "code": 401, "message": "Invalid or expired API Key", "data": None})
+                ws.close()
+                return
+
+            def send_chunk(request_id, chunk):
+                send({"id": request_id, "code": 200, "message": "Success",
+                      "data": {"response": chunk, "done": False}})
+
+            def stream_leader(request_id, message, model, stream, request_key, flight, cancel_token=None):
+                # 在常驻线程池中请求Ollama，取消令牌触发时立即中断上游读取
+                parts = []
+                chunks = service.stream_ai_response_sync(
+                    message, model, api_key, cancel_token, request_key=request_key, flight=flight
+                )
+                try:
+                    for chunk in chunks:
+                        parts.append(chunk)
+                        if stream:
+                            send_chunk(request_id, chunk)
+                finally:
+                    chunks.close()
+                return "".join(parts)
+
+            def handle_request(request_id, message, model, stream, cancel_event):
+                # 在请求线程中跟随相同请求或排队，排到槽位后只把发起者的生成交给常驻线程池
+                try:
+                    request_key = service.chat_request_key(message, model, api_key)
+                    response = None
+                    while True:
+                        flight, is_leader = service.join_inflight(request_key)
+                        if is_leader:
+                            break
+                        parts = []
+                        try:
+                            for chunk in service.follow_inflight(flight, message, model, api_key, cancel_event.is_set):
+                                parts.append(chunk)
+                                if stream:
+                                    send_chunk(request_id, chunk)
+                        except FlightAborted:
+                            # 发起者在产出任何片段之前放弃，重新加入（可能由本请求发起）
+                            continue
+                        response = "".join(parts)
+                        break
+
+                    if is_leader:
+                        completed, response = run_leader(
+                            api_key, request_key, flight, cancel_event.is_set,
+                            stream_leader, request_id, message, model, stream, request_key, flight
+                        )
+                        if not completed:
+                            raise RequestCancelled("Request cancelled")
+
+                    if cancel_event.is_set():
+                        raise RequestCancelled("Request cancelled")
+                    send({"id": request_id, "code": 200, "message": "Success",
+                          "data": {"response": "" if stream else response, "done": True}})
+                except RequestCancelled:
+                    try:
+                        send({"id": request_id, "code": 499, "message": "Request cancelled", "data": None})
+                    except Exception:
+                        pass
+                except (SchedulerQueueFull, SchedulerTimeout) as e:
+                    try:
+                        send({"id": request_id, "code": 429, "message": str(e), "data": None})
+                    except Exception:
+                        pass
+                except Exception as e:
+                    try:
+                        send({"id": request_id, "code": 500, "message": str(e), "data": None})
+                    except Exception:
+                        pass
+                finally:
+                    active_requests.pop(request_id, None)
+
+            try:
+                while True:
+                    raw = ws.receive()
+                    if raw is None:
+                        break
+
+                    try:
+                        data = json.loads(raw)
+                    except json.JSONDecodeError:
+                        send({"id": None, "code": 400, "message": "Invalid JSON", "data": None})
+                        continue
+
+                    request_id = data.get('id')
+                    message_type = data.get('type', 'chat')
+
+                    if message_type == 'ping':
+                        send({"id": request_id, "type": "pong", "code": 200, "message": "Success", "data": None})
+                        continue
+
+                    if message_type == 'cancel':
+                        cancel_event = active_requests.get(request_id)
+                        if cancel_event:
+                            cancel_event.set()
+                        continue
+
+                    message = data.get('message') or data.get('Message')
+                    model = data.get('model') or data.get('Model') or service.current_model
+                    if not message:
+                        send({"id": request_id, "code": 400, "message": "Missing message", "data": None})
+                        continue
+
+                    # 限制同一连接上同时进行的请求数
+                    if len(active_requests) >= service.api_ws_max_inflight:
+                        send({"id": request_id, "code": 429, "message": "Too many concurrent requests on this connection",
+                              "data": None})
+                        continue
+
+                    # 同一连接上的每个请求都计入速率限制
+                    allowed, retry_after = service.rate_limiter.check(api_key, client_ip)
+                    if not allowed:
+                        send({"id": request_id, "code": 429, "message": "Too many requests",
+                              "data": {"retry_after": retry_after}})
+                        continue
+
+                    # 记录API调用统计
+                    service.record_api_call(api_key)
+
+                    cancel_event = threading.Event()
+                    active_requests[request_id] = cancel_event
+                    threading.Thread(
+                        target=handle_request,
+                        args=(request_id, message, model, bool(data.get('stream')), cancel_event),
+                        daemon=True
+                    ).start()
+            except Exception as e:
+                print(f"WebSocket聊天连接关闭: {str(e)}")
+            finally:
+                # 连接断开，取消该连接上所有未完成的请求
+                for cancel_event in list(active_requests.values()):
+                    cancel_event.set()
+
+    return app
@@ -0,0 +1,1469 @@
+import threading
+import time
+import json
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta
+import configparser
+from collections import deque
+
+from config.environment import EnvironmentConfig
+from utils.http_client import PooledHttpClient
+from utils.api_key_index import ApiKeyIndex
+from utils.stats_store import ApiKeyStatsStore
+from utils.rate_limiter import RateLimiter
+from utils.request_scheduler import FairRequestScheduler, SchedulerQueueFull, SchedulerTimeout
+from utils.worker_pool import WorkerPool, RequestCancelled
+from utils.session_store import SessionStore
+from utils.context_builder import ContextBuilder, parse_model_budgets, format_model_budgets
+from utils.summarizer import ConversationSummarizer, build_summary_messages, summary_context_message
+from utils.response_cache import ResponseCache
+from utils.single_flight import SingleFlight, FlightAborted
+from utils.model_manager import ModelResidencyManager
+from utils.backend_pool import OllamaBackendPool
+from utils.model_catalog import ModelCatalog
+
+
+class ChatService:
+    """Ollama Chat Client的非界面部分：配置、对话请求、API服务、向外调用、MCP Router和NOKE服务器
+
+    不依赖customtkinter，既作为OllamaChatGUI的基类，也可以由无界面入口（start_headless.py）单独运行。
+    """
+
+    def __init__(self):
+        # Ollama配置
+        self.base_url = "http://localhost:11434"  # Ollama默认地址
+        # 共享的HTTP连接池（所有Ollama和向外调用的HTTP请求复用keep-alive连接）
+        self.http_pool_size = 10  # 每个主机的最大保持连接数
+        self.http_max_retries = 2  # 连接失败重试次数
+        self.http_connect_timeout = 5  # 连接超时时间（秒）
+        self.http = PooledHttpClient(
+            pool_size=self.http_pool_size,
+            max_retries=self.http_max_retries,
+            connect_timeout=self.http_connect_timeout
+        )
+        # 多个Ollama后端的负载均衡（base_url为主后端，backend_urls为其他后端）
+        self.ollama_backend_urls = []
+        self.backend_routing = "least_loaded"  # 路由策略：least_loaded / affinity
+        self.backend_max_failures = 3  # 连续失败多少次后暂时剔除后端
+        self.backend_eject_time = 30  # 剔除时长（秒）
+        self.backend_health_interval = 15  # 健康检查间隔（秒）
+        self.backends = OllamaBackendPool(
+            self.http,
+            self._ollama_urls(),
+            strategy=self.backend_routing,
+            max_failures=self.backend_max_failures,
+            eject_time=self.backend_eject_time,
+            health_interval=self.backend_health_interval
+        )
+        # 模型驻留管理（启动时预加载默认模型，热模型用较长的keep_alive常驻，内存紧张时卸载冷模型）
+        self.model_keep_alive = "5m"  # 普通模型的keep_alive
+        self.model_pin_keep_alive = "60m"  # 当前模型和最近使用的模型的keep_alive
+        self.preload_default_model = True
+        self.model_manager = ModelResidencyManager(
+            self.http,
+            lambda: self.base_url,
+            keep_alive=self.model_keep_alive,
+            pin_keep_alive=self.model_pin_keep_alive
+        )
+        # 模型目录：缓存模型列表，过期后在后台刷新，列表变化时通知下拉框
+        self.model_list_ttl = 60  # 模型列表缓存有效期（秒）
+        self.model_catalog = ModelCatalog(
+            self.backends.list_model_entries,
+            ttl=self.model_list_ttl,
+            fallback=["llama2", "mistral", "codellama"]  # 默认模型列表
+        )
+        # 启动时不访问网络，先使用默认列表，窗口创建后在后台获取
+        self._cached_models = self.model_catalog.models
+        self.current_model = self._cached_models[0]
+
+        # API服务配置
+        self.api_server_enabled = False
+        self.api_server_port = 5000
+        try:
+            self.api_keys = self.load_api_keys()
+        except Exception as e:
+            print(f"加载API密钥失败: {str(e)}")
+            self.api_keys = []
+        # API Key索引（O(1)认证查找，后台定期移除过期Key）
+        self.api_key_index = ApiKeyIndex(sweep_interval=60)
+        self.api_key_index.rebuild(self.api_keys)
+        self.api_key_index.start_sweeper()
+        self.api_server = None
+        self.api_http_server = None  # 运行API应用的WSGI服务器
+        # API服务运行参数（可在config.ini的[Performance]中配置）
+        self.api_server_workers = 8  # 工作线程数
+        self.api_server_max_queue = 32  # 最大排队请求数
+        self.api_server_max_streams = 64  # WebSocket、流式响应和排队中的请求最多占用的额外线程数
+        self.api_ws_max_inflight = 8  # 每个WebSocket连接同时进行的最多请求数
+        self.api_server_keepalive_timeout = 15  # keep-alive空闲超时（秒）
+        self.api_server_shutdown_timeout = 10  # 优雅停止等待时间（秒）
+        # API速率限制（每分钟请求数，0表示不限制）
+        self.api_rate_limit_per_key = 100  # 每个API Key
+        self.api_rate_limit_per_ip = 200  # 每个IP
+        self.api_rate_limit_global = 1000  # 全局
+        self.api_rate_limit_burst = 20  # 每个API Key/IP允许的突发请求数
+        self.rate_limiter = RateLimiter(
+            per_key=self.api_rate_limit_per_key,
+            per_ip=self.api_rate_limit_per_ip,
+            global_limit=self.api_rate_limit_global,
+            burst=self.api_rate_limit_burst
+        )
+        self.mcp_rate_limiter = RateLimiter(
+            per_key=0,
+            per_ip=self.api_rate_limit_per_ip,
+            global_limit=self.api_rate_limit_global,
+            burst=self.api_rate_limit_burst
+        )
+        # API Key调用统计（内存中累计，后台线程批量写盘）
+        self.api_key_stats_store = ApiKeyStatsStore(self.get_app_data_path("api_key_stats.json"))
+        self.api_key_stats_store.start()
+        
+        # 向外调用配置
+        self.external_calls = []  # 向外调用配置列表
+        try:
+            self.external_calls = self.load_external_calls()
+        except Exception as e:
+            print(f"加载向外调用配置失败: {str(e)}")
+            self.external_calls = []
+        # 向外调用服务状态
+        self.external_call_enabled = False
+        # 向外调用WebSocket长连接 {(ws_url, api_key): ChatWebSocketClient}
+        self.external_ws_clients = {}
+        self.external_ws_lock = threading.Lock()
+        # 不支持WebSocket的对端 {ws_url: 失败时间}，在重试间隔内直接使用HTTP
+        self.external_ws_unsupported = {}
+        self.external_ws_retry_interval = 300
+        
+        # MCP Router配置
+        self.mcp_router_enabled = False
+        self.mcp_router_port = 8000
+        self.mcp_router = None
+
+        # 对话历史管理
+        self.max_history_rounds = 20  # 最大对话轮数
+        # 为每个API Key创建独立的会话（会话内加锁提交，读取历史快照无需加锁）
+        self.sessions = SessionStore(max_messages=self.max_history_rounds)
+        # 全局对话历史（用于GUI）
+        self.conversation_history = deque(maxlen=self.max_history_rounds)
+        # 按token预算装入历史（默认预算，以及按模型覆盖的预算）
+        self.context_token_budget = 3072
+        self.context_model_budgets = {}
+        self.context_builder = ContextBuilder(self.context_token_budget, self.context_model_budgets)
+        # 滚动摘要：移出历史的旧对话在后台合并为摘要（摘要模型为空时依次使用NEKO_SUMMARY_MODEL、对话模型）
+        self.summary_enabled = True
+        self.summary_model = ""
+        self.summarizer = ConversationSummarizer(self._summarize_turns)
+        self.summarizer.start()
+
+        # API请求处理配置
+        self.max_concurrent_requests = 5  # 最大并发请求数
+        self.request_timeout = 60  # 请求超时时间（秒）
+        # 控制台对话是否使用流式输出（逐token显示）
+        self.stream_response = True
+        self.max_queue_size = 50  # 并发已满时最多排队的请求数
+        self.max_queue_wait = 30  # 最长排队时间（秒）
+        # 请求队列控制：有界等待队列，GUI优先，同级按API Key轮询
+        self.request_scheduler = FairRequestScheduler(
+            capacity=self.max_concurrent_requests,
+            max_queue=self.max_queue_size,
+            max_wait=self.max_queue_wait
+        )
+        # 常驻工作线程池：执行同步API请求，超时或调用方断开时取消上游调用
+        self.worker_pool = WorkerPool(self.max_concurrent_requests)
+        # 合并同时进行的相同请求（只向Ollama发送一次，其余请求跟随其回复）
+        self.coalesce_requests = True
+        self.inflight_requests = SingleFlight()
+        # AI回复缓存（默认关闭，只适合确定性/幂等的请求，可按请求跳过）
+        self.response_cache_enabled = False
+        self.response_cache_ttl = 300  # 缓存有效期（秒）
+        self.response_cache_max_entries = 256  # 最多缓存条数
+        self.response_cache_max_mb = 16  # 缓存总大小上限（MB）
+        self.response_cache = ResponseCache(
+            max_entries=self.response_cache_max_entries,
+            max_bytes=self.response_cache_max_mb * 1024 * 1024,
+            ttl=self.response_cache_ttl
+        )
+
+        # 内存管理配置
+        self.memory_check_interval = 300  # 内存检查间隔（秒）- 增加间隔减少资源占用
+        self.max_memory_usage = 85  # 最大内存使用率
+        # GPU内存管理配置
+        self.gpu_memory_check_enabled = False  # 禁用GPU内存监控以减少资源占用
+        
+        # 服务器实例
+        self.servers = {
+            'main': None,
+            'memory': None,
+            'agent': None,
+            'monitor': None
+        }
+        
+        self.max_gpu_memory_usage = 80  # 最大GPU内存使用率
+        # 启动内存监控线程
+        self.memory_monitor_thread = threading.Thread(target=self.monitor_memory, daemon=True)
+        self.memory_monitor_thread.start()
+
+    def apply_config(self):
+        """按配置重新初始化依赖配置的组件（加载配置后调用）"""
+        # 按配置调整HTTP连接池
+        self.http.configure(
+            pool_size=self.http_pool_size,
+            max_retries=self.http_max_retries,
+            connect_timeout=self.http_connect_timeout,
+            read_timeout=self.request_timeout
+        )
+        # 按配置调整速率限制
+        self.rate_limiter.configure(
+            self.api_rate_limit_per_key,
+            self.api_rate_limit_per_ip,
+            self.api_rate_limit_global,
+            burst=self.api_rate_limit_burst
+        )
+        self.mcp_rate_limiter.configure(
+            0,
+            self.api_rate_limit_per_ip,
+            self.api_rate_limit_global,
+            burst=self.api_rate_limit_burst
+        )
+        # 按配置调整请求调度器
+        self.request_scheduler.max_queue = self.max_queue_size
+        self.request_scheduler.max_wait = self.max_queue_wait
+        self.request_scheduler.resize(self.max_concurrent_requests)
+        self.worker_pool.resize(self.max_concurrent_requests)
+        # 按配置调整回复缓存
+        self.response_cache.configure(
+            self.response_cache_max_entries,
+            self.response_cache_max_mb * 1024 * 1024,
+            self.response_cache_ttl
+        )
+        # 重新初始化全局对话历史
+        self.conversation_history = deque(maxlen=self.max_history_rounds)
+        self.sessions.resize(self.max_history_rounds)
+        self.context_builder.configure(self.context_token_budget, self.context_model_budgets)
+        # 按配置调整Ollama后端池，并启动后台健康检查
+        self.backends.configure(
+            self._ollama_urls(),
+            strategy=self.backend_routing,
+            max_failures=self.backend_max_failures,
+            eject_time=self.backend_eject_time,
+            health_interval=self.backend_health_interval
+        )
+        self.backends.start()
+        self.model_catalog.ttl = self.model_list_ttl
+        # 按配置调整模型驻留，并在后台预加载默认模型，避免首个请求等待模型加载
+        self.model_manager.configure(self.model_keep_alive, self.model_pin_keep_alive)
+        self.model_manager.set_primary(self.current_model)
+        if self.preload_default_model:
+            self.model_manager.preload_async(self.current_model)
+
+    def add_message(self, sender, name, message):
+        """输出系统消息（无界面时打印到控制台，界面中由OllamaChatGUI显示在对话框）"""
+        print(f"[{name}] {message}")
+
+    def log_server_message(self, message):
+        """记录NOKE服务器日志（界面中同时写入服务器日志框）"""
+        print(f"[{time.strftime('%H:%M:%S')}] {message}")
+
+    def _ollama_urls(self):
+        """所有Ollama后端地址（主后端在前）"""
+        return [self.base_url] + [url for url in self.ollama_backend_urls if url != self.base_url]
+
+    def get_available_models(self, wait=False):
+        """获取可用的Ollama模型（合并所有后端的模型）
+
+        返回模型目录中缓存的列表，过期时在后台刷新；wait为True且从未获取成功时同步获取一次。
+        """
+        return self.model_catalog.get(wait=wait)
+
+    def pull_model(self, model_name):
+        """拉取模型（拉取到所有可用的后端，任一后端成功即视为成功）"""
+        data = {
+            "name": model_name
+        }
+        backends = self.backends.available()
+        output = []
+        succeeded = False
+        for backend in backends:
+            if len(backends) > 1:
+                output.append(f"[{backend.url}]")
+            try:
+                # 发送请求
+                response = self.http.post(f"{backend.url}/api/pull", json=data, stream=True, timeout=300)
+                
+                if response.status_code == 200:
+                    # 处理流式响应
+                    for line in response.iter_lines():
+                        if not line:
+                            continue
+                        try:
+                            status = json.loads(line)
+                        except ValueError:
+                            continue
+                        if 'status' in status:
+                            output.append(status['status'])
+                            if 'digest' in status:
+                                output.append(f"  进度: {status.get('completed', 0)}/{status.get('total', 0)}")
+                    succeeded = True
+                else:
+                    output.append(f"HTTP错误: {response.status_code}")
+            except Exception as e:
+                output.append(str(e))
+        
+        if not backends:
+            return False, "没有可用的Ollama后端"
+        return succeeded, "\n".join(output)
+
+    def load_config(self):
+        """从文件加载配置"""
+        # 优先从config.ini加载配置
+        config_ini_path = self.get_app_data_path("config.ini")
+        config_json_path = self.get_app_data_path("config.json")
+        
+        try:
+            # 加载config.ini
+            if os.path.exists(config_ini_path):
+                # 创建一个自定义的ConfigParser，忽略值中的注释
+                class ConfigParserWithComments(configparser.ConfigParser):
+                    def get(self, section, option, *, raw=False, vars=None, fallback=configparser._UNSET):
+                        value = super().get(section, option, raw=raw, vars=vars, fallback=fallback)
+                        # 去除注释部分
+                        if isinstance(value, str):
+                            value = value.split('#')[0].strip()
+                        return value
+                    
+                    def getint(self, section, option, *, raw=False, vars=None, fallback=configparser._UNSET):
+                        value = self.get(section, option, raw=raw, vars=vars, fallback=fallback)
+                        if value != configparser._UNSET:
+                            try:
+                                return int(value)
+                            except ValueError:
+                                return fallback
+                        return fallback
+                    
+                    def getboolean(self, section, option, *, raw=False, vars=None, fallback=configparser._UNSET):
+                        value = self.get(section, option, raw=raw, vars=vars, fallback=fallback)
+                        if value != configparser._UNSET:
+                            if isinstance(value, str):
+                                value = value.lower()
+                                return value in ('true', '1', 'yes', 'on')
+                            return bool(value)
+                        return fallback
+                
+                config = ConfigParserWithComments()
+                config.read(config_ini_path, encoding="utf-8")
+                
+                # 服务器配置
+                if config.has_section("Server"):
+                    self.api_server_enabled = config.getboolean("Server", "enable_api_server", fallback=False)
+                    self.api_server_port = config.getint("Server", "api_server_port", fallback=5000)
+                
+                # Ollama配置
+                if config.has_section("Ollama"):
+                    self.base_url = config.get("Ollama", "base_url", fallback="http://localhost:11434")
+                    default_model = config.get("Ollama", "default_model", fallback="llama2")
+                    if default_model:
+                        self.current_model = default_model
+                    self.model_keep_alive = config.get("Ollama", "keep_alive", fallback="5m")
+                    self.model_pin_keep_alive = config.get("Ollama", "pin_keep_alive", fallback="60m")
+                    self.preload_default_model = config.getboolean("Ollama", "preload_default_model", fallback=True)
+                    backend_urls = config.get("Ollama", "backend_urls", fallback="")
+                    self.ollama_backend_urls = [url.strip() for url in backend_urls.split(",") if url.strip()]
+                    self.backend_routing = config.get("Ollama", "routing", fallback="least_loaded")
+                    self.backend_max_failures = config.getint("Ollama", "backend_max_failures", fallback=3)
+                    self.backend_eject_time = config.getint("Ollama", "backend_eject_time", fallback=30)
+                    self.backend_health_interval = config.getint("Ollama", "health_check_interval", fallback=15)
+                    self.model_list_ttl = config.getint("Ollama", "model_list_ttl", fallback=60)
+                
+                # API配置
+                if config.has_section("API"):
+                    self.use_api_key = config.getboolean("API", "enable_external_api", fallback=False)
+                    self.api_base_url = config.get("API", "external_api_base_url", fallback="https://api.openai.com/v1")
+                
+                # 性能配置
+                if config.has_section("Performance"):
+                    self.max_concurrent_requests = config.getint("Performance", "max_concurrent_requests", fallback=5)
+                    self.request_timeout = config.getint("Performance", "request_timeout", fallback=60)
+                    self.max_queue_size = config.getint("Performance", "max_queue_size", fallback=50)
+                    self.max_queue_wait = config.getint("Performance", "max_queue_wait", fallback=30)
+                    self.coalesce_requests = config.getboolean("Performance", "coalesce_requests", fallback=True)
+                    self.response_cache_enabled = config.getboolean("Performance", "response_cache_enabled", fallback=False)
+                    self.response_cache_ttl = config.getint("Performance", "response_cache_ttl", fallback=300)
+                    self.response_cache_max_entries = config.getint("Performance", "response_cache_max_entries", fallback=256)
+                    self.response_cache_max_mb = config.getint("Performance", "response_cache_max_mb", fallback=16)
+                    self.stream_response = config.getboolean("Performance", "stream_response", fallback=True)
+                    self.http_pool_size = config.getint("Performance", "http_pool_size", fallback=10)
+                    self.http_max_retries = config.getint("Performance", "http_max_retries", fallback=2)
+                    self.http_connect_timeout = config.getint("Performance", "http_connect_timeout", fallback=5)
+                    self.api_server_workers = config.getint("Performance", "api_server_workers", fallback=8)
+                    self.api_server_max_queue = config.getint("Performance", "api_server_max_queue", fallback=32)
+                    self.api_server_max_streams = config.getint("Performance", "api_server_max_streams", fallback=64)
+                    self.api_ws_max_inflight = config.getint("Performance", "api_ws_max_inflight", fallback=8)
+                    self.api_server_keepalive_timeout = config.getint("Performance", "api_server_keepalive_timeout", fallback=15)
+                    self.api_server_shutdown_timeout = config.getint("Performance", "api_server_shutdown_timeout", fallback=10)
+                    self.api_rate_limit_per_key = config.getint("Performance", "api_rate_limit_per_key", fallback=100)
+                    self.api_rate_limit_per_ip = config.getint("Performance", "api_rate_limit_per_ip", fallback=200)
+                    self.api_rate_limit_global = config.getint("Performance", "api_rate_limit_global", fallback=1000)
+                    self.api_rate_limit_burst = config.getint("Performance", "api_rate_limit_burst", fallback=20)
+                    self.max_history_rounds = config.getint("Performance", "max_history_rounds", fallback=20)
+                    self.summary_enabled = config.getboolean("Performance", "summary_enabled", fallback=True)
+                    self.summary_model = config.get("Performance", "summary_model", fallback="")
+                    self.context_token_budget = config.getint("Performance", "context_token_budget", fallback=3072)
+                    self.context_model_budgets = parse_model_budgets(config.get("Performance", "context_model_budgets", fallback=""))
+                    self.memory_check_interval = config.getint("Performance", "memory_check_interval", fallback=60)
+                    self.max_memory_usage = config.getint("Performance", "max_memory_usage", fallback=80)
+                    # GPU内存管理配置
+                    self.gpu_memory_check_enabled = config.getboolean("Performance", "gpu_memory_check_enabled", fallback=True)
+                    self.max_gpu_memory_usage = config.getint("Performance", "max_gpu_memory_usage", fallback=80)
+            
+            # 从config.json加载（保持向后兼容）
+            elif os.path.exists(config_json_path):
+                with open(config_json_path, "r", encoding="utf-8") as f:
+                    config = json.load(f)
+                    self.api_server_enabled = config.get("api_server_enabled", False)
+                    self.api_server_port = config.get("api_server_port", 5000)
+                    if "current_model" in config:
+                        self.current_model = config["current_model"]
+        except Exception as e:
+            print(f"加载配置失败: {e}")
+
+    def save_config(self):
+        """保存配置到文件"""
+        config_ini_path = self.get_app_data_path("config.ini")
+        try:
+            config = configparser.ConfigParser()
+            
+            # 读取现有配置
+            if os.path.exists(config_ini_path):
+                config.read(config_ini_path, encoding="utf-8")
+            
+            # 更新配置
+            if not config.has_section("Server"):
+                config.add_section("Server")
+            config.set("Server", "enable_api_server", str(self.api_server_enabled))
+            config.set("Server", "api_server_port", str(self.api_server_port))
+            
+            if not config.has_section("Ollama"):
+                config.add_section("Ollama")
+            config.set("Ollama", "base_url", self.base_url)
+            config.set("Ollama", "default_model", self.current_model)
+            config.set("Ollama", "keep_alive", self.model_keep_alive)
+            config.set("Ollama", "pin_keep_alive", self.model_pin_keep_alive)
+            config.set("Ollama", "preload_default_model", str(self.preload_default_model))
+            config.set("Ollama", "backend_urls", ", ".join(self.ollama_backend_urls))
+            config.set("Ollama", "routing", self.backend_routing)
+            config.set("Ollama", "backend_max_failures", str(self.backend_max_failures))
+            config.set("Ollama", "backend_eject_time", str(self.backend_eject_time))
+            config.set("Ollama", "health_check_interval", str(self.backend_health_interval))
+            config.set("Ollama", "model_list_ttl", str(self.model_list_ttl))
+            
+            if not config.has_section("Performance"):
+                config.add_section("Performance")
+            config.set("Performance", "max_concurrent_requests", str(self.max_concurrent_requests))
+            config.set("Performance", "request_timeout", str(self.request_timeout))
+            config.set("Performance", "max_queue_size", str(self.max_queue_size))
+            config.set("Performance", "max_queue_wait", str(self.max_queue_wait))
+            config.set("Performance", "coalesce_requests", str(self.coalesce_requests))
+            config.set("Performance", "response_cache_enabled", str(self.response_cache_enabled))
+            config.set("Performance", "response_cache_ttl", str(self.response_cache_ttl))
+            config.set("Performance", "response_cache_max_entries", str(self.response_cache_max_entries))
+            config.set("Performance", "response_cache_max_mb", str(self.response_cache_max_mb))
+            config.set("Performance", "stream_response", str(self.stream_response))
+            config.set("Performance", "http_pool_size", str(self.http_pool_size))
+            config.set("Performance", "http_max_retries", str(self.http_max_retries))
+            config.set("Performance", "http_connect_timeout", str(self.http_connect_timeout))
+            config.set("Performance", "api_server_workers", str(self.api_server_workers))
+            config.set("Performance", "api_server_max_queue", str(self.api_server_max_queue))
+            config.set("Performance", "api_server_max_streams", str(self.api_server_max_streams))
+            config.set("Performance", "api_ws_max_inflight", str(self.api_ws_max_inflight))
+            config.set("Performance", "api_server_keepalive_timeout", str(self.api_server_keepalive_timeout))
+            config.set("Performance", "api_server_shutdown_timeout", str(self.api_server_shutdown_timeout))
+            config.set("Performance", "api_rate_limit_per_key", str(self.api_rate_limit_per_key))
+            config.set("Performance", "api_rate_limit_per_ip", str(self.api_rate_limit_per_ip))
+            config.set("Performance", "api_rate_limit_global", str(self.api_rate_limit_global))
+            config.set("Performance", "api_rate_limit_burst", str(self.api_rate_limit_burst))
+            config.set("Performance", "max_history_rounds", str(self.max_history_rounds))
+            config.set("Performance", "summary_enabled", str(self.summary_enabled))
+            config.set("Performance", "summary_model", self.summary_model)
+            config.set("Performance", "context_token_budget", str(self.context_token_budget))
+            config.set("Performance", "context_model_budgets", format_model_budgets(self.context_model_budgets))
+            config.set("Performance", "memory_check_interval", str(self.memory_check_interval))
+            config.set("Performance", "max_memory_usage", str(self.max_memory_usage))
+            config.set("Performance", "gpu_memory_check_enabled", str(self.gpu_memory_check_enabled))
+            config.set("Performance", "max_gpu_memory_usage", str(self.max_gpu_memory_usage))
+            
+            # 保存配置
+            with open(config_ini_path, "w", encoding="utf-8") as f:
+                config.write(f)
+        except Exception as e:
+            print(f"保存配置失败: {e}")
+
+    def get_app_data_path(self, filename):
+        """获取应用程序数据文件的正确路径（兼容打包后的环境）"""
+        if getattr(sys, 'frozen', False):
+            # 如果是打包后的可执行文件，使用可执行文件所在目录
+            base_path = os.path.dirname(sys.executable)
+        else:
+            # 开发环境，使用项目根目录（本文件位于core目录下）
+            base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        return os.path.join(base_path, filename)
+
+    def load_api_keys(self):
+        """加载API Keys"""
+        api_keys_path = self.get_app_data_path("api_keys.json")
+        try:
+            if os.path.exists(api_keys_path):
+                with open(api_keys_path, "r", encoding="utf-8") as f:
+                    return json.load(f)
+        except Exception as e:
+            print(f"加载API Keys失败: {e}")
+        return []
+
+    def save_api_keys(self):
+        """保存API Keys"""
+        api_keys_path = self.get_app_data_path("api_keys.json")
+        try:
+            with open(api_keys_path, "w", encoding="utf-8") as f:
+                json.dump(self.api_keys, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            print(f"保存API Keys失败: {e}")
+        # Key列表已变更，重建认证索引
+        self.api_key_index.rebuild(self.api_keys)
+
+    def create_api_app(self):
+        """创建API应用，支持阿里API调用方式（首次调用时才导入flask等API依赖）"""
+        from core.api_app import create_api_app
+        return create_api_app(self)
+
+    def _prepare_chat_messages(self, message, model, api_key=None):
+        """准备同步/流式对话请求：联网搜索，并基于对话历史快照按token预算构建消息
+
+        Returns:
+            (user_message, messages_snapshot)
+        """
+        # 检查是否启用联网搜索
+        # API Key远程调用默认启用联网搜索
+        use_web_search = (hasattr(self, 'web_search_var') and self.web_search_var.get()) or api_key is not None
+        search_results = []
+        
+        if use_web_search:
+            # 执行联网搜索
+            print(f"执行联网搜索: {message}")
+            search_results = self.perform_web_search(message)
+            
+            if search_results:
+                print(f"联网搜索完成，获取到 {len(search_results)} 条相关结果")
+            else:
+                print("联网搜索无结果，将基于本地知识回答")
+
+        # 用户消息暂不写入历史，待回复完成后与AI回复一起提交
+        user_message = self._fit_user_message(message, model)
+
+        # 如果有搜索结果，构建增强的消息
+        extra_messages = []
+        if search_results:
+            search_summary = "\n".join(search_results)
+            # 创建一个系统消息，包含搜索结果
+            extra_messages.append({
+                "role": "system",
+                "content": f"基于以下搜索结果，回答用户的问题：\n\n{search_summary}\n\n请综合搜索结果和你的知识，提供一个全面、准确的回答。"
+            })
+
+        # 构建请求时对历史做快照，API Key会话的快照为不可变元组，读取无需加锁
+        summary_messages = []
+        if api_key:
+            session = self.sessions.peek(api_key)
+            history = session.history if session is not None else ()
+            # 已移出历史的旧对话以摘要形式放在最前面
+            if session is not None and session.summary:
+                summary_messages.append(summary_context_message(session.summary))
+        else:
+            history = list(self.conversation_history)
+
+        # 按模型的token预算从最近的对话往前装入
+        messages_snapshot = self.context_builder.build(
+            history, user_message, model, prefix=summary_messages, suffix=extra_messages
+        )
+
+        return user_message, messages_snapshot
+
+    def _fit_user_message(self, message, model):
+        """构造本轮的用户消息（单条消息超出整个上下文预算时截断）"""
+        return self.context_builder.fit_message({
+            "role": "user",
+            "content": message
+        }, model)
+
+    def chat_request_key(self, message, model, api_key=None):
+        """根据模型、对话历史（含摘要）和原始用户消息计算请求键
+
+        不包含联网搜索结果，在搜索和占用并发槽位之前即可计算，用于回复缓存。
+        键包含该API密钥的会话历史，每次回复后历史都会变化，因此同一密钥重复发送
+        相同消息不会命中缓存；命中只发生在对话状态完全相同时（如各密钥的首轮对话）。
+        """
+        messages = []
+        if api_key:
+            session = self.sessions.peek(api_key)
+            if session is not None:
+                if session.summary:
+                    messages.append(summary_context_message(session.summary))
+                messages.extend(session.history)
+        else:
+            messages.extend(self.conversation_history)
+        messages.append({"role": "user", "content": message})
+        return ResponseCache.make_key(model, messages)
+
+    def get_cached_response(self, message, model, api_key=None, request_key=None):
+        """在联网搜索和占用并发槽位之前查找缓存的回复，命中时直接提交本轮对话
+
+        Returns:
+            缓存的回复，未命中时返回None
+        """
+        if request_key is None:
+            request_key = self.chat_request_key(message, model, api_key)
+        cached = self.response_cache.get(request_key)
+        if cached is not None:
+            self._commit_chat_turn(api_key, self._fit_user_message(message, model), cached)
+        return cached
+
+    def _commit_chat_turn(self, api_key, user_message, ai_response):
+        """一次性提交本轮对话（用户消息 + AI回复）到对应的对话历史"""
+        assistant_message = {
+            "role": "assistant",
+            "content": ai_response
+        }
+        if api_key:
+            session = self.sessions.get(api_key)
+            # 有旧对话移出历史时，交给后台合并进摘要
+            if session.commit_turn(user_message, assistant_message) and self.summary_enabled:
+                self.summarizer.schedule(session)
+        else:
+            self.conversation_history.extend([user_message, assistant_message])
+
+    def _summarize_turns(self, summary, messages):
+        """调用摘要模型，把旧对话合并进已有摘要
+
+        由单个摘要线程串行调用，不占用对话请求的并发槽位，最多额外向Ollama发出一个请求。
+
+        Returns:
+            新的摘要
+        """
+        model = self.summary_model or EnvironmentConfig.get(EnvironmentConfig.SUMMARY_MODEL) or self.current_model
+        data = {
+            "model": model,
+            "messages": build_summary_messages(summary, messages),
+            "stream": False,
+            # 摘要模型不占用常驻名额
+            "keep_alive": self.model_manager.keep_alive
+        }
+        with self.backends.request(
+            "POST",
+            "/api/chat",
+            model=model,
+            json=data,
+            timeout=self.request_timeout
+        ) as response:
+            if response.status_code != 200:
+                raise RuntimeError(f"HTTP {response.status_code}")
+            return response.json().get("message", {}).get("content", "")
+
+    def get_ai_response_sync(self, message, model=None, api_key=None, cancel_token=None, use_cache=False,
+                             request_key=None, flight=None):
+        """同步获取AI响应（内部按流式读取，取消时可立即中断Ollama生成）
+
+        Raises:
+            RequestCancelled: 请求被取消
+        """
+        try:
+            ai_response = "".join(self.stream_ai_response_sync(
+                message, model, api_key, cancel_token, use_cache, request_key, flight
+            ))
+        except RequestCancelled:
+            raise
+        except Exception as e:
+            # 请求失败或网络异常，历史未被修改，无需回滚
+            return f"错误: {str(e)}"
+
+        # 限制AI回复长度
+        max_message_length = 5000
+        if len(ai_response) > max_message_length:
+            ai_response = ai_response[:max_message_length] + "...（回复过长，已截断）"
+            print("AI回复过长，已截断")
+        return ai_response
+
+    def join_inflight(self, request_key):
+        """加入进行中的相同请求（未启用合并时总是作为发起者）
+
+        Returns:
+            (Flight，未启用合并时为None, 是否为发起者)
+        """
+        if not self.coalesce_requests:
+            return None, True
+        return self.inflight_requests.join(request_key)
+
+    def abandon_inflight(self, request_key, flight):
+        """发起者放弃请求（排队失败、取消或断开），跟随者会自行重试；已结束的请求不受影响"""
+        if flight is None:
+            return
+        self.inflight_requests.leave(request_key, flight)
+        if not flight.done:
+            flight.fail(FlightAborted())
+
+    def follow_inflight(self, flight, message, model, api_key=None, is_cancelled=None):
+        """跟随进行中的相同请求，逐块产出其回复片段（不占用并发槽位，也不联网搜索）
+
+        跟随到生成结束时提交本轮对话；被取消时提前结束，不提交。
+
+        Raises:
+            FlightAborted: 发起者在产出任何片段之前放弃，调用方应重新加入
+            RuntimeError: 上游请求失败或中途中断
+        """
+        parts = []
+        try:
+            for chunk in flight.follow(is_cancelled):
+                parts.append(chunk)
+                yield chunk
+        except FlightAborted:
+            if parts:
+                raise RuntimeError("上游请求已中断")
+            raise
+        if is_cancelled is not None and is_cancelled():
+            return
+        self._commit_chat_turn(api_key, self._fit_user_message(message, model), self._limit_reply_length("".join(parts)))
+
+    def follow_ai_response_sync(self, flight, message, model, api_key=None, is_cancelled=None):
+        """同步跟随进行中的相同请求，返回完整回复（失败时与get_ai_response_sync一样返回错误信息）
+
+        Raises:
+            FlightAborted: 发起者在产出任何片段之前放弃，调用方应重新加入
+        """
+        try:
+            ai_response = "".join(self.follow_inflight(flight, message, model, api_key, is_cancelled))
+        except FlightAborted:
+            raise
+        except Exception as e:
+            return f"错误: {str(e)}"
+        return self._limit_reply_length(ai_response)
+
+    def stream_ai_response_sync(self, message, model=None, api_key=None, cancel_token=None, use_cache=False,
+                                request_key=None, flight=None, admit=None):
+        """流式获取AI响应，逐块产出回复片段
+
+        生成器被提前关闭（如远程调用方断开）或取消令牌被触发时会立即关闭到Ollama的连接，
+        以便Ollama停止生成；只有完整生成的回复才会写入对话历史。
+        启用缓存时，命中的回复作为一个片段直接产出，不再联网搜索或请求Ollama。
+        相同的请求正在进行时，直接跟随其回复片段，不再重复请求Ollama，也不占用并发槽位。
+
+        Args:
+            request_key: 调用方已计算请求键、查找过缓存并加入过相同请求时传入，这里只写入缓存
+            flight: 调用方作为发起者加入的相同请求（与request_key一起传入）
+            admit: 真正请求Ollama之前调用（如申请并发槽位），返回释放函数
+
+        Yields:
+            AI回复文本片段
+
+        Raises:
+            RuntimeError: Ollama返回错误
+            requests.RequestException: 网络异常
+            RequestCancelled: 请求被取消
+            SchedulerQueueFull, SchedulerTimeout: admit排队失败
+        """
+        # 模型只对本次请求生效，不修改共享的current_model
+        model = model or self.current_model
+        if request_key is None:
+            request_key = self.chat_request_key(message, model, api_key)
+            if use_cache:
+                cached = self.get_cached_response(message, model, api_key, request_key)
+                if cached is not None:
+                    yield cached
+                    return
+
+            def is_cancelled():
+                return cancel_token is not None and cancel_token.cancelled
+
+            while True:
+                flight, is_leader = self.join_inflight(request_key)
+                if is_leader:
+                    break
+                try:
+                    yield from self.follow_inflight(flight, message, model, api_key, is_cancelled)
+                except FlightAborted:
+                    # 发起者中途放弃：尚未收到任何片段时重新加入，可能由自己请求上游
+                    continue
+                if is_cancelled():
+                    raise RequestCancelled("Request cancelled")
+                return
+
+        # 只有真正请求Ollama的发起者才占用并发槽位
+        parts = []
+        release = None
+        try:
+            if admit is not None:
+                release = admit()
+            user_message, messages_snapshot = self._prepare_chat_messages(message, model, api_key)
+            data = {
+                "model": model,
+                "messages": messages_snapshot,
+                "stream": True,
+                "keep_alive": self.model_manager.keep_alive_for(model)
+            }
+            completed = yield from self._stream_ollama_chat(data, parts, flight, cancel_token)
+        except BaseException as e:
+            # 真正的上游错误原样通知跟随者；排队失败、取消或断开则让跟随者自行重试
+            if flight is not None and isinstance(e, Exception) and not isinstance(
+                    e, (RequestCancelled, SchedulerQueueFull, SchedulerTimeout)):
+                self.inflight_requests.leave(request_key, flight)
+                flight.fail(e)
+            else:
+                self.abandon_inflight(request_key, flight)
+            raise
+        finally:
+            if release is not None:
+                release()
+
+        if flight is not None:
+            self.inflight_requests.leave(request_key, flight)
+            if completed:
+                flight.finish()
+            else:
+                flight.fail(FlightAborted())
+
+        if completed:
+            ai_response = self._limit_reply_length("".join(parts))
+            if use_cache:
+                self.response_cache.put(request_key, ai_response)
+            self._commit_chat_turn(api_key, user_message, ai_response)
+
+    def _stream_ollama_chat(self, data, parts, flight=None, cancel_token=None):
+        """向Ollama发起流式对话请求，逐块产出回复片段并广播给跟随者
+
+        Returns:
+            是否完整生成（收到done）
+        """
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+
+        # 由后端池选择Ollama后端，读取结束后释放连接并更新后端的进行中请求数
+        with self.backends.request(
+            "POST",
+            "/api/chat",
+            model=data["model"],
+            json=data,
+            timeout=self.request_timeout,
+            stream=True
+        ) as response:
+            if cancel_token is not None:
+                # 取消时由令牌中断阻塞中的读取
+                cancel_token.bind(response)
+
+            completed = False
+            try:
+                if response.status_code != 200:
+                    raise RuntimeError(f"HTTP {response.status_code}")
+
+                for line in response.iter_lines():
+                    if cancel_token is not None and cancel_token.cancelled:
+                        break
+                    if not line:
+                        continue
+                    try:
+                        chunk = json.loads(line)
+                    except ValueError:
+                        continue
+
+                    if chunk.get("error"):
+                        raise RuntimeError(chunk["error"])
+
+                    content = chunk.get("message", {}).get("content", "")
+                    if content:
+                        parts.append(content)
+                        if flight is not None:
+                            flight.publish(content)
+                        yield content
+
+                    if chunk.get("done"):
+                        completed = True
+                        break
+            except Exception:
+                # 被取消导致的读取异常统一转换为RequestCancelled
+                if cancel_token is not None and cancel_token.cancelled:
+                    raise RequestCancelled("Request cancelled")
+                raise
+            finally:
+                if cancel_token is not None:
+                    cancel_token.unbind()
+
+        if cancel_token is not None and cancel_token.cancelled:
+            raise RequestCancelled("Request cancelled")
+        return completed
+
+    @staticmethod
+    def _limit_reply_length(ai_response, max_length=5000):
+        """限制写入对话历史的AI回复长度"""
+        if len(ai_response) > max_length:
+            return ai_response[:max_length] + "...（回复过长，已截断）"
+        return ai_response
+
+    def start_api_server(self, port=None):
+        """启动API服务
+
+        Args:
+            port: 监听端口，默认使用配置中的端口
+        """
+        try:
+            port = port or self.api_server_port
+            self.api_server_port = port
+            
+            # 若之前的服务仍在运行，先停止以释放端口
+            if self.api_http_server and self.api_http_server.running:
+                self.api_http_server.stop()
+            
+            from servers.api_server import ApiServer
+
+            # 创建API应用
+            self.api_server = self.create_api_app()
+            
+            # 使用线程池WSGI服务器运行API服务（支持优雅停止和有界请求队列）
+            self.api_http_server = ApiServer(
+                self.api_server,
+                host='0.0.0.0',
+                port=port,
+                workers=self.api_server_workers,
+                max_queue=self.api_server_max_queue,
+                keepalive_timeout=self.api_server_keepalive_timeout,
+                shutdown_timeout=self.api_server_shutdown_timeout,
+                max_streams=self.api_server_max_streams
+            )
+            self.api_http_server.start()
+            
+            # 更新状态
+            self.api_server_enabled = True
+            self.add_message("system", "系统", f"API服务已启动，端口: {port}")
+            
+            # 保存配置
+            self.save_config()
+        except Exception as e:
+            self.add_message("system", "系统", f"API服务启动失败: {str(e)}")
+
+    def stop_api_server(self, wait=False):
+        """停止API服务
+
+        Args:
+            wait: 是否阻塞等待正在处理的请求完成（退出程序时使用）
+        """
+        self.api_server_enabled = False
+        api_http_server = self.api_http_server
+        self.api_http_server = None
+        self.api_server = None
+        
+        if api_http_server and api_http_server.running:
+            if wait:
+                api_http_server.stop()
+            else:
+                # 优雅停止可能需要等待正在处理的请求，放到后台线程避免阻塞界面
+                threading.Thread(target=api_http_server.stop, daemon=True).start()
+        
+        self.add_message("system", "系统", "API服务已停止")
+        
+        # 保存配置
+        self.save_config()
+
+    def save_api_key_stats(self):
+        """立即将API Key调用统计数据写盘（平时由后台线程批量写入）"""
+        self.api_key_stats_store.flush()
+
+    def load_external_calls(self):
+        """加载向外调用配置"""
+        external_calls_path = self.get_app_data_path("external_calls.json")
+        try:
+            if os.path.exists(external_calls_path):
+                with open(external_calls_path, "r", encoding="utf-8") as f:
+                    return json.load(f)
+        except Exception as e:
+            print(f"加载向外调用配置失败: {str(e)}")
+        return []
+
+    def save_external_calls(self):
+        """保存向外调用配置"""
+        external_calls_path = self.get_app_data_path("external_calls.json")
+        try:
+            # 确保目录存在
+            os.makedirs(os.path.dirname(external_calls_path), exist_ok=True)
+            # 保存配置
+            with open(external_calls_path, "w", encoding="utf-8") as f:
+                json.dump(self.external_calls, f, ensure_ascii=False, indent=2)
+            print(f"向外调用配置已保存到: {external_calls_path}")
+        except Exception as e:
+            print(f"保存向外调用配置失败: {str(e)}")
+            # 尝试使用绝对路径
+            try:
+                import tempfile
+                temp_path = os.path.join(tempfile.gettempdir(), "external_calls.json")
+                with open(temp_path, "w", encoding="utf-8") as f:
+                    json.dump(self.external_calls, f, ensure_ascii=False, indent=2)
+                print(f"向外调用配置已保存到临时路径: {temp_path}")
+            except Exception as e2:
+                print(f"保存到临时路径也失败: {str(e2)}")
+
+    def create_external_call(self, name, model, model_type, url, port, api_key, expires_days):
+        """创建新的向外调用配置"""
+        # 生成唯一ID
+        call_id = str(uuid.uuid4())
+        # 计算过期时间
+        expires_at = (datetime.now() + timedelta(days=expires_days)).isoformat()
+        # 创建向外调用配置
+        external_call = {
+            "id": call_id,
+            "name": name,
+            "model": model,
+            "model_type": model_type,
+            "url": url,
+            "port": port,
+            "api_key": api_key,
+            "created_at": datetime.now().isoformat(),
+            "expires_at": expires_at,
+            "enabled": True,
+            "call_count": 0,
+            "last_call": None
+        }
+        # 添加到列表
+        self.external_calls.append(external_call)
+        # 保存配置
+        self.save_external_calls()
+        return external_call
+
+    def make_external_call(self, call_id, message, use_websocket=True):
+        """执行向外调用（首次调用时才导入WebSocket客户端）"""
+        from core.external_calls import make_external_call
+        return make_external_call(self, call_id, message, use_websocket)
+
+    def start_mcp_router(self):
+        """启动MCP Router服务"""
+        try:
+            import flask
+
+            def run_mcp_server():
+                app = flask.Flask(__name__)
+                
+                # 速率限制（按IP和全局）
+                @app.before_request
+                def limit_rate():
+                    allowed, retry_after = self.mcp_rate_limiter.check(None, flask.request.remote_addr)
+                    if not allowed:
+                        response = flask.jsonify({"error": "Too many requests"})
+                        response.status_code = 429
+                        response.headers['Retry-After'] = str(retry_after)
+                        return response
+                
+                @app.route('/mcp/tools', methods=['GET'])
+                def list_tools():
+                    return flask.jsonify({
+                        "tools": [
+                            {"name": "search", "description": "搜索网络"},
+                            {"name": "calculate", "description": "数学计算"}
+                        ]
+                    })
+                
+                @app.route('/mcp/call', methods=['POST'])
+                def call_tool():
+                    data = flask.request.json
+                    tool_name = data.get('tool')
+                    params = data.get('params', {})
+                    
+                    if tool_name == 'search':
+                        return flask.jsonify({"result": f"搜索结果: {params.get('query', '')}"})
+                    elif tool_name == 'calculate':
+                        return flask.jsonify({"result": f"计算结果: {params.get('expression', '')}"})
+                    return flask.jsonify({"error": "Unknown tool"}), 400
+                
+                app.run(host='0.0.0.0', port=self.mcp_router_port, threaded=True, use_reloader=False)
+            
+            self.mcp_router = threading.Thread(target=run_mcp_server, daemon=True)
+            self.mcp_router.start()
+            print(f"MCP Router已启动在端口 {self.mcp_router_port}")
+        except Exception as e:
+            print(f"启动MCP Router失败: {str(e)}")
+
+    def stop_mcp_router(self):
+        """停止MCP Router服务"""
+        print("MCP Router已停止")
+
+    def start_noke_servers(self):
+        """启动NOKE服务器集群"""
+        try:
+            from servers.main_server import MainServer
+            from servers.memory_server import MemoryServer
+            from servers.agent_server import AgentServer
+            from servers.monitor_server import MonitorServer
+
+            # 记录日志
+            log_message = self.log_server_message
+            
+            # 启动顺序：memory -> agent -> monitor -> main
+            
+            # 启动记忆服务器
+            if self.servers['memory'] is None:
+                log_message("启动记忆服务器...")
+                self.servers['memory'] = MemoryServer()
+                self.servers['memory'].start()
+                time.sleep(1)
+            
+            # 启动智能体服务器
+            if self.servers['agent'] is None:
+                log_message("启动智能体服务器...")
+                self.servers['agent'] = AgentServer()
+                self.servers['agent'].start()
+                time.sleep(1)
+            
+            # 启动监控服务器
+            if self.servers['monitor'] is None:
+                log_message("启动监控服务器...")
+                self.servers['monitor'] = MonitorServer()
+                self.servers['monitor'].start()
+                time.sleep(1)
+            
+            # 启动主服务器
+            if self.servers['main'] is None:
+                log_message("启动主服务器...")
+                self.servers['main'] = MainServer()
+                self.servers['main'].start()
+                time.sleep(1)
+            
+            log_message("NOKE服务器集群启动完成")
+            return True, "NOKE服务器集群启动成功"
+        except Exception as e:
+            log_message(f"启动NOKE服务器集群失败: {str(e)}")
+            return False, f"启动NOKE服务器集群失败: {str(e)}"
+
+    def stop_noke_servers(self):
+        """停止NOKE服务器集群"""
+        try:
+            # 记录日志
+            log_message = self.log_server_message
+            
+            # 停止顺序：main -> monitor -> agent -> memory
+            
+            # 停止主服务器
+            if self.servers['main']:
+                log_message("停止主服务器...")
+                self.servers['main'].stop()
+                self.servers['main'] = None
+                time.sleep(0.5)
+            
+            # 停止监控服务器
+            if self.servers['monitor']:
+                log_message("停止监控服务器...")
+                self.servers['monitor'].stop()
+                self.servers['monitor'] = None
+                time.sleep(0.5)
+            
+            # 停止智能体服务器
+            if self.servers['agent']:
+                log_message("停止智能体服务器...")
+                self.servers['agent'].stop()
+                self.servers['agent'] = None
+                time.sleep(0.5)
+            
+            # 停止记忆服务器
+            if self.servers['memory']:
+                log_message("停止记忆服务器...")
+                self.servers['memory'].stop()
+                self.servers['memory'] = None
+                time.sleep(0.5)
+            
+            log_message("NOKE服务器集群停止完成")
+            return True, "NOKE服务器集群停止成功"
+        except Exception as e:
+            log_message(f"停止NOKE服务器集群失败: {str(e)}")
+            return False, f"停止NOKE服务器集群失败: {str(e)}"
+
+    def start_single_server(self, server_key, port):
+        """启动单个服务器"""
+        try:
+            print(f"启动{server_key}服务器，端口: {port}...")
+            
+            # 停止之前的服务器实例
+            if self.servers[server_key]:
+                print(f"停止之前的{server_key}服务器实例...")
+                self.servers[server_key].stop()
+                self.servers[server_key] = None
+                time.sleep(0.5)
+            
+            # 根据服务器类型启动不同的服务器
+            if server_key == 'main':
+                from servers.main_server import MainServer
+                self.servers[server_key] = MainServer()
+            elif server_key == 'memory':
+                from servers.memory_server import MemoryServer
+                self.servers[server_key] = MemoryServer()
+            elif server_key == 'agent':
+                from servers.agent_server import AgentServer
+                self.servers[server_key] = AgentServer()
+            elif server_key == 'monitor':
+                from servers.monitor_server import MonitorServer
+                self.servers[server_key] = MonitorServer()
+            
+            # 启动服务器
+            if self.servers[server_key]:
+                # 这里可以添加端口设置逻辑
+                # 目前服务器使用配置文件中的端口
+                self.servers[server_key].start()
+                print(f"{server_key}服务器启动成功，端口: {port}")
+            else:
+                print(f"无法启动{server_key}服务器")
+                
+        except Exception as e:
+            print(f"启动{server_key}服务器失败: {str(e)}")
+
+    def stop_single_server(self, server_key):
+        """停止单个服务器"""
+        try:
+            print(f"停止{server_key}服务器...")
+            
+            if self.servers[server_key]:
+                self.servers[server_key].stop()
+                self.servers[server_key] = None
+                print(f"{server_key}服务器停止成功")
+            else:
+                print(f"{server_key}服务器未运行")
+                
+        except Exception as e:
+            print(f"停止{server_key}服务器失败: {str(e)}")
+
+    def toggle_external_call_enabled(self, call_id, enabled):
+        """切换向外调用的启用状态"""
+        for call in self.external_calls:
+            if call['id'] == call_id:
+                call['enabled'] = enabled
+                break
+        self.save_external_calls()
+
+    def record_api_call(self, api_key):
+        """记录API调用（仅更新内存计数，由后台线程批量写盘）"""
+        self.api_key_stats_store.record(api_key)
+
+    def monitor_memory(self):
+        """监控内存使用情况"""
+        import psutil
+        import time
+        
+        while True:
+            try:
+                # 获取当前进程的内存使用情况
+                process = psutil.Process()
+                memory_info = process.memory_info()
+                memory_percent = process.memory_percent()
+                
+                # 检查内存使用率
+                if memory_percent > self.max_memory_usage:
+                    self.release_resources()
+                    print(f"内存使用率过高 ({memory_percent:.2f}%%)，已释放部分资源")
+                
+                # 监控GPU内存使用情况
+                if self.gpu_memory_check_enabled:
+                    gpu_memory_percent = self.get_gpu_memory_usage()
+                    if gpu_memory_percent > self.max_gpu_memory_usage:
+                        self.release_resources()
+                        print(f"GPU内存使用率过高 ({gpu_memory_percent:.2f}%%)，已释放部分资源")
+            except Exception as e:
+                print(f"内存监控错误: {str(e)}")
+            
+            # 等待下一次检查
+            time.sleep(self.memory_check_interval)
+
+    def get_gpu_memory_usage(self):
+        """获取GPU内存使用情况"""
+        try:
+            # 尝试使用pynvml库
+            try:
+                import pynvml
+                pynvml.nvmlInit()
+                device_count = pynvml.nvmlDeviceGetCount()
+                total_memory = 0
+                used_memory = 0
+                
+                for i in range(device_count):
+                    handle = pynvml.nvmlDeviceGetHandleByIndex(i)
+                    info = pynvml.nvmlDeviceGetMemoryInfo(handle)
+                    total_memory += info.total
+                    used_memory += info.used
+                
+                pynvml.nvmlShutdown()
+                
+                if total_memory > 0:
+                    return (used_memory / total_memory) * 100
+            except ImportError:
+                # pynvml未安装，尝试使用nvidia-smi命令
+                import subprocess
+                import re
+                
+                result = subprocess.run(['nvidia-smi', '--query-gpu=memory.total,memory.used', '--format=csv,noheader,nounits'], 
+                                      capture_output=True, text=True)
+                
+                if result.returncode == 0:
+                    total_memory = 0
+                    used_memory = 0
+                    
+                    for line in result.stdout.strip().split('\n'):
+                        if line:
+                            parts = line.split(',')
+                            if len(parts) == 2:
+                                try:
+                                    total = int(parts[0].strip())
+                                    used = int(parts[1].strip())
+                                    total_memory += total
+                                    used_memory += used
+                                except ValueError:
+                                    pass
+                    
+                    if total_memory > 0:
+                        return (used_memory / total_memory) * 100
+        except Exception as e:
+            print(f"GPU内存监控错误: {str(e)}")
+        
+        return 0
+
+    def release_resources(self):
+        """释放资源（卸载Ollama中的冷模型，并清理本地对话历史）"""
+        try:
+            # 1. 卸载Ollama中的冷模型（当前模型和最近使用的模型保留）
+            unloaded = self.model_manager.unload_cold()
+            if unloaded:
+                print(f"已卸载冷模型: {', '.join(unloaded)}")
+            
+            # 2. 清理不活跃的对话历史
+            # 超过12小时未使用的API Key会话直接移除
+            removed = self.sessions.remove_idle(12 * 3600)
+            if removed:
+                print(f"清理不活跃的API Key对话历史: {removed} 个")
+            
+            # 3. 清理全局对话历史（更激进）
+            if len(self.conversation_history) > 5:
+                # 保留最近5轮对话
+                from collections import deque
+                new_history = deque(maxlen=self.max_history_rounds)
+                # 复制最近的对话
+                for msg in list(self.conversation_history)[-5:]:
+                    new_history.append(msg)
+                self.conversation_history = new_history
+                print("清理全局对话历史，保留最近5轮")
+            
+            # 4. 清理所有对话历史（如果内存仍然紧张）
+            # 这里可以根据实际情况调整触发条件
+            
+            # 5. 尝试清理Python垃圾回收
+            import gc
+            gc.collect()
+            print("执行垃圾回收")
+            
+            # 6. 限制并发请求数（临时降低）
+            # 注意：这只是临时措施，下次启动会恢复配置值
+            if self.max_concurrent_requests > 3:
+                self.max_concurrent_requests = 3
+                # 缩减调度器槽位和工作线程（正在执行的请求不受影响）
+                self.request_scheduler.resize(self.max_concurrent_requests)
+                self.worker_pool.resize(self.max_concurrent_requests)
+                print("临时降低最大并发请求数到3")
+                
+        except Exception as e:
+            print(f"释放资源错误: {str(e)}")
+
+    def release_gpu_resources(self):
+        """释放GPU资源"""
+        try:
+            # 1. 清理所有对话历史
+            self.conversation_history.clear()
+            self.sessions.clear()
+            print("清理所有对话历史")
+            
+            # 2. 强制垃圾回收
+            import gc
+            gc.collect()
+            print("执行强制垃圾回收")
+            
+            # 3. 尝试使用pynvml释放GPU内存
+            try:
+                import pynvml
+                pynvml.nvmlInit()
+                device_count = pynvml.nvmlDeviceGetCount()
+                for i in range(device_count):
+                    handle = pynvml.nvmlDeviceGetHandleByIndex(i)
+                    # 获取GPU内存信息
+                    info = pynvml.nvmlDeviceGetMemoryInfo(handle)
+                    print(f"GPU {i} 内存使用: {info.used / (1024 * 1024 * 1024):.2f} GB / {info.total / (1024 * 1024 * 1024):.2f} GB")
+                pynvml.nvmlShutdown()
+            except ImportError:
+                print("pynvml未安装，跳过GPU内存检查")
+            except Exception as e:
+                print(f"GPU内存释放错误: {str(e)}")
+                
+        except Exception as e:
+            print(f"释放GPU资源错误: {str(e)}")
+
+    def cleanup_resources(self):
+        """清理所有资源"""
+        try:
+            # 1. 清理API速率限制数据
+            if hasattr(self, 'rate_limiter'):
+                self.rate_limiter.reset()
+            
+            # 2. 关闭常驻工作线程池、后台摘要线程和后端健康检查线程
+            if hasattr(self, 'worker_pool'):
+                self.worker_pool.shutdown()
+            if hasattr(self, 'summarizer'):
+                self.summarizer.stop()
+            if hasattr(self, 'backends'):
+                self.backends.stop()
+            
+            # 3. 关闭向外调用的WebSocket长连接
+            if hasattr(self, 'external_ws_clients'):
+                with self.external_ws_lock:
+                    for client in self.external_ws_clients.values():
+                        client.close()
+                    self.external_ws_clients.clear()
+            
+            # 4. 关闭HTTP连接池中的空闲连接
+            if hasattr(self, 'http'):
+                self.http.close()
+            
+            # 5. 清理模型缓存
+            if hasattr(self, '_cached_models'):
+                self._cached_models = []
+            
+            # 6. 强制垃圾回收
+            import gc
+            gc.collect()
+            print("清理所有资源完成")
+            
+        except Exception as e:
+            print(f"清理资源错误: {str(e)}")
+
+    def shutdown(self):
+        """停止所有服务，保存配置和调用统计，并释放资源（无界面入口退出时使用）"""
+        self.save_api_keys()
+        self.save_api_key_stats()
+        if self.api_server_enabled:
+            self.stop_api_server(wait=True)
+        if self.mcp_router_enabled:
+            self.mcp_router_enabled = False
+            self.stop_mcp_router()
+        self.stop_noke_servers()
+        self.release_gpu_resources()
+        self.cleanup_resources()
+
+    def scan_ports(self, ip, start_port, end_port):
+        """扫描指定IP的端口范围"""
+        from core.port_scanner import scan_ports
+        return scan_ports(ip, start_port, end_port)
+
+    def is_port_open(self, ip, port):
+        """检查指定端口是否开放"""
+        from core.port_scanner import is_port_open
+        return is_port_open(ip, port)
+
+    def perform_web_search(self, query):
+        """执行联网搜索，包含关键词提取和内容分析（首次调用时才导入jieba）"""
+        from core.web_search import perform_web_search
+        search_api = self.search_api_var.get() if hasattr(self, 'search_api_var') else "模拟搜索"
+        return perform_web_search(query, search_api)
@@ -0,0 +1,154 @@
+import time
+from datetime import datetime
+
+from communication.chat_ws_client import ChatWebSocketClient, ChatWebSocketTransportError
+
+
+def make_external_call(service, call_id, message, use_websocket=True):
+    """执行向外调用"""
+    # 检查全局向外调用服务是否启用
+    if not service.external_call_enabled:
+        return "错误: 向外调用服务未启用"
+
+    # 查找向外调用配置
+    external_call = None
+    for call in service.external_calls:
+        if call['id'] == call_id:
+            external_call = call
+            break
+
+    if not external_call:
+        return "错误: 未找到向外调用配置"
+
+    # 检查是否启用
+    if not external_call.get('enabled', True):
+        return "错误: 该向外调用已禁用"
+
+    # 检查是否过期
+    expires_at = datetime.fromisoformat(external_call['expires_at'])
+    if datetime.now() > expires_at:
+        return "错误: 向外调用配置已过期"
+
+    # 更新调用统计
+    external_call['call_count'] = external_call.get('call_count', 0) + 1
+    external_call['last_call'] = datetime.now().isoformat()
+    service.save_external_calls()
+
+    # 构建URL
+    url = external_call['url'].strip()
+    port = external_call['port']
+
+    # 检查URL是否已经包含端口
+    if ':' in url and not url.startswith(('http://', 'https://', 'ws://', 'wss://')):
+        # URL格式不正确，应该包含协议
+        return "错误: URL格式不正确，必须包含http://、https://、ws://或wss://"
+
+    if use_websocket:
+        # WebSocket模式
+        try:
+            # 构建WebSocket URL
+            if '://' in url:
+                # 已经包含协议，转换为WebSocket协议
+                if url.startswith('http://'):
+                    ws_url = url.replace('http://', 'ws://')
+                elif url.startswith('https://'):
+                    ws_url = url.replace('https://', 'wss://')
+                else:
+                    # 已经是WebSocket协议
+                    ws_url = url
+            else:
+                # 添加默认WebSocket协议
+                ws_url = f"ws://{url}"
+
+            # 检查是否需要添加端口
+            if ':' not in ws_url.split('://')[1].split('/')[0]:
+                # URL中没有端口，添加配置的端口
+                ws_url = f"{ws_url}:{port}"
+
+            # 添加WebSocket路径
+            ws_url = f"{ws_url}/api/chat/ws"
+
+            # 对端近期不支持WebSocket时直接使用HTTP，避免重复的失败握手
+            failed_at = service.external_ws_unsupported.get(ws_url)
+            if failed_at and time.time() - failed_at < service.external_ws_retry_interval:
+                return make_external_call_http(service, external_call, message)
+
+            # 复用到该对端的长连接（多个请求通过请求ID复用同一连接）
+            client_key = (ws_url, external_call['api_key'])
+            with service.external_ws_lock:
+                client = service.external_ws_clients.get(client_key)
+                if client is None:
+                    client = ChatWebSocketClient(ws_url, external_call['api_key'], timeout=service.request_timeout)
+                    service.external_ws_clients[client_key] = client
+
+            try:
+                client.connect()
+            except Exception as e:
+                # 握手失败，记录并回退到HTTP POST
+                print(f"WebSocket连接失败，回退到HTTP: {str(e)}")
+                service.external_ws_unsupported[ws_url] = time.time()
+                with service.external_ws_lock:
+                    service.external_ws_clients.pop(client_key, None)
+                return make_external_call_http(service, external_call, message)
+
+            service.external_ws_unsupported.pop(ws_url, None)
+            try:
+                return client.chat(message, external_call['model'])
+            except ChatWebSocketTransportError as e:
+                # 已发出的请求对端可能已在生成，重试会重复生成；等待超时和服务器返回的错误同样不回退
+                if e.request_sent:
+                    raise
+                # 请求发出前连接已断开，与握手失败一样回退到HTTP POST
+                print(f"WebSocket调用失败，回退到HTTP: {str(e)}")
+                return make_external_call_http(service, external_call, message)
+
+        except Exception as e:
+            return f"错误: WebSocket调用失败，{str(e)}"
+    else:
+        # HTTP POST模式
+        return make_external_call_http(service, external_call, message)
+
+
+def make_external_call_http(service, external_call, message):
+    """使用HTTP POST执行向外调用"""
+    # 构建API URL
+    url = external_call['url'].strip()
+    port = external_call['port']
+
+    if '://' in url:
+        # 已经包含协议
+        base_url = url
+    else:
+        # 添加默认协议
+        base_url = f"http://{url}"
+
+    # 检查是否需要添加端口
+    if ':' not in base_url.split('://')[1].split('/')[0]:
+        # URL中没有端口，添加配置的端口
+        api_url = f"{base_url}:{port}/api/chat"
+    else:
+        # URL中已经有端口，直接使用
+        api_url = f"{base_url}/api/chat"
+
+    # 构建请求数据
+    data = {
+        "AccessKeyId": external_call['api_key'],
+        "Message": message,
+        "Model": external_call['model']
+    }
+
+    try:
+        # 发送请求
+        response = service.http.post(
+            api_url,
+            json=data,
+            timeout=service.request_timeout
+        )
+
+        if response.status_code == 200:
+            result = response.json()
+            return result.get("data", {}).get("response", "无响应内容")
+        else:
+            return f"错误: API调用失败，状态码: {response.status_code}\n{response.text}"
+    except Exception as e:
+        return f"错误: API调用失败，{str(e)}"
@@ -0,0 +1,34 @@
+def scan_ports(ip, start_port, end_port):
+    """扫描指定IP的端口范围"""
+    open_ports = []
+
+    # 限制扫描速度，避免网络拥塞
+    max_workers = 100
+    from concurrent.futures import ThreadPoolExecutor
+
+    def scan_port(port):
+        if is_port_open(ip, port):
+            return port
+        return None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(scan_port, range(start_port, end_port + 1))
+
+    for port in results:
+        if port:
+            open_ports.append(port)
+
+    return open_ports
+
+
+def is_port_open(ip, port):
+    """检查指定端口是否开放"""
+    import socket
+
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+            s.settimeout(0.1)
+            result = s.connect_ex((ip, port))
+            return result == 0
+    except:
+        return False
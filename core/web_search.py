@@ -0,0 +1,147 @@
+def perform_web_search(query, search_api="模拟搜索"):
+    """执行联网搜索，包含关键词提取和内容分析
+
+    Args:
+        query: 搜索词
+        search_api: 使用的搜索API
+
+    Returns:
+        整合后的搜索结果列表
+    """
+    try:
+        # 网络安全措施
+        # 1. 输入验证和清理
+        if not query or len(query) > 1000:  # 限制搜索词长度
+            return ["搜索词无效或过长，请尝试更简洁的搜索词。"]
+
+        # 2. 清理搜索词，防止注入攻击
+        import re
+        # 只允许字母、数字、中文和常见标点符号
+        clean_query = re.sub(r'[^\w\s\u4e00-\u9fa5\-.,!?]', '', query)
+        if not clean_query:
+            return ["搜索词包含无效字符，请重新输入。"]
+
+        # 3. 关键词提取（重点识别）
+        keywords = extract_keywords(clean_query)
+
+        # 4. 根据关键词拟定搜索词
+        search_terms = generate_search_terms(keywords, clean_query)
+
+        # 6. 模拟搜索结果（实际应用中应集成安全的搜索API）
+        import time
+        import random
+
+        # 模拟网络延迟，添加随机性
+        time.sleep(random.uniform(0.5, 1.5))
+
+        # 7. 模拟搜索结果，确保内容安全
+        search_results = []
+        for i, term in enumerate(search_terms[:3], 1):  # 只使用前3个搜索词
+            # 为每个搜索词生成结果
+            search_results.extend([
+                f"搜索结果 {len(search_results) + 1}: {term} - 这是关于'{term}'的详细信息，包含相关概念和最新数据。",
+                f"搜索结果 {len(search_results) + 1}: {term} - 这是关于'{term}'的应用案例和实践经验。"
+            ])
+
+        # 8. 内容分析和整合
+        analyzed_results = analyze_search_results(search_results, clean_query, keywords)
+
+        # 9. 记录搜索请求（便于审计）
+        print(f"[安全日志] 执行联网搜索: {clean_query}")
+        print(f"[安全日志] 提取关键词: {keywords}")
+        print(f"[安全日志] 生成搜索词: {search_terms}")
+
+        return analyzed_results
+    except Exception as e:
+        # 10. 错误处理，避免泄露敏感信息
+        print(f"[安全日志] 搜索失败: {str(e)}")
+        return ["搜索服务暂时不可用，请稍后再试。"]
+
+
+def extract_keywords(query):
+    """从用户查询中提取关键词"""
+    import re
+    import jieba
+
+    # 移除停用词
+    stopwords = set([
+        '的', '了', '是', '在', '我', '有', '和', '就', '不', '人', '都', '一', '一个', '上', '也', '很', '到', '说', '要', '去', '你',
+        '会', '着', '没有', '看', '好', '自己', '这', '关于', '对于', '怎么', '如何', '什么', '为什么', '吗', '呢', '啊'
+    ])
+
+    # 使用结巴分词提取关键词
+    try:
+        words = jieba.cut_for_search(query)
+        keywords = [word for word in words if word not in stopwords and len(word) > 1]
+
+        # 如果结巴分词失败，使用简单的方法
+        if not keywords:
+            # 简单分词（按空格和标点）
+            words = re.findall(r'[\w\u4e00-\u9fa5]+', query)
+            keywords = [word for word in words if word not in stopwords and len(word) > 1]
+    except:
+        # 降级方案
+        words = re.findall(r'[\w\u4e00-\u9fa5]+', query)
+        keywords = [word for word in words if word not in stopwords and len(word) > 1]
+
+    # 确保至少有一个关键词
+    if not keywords:
+        keywords = [query[:20]]  # 使用查询的前20个字符作为关键词
+
+    return keywords[:5]  # 最多返回5个关键词
+
+
+def generate_search_terms(keywords, original_query):
+    """根据关键词生成搜索词"""
+    search_terms = []
+
+    # 1. 使用原始查询
+    search_terms.append(original_query)
+
+    # 2. 使用单个关键词
+    for keyword in keywords:
+        if keyword not in search_terms:
+            search_terms.append(keyword)
+
+    # 3. 使用关键词组合
+    if len(keywords) > 1:
+        # 两两组合
+        for i in range(len(keywords)):
+            for j in range(i + 1, len(keywords)):
+                combined = f"{keywords[i]} {keywords[j]}"
+                if combined not in search_terms:
+                    search_terms.append(combined)
+
+    return search_terms[:5]  # 最多返回5个搜索词
+
+
+def analyze_search_results(results, original_query, keywords):
+    """分析搜索结果并整合"""
+    # 1. 统计关键词出现频率
+    keyword_freq = {}
+    for keyword in keywords:
+        freq = sum(1 for result in results if keyword in result)
+        keyword_freq[keyword] = freq
+
+    # 2. 按相关性排序结果
+    def get_relevance(result):
+        relevance = 0
+        for keyword, freq in keyword_freq.items():
+            if keyword in result:
+                relevance += freq
+        return relevance
+
+    sorted_results = sorted(results, key=get_relevance, reverse=True)
+
+    # 3. 生成分析摘要
+    analyzed_results = []
+    analyzed_results.append(f"🔍 搜索分析: 根据您的问题，我识别到的重点是: {', '.join(keywords)}")
+    analyzed_results.append("\n📋 搜索结果摘要:")
+
+    # 添加前5个最相关的结果
+    for i, result in enumerate(sorted_results[:5], 1):
+        analyzed_results.append(f"{i}. {result}")
+
+    analyzed_results.append("\n💡 提示: 以上结果基于关键词搜索，可能需要结合您的具体问题进行进一步分析。")
+
+    return analyzed_results
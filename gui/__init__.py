@@ -0,0 +1 @@
+# GUI module initialization
@@ -0,0 +1,307 @@
+import customtkinter as ctk
+
+
+def create_dashboard_ui(gui, dashboard_tab):
+    """创建仪表盘UI"""
+    # 读取内存中的实时统计快照
+    api_key_stats = gui.api_key_stats_store.snapshot()
+
+    # 高级仪表盘标题
+    dashboard_title = ctk.CTkLabel(
+        dashboard_tab,
+        text="API服务实时监测仪表盘",
+        font=ctk.CTkFont(size=18, weight="bold"),
+        text_color="#3498db"
+    )
+    dashboard_title.pack(pady=(20, 10))
+
+    # 统计卡片网格
+    stats_grid_frame = ctk.CTkFrame(dashboard_tab, corner_radius=15, border_width=1, border_color="#444444")
+    stats_grid_frame.pack(fill="x", padx=20, pady=10)
+    stats_grid_frame.grid_columnconfigure(0, weight=1)
+    stats_grid_frame.grid_columnconfigure(1, weight=1)
+    stats_grid_frame.grid_columnconfigure(2, weight=1)
+    stats_grid_frame.grid_columnconfigure(3, weight=1)
+
+    # 总调用次数卡片
+    total_calls_frame = ctk.CTkFrame(stats_grid_frame, corner_radius=10, fg_color="#1a1a2e")
+    total_calls_frame.grid(row=0, column=0, padx=10, pady=10, sticky="nsew")
+
+    total_calls_icon = ctk.CTkLabel(
+        total_calls_frame,
+        text="📊",
+        font=ctk.CTkFont(size=24)
+    )
+    total_calls_icon.pack(pady=(15, 5))
+
+    total_calls_label = ctk.CTkLabel(
+        total_calls_frame,
+        text="总调用次数",
+        font=ctk.CTkFont(size=12),
+        text_color="#95a5a6"
+    )
+    total_calls_label.pack(pady=5)
+
+    total_calls_value = sum(stats.get("total_calls", 0) for stats in api_key_stats.values())
+    total_calls_value_label = ctk.CTkLabel(
+        total_calls_frame,
+        text=str(total_calls_value),
+        font=ctk.CTkFont(size=24, weight="bold"),
+        text_color="#3498db"
+    )
+    total_calls_value_label.pack(pady=5)
+
+    # 今日调用次数卡片
+    today_calls_frame = ctk.CTkFrame(stats_grid_frame, corner_radius=10, fg_color="#1a1a2e")
+    today_calls_frame.grid(row=0, column=1, padx=10, pady=10, sticky="nsew")
+
+    today_calls_icon = ctk.CTkLabel(
+        today_calls_frame,
+        text="📅",
+        font=ctk.CTkFont(size=24)
+    )
+    today_calls_icon.pack(pady=(15, 5))
+
+    today_calls_label = ctk.CTkLabel(
+        today_calls_frame,
+        text="今日调用次数",
+        font=ctk.CTkFont(size=12),
+        text_color="#95a5a6"
+    )
+    today_calls_label.pack(pady=5)
+
+    today_calls_value = sum(stats.get("calls_today", 0) for stats in api_key_stats.values())
+    today_calls_value_label = ctk.CTkLabel(
+        today_calls_frame,
+        text=str(today_calls_value),
+        font=ctk.CTkFont(size=24, weight="bold"),
+        text_color="#4CAF50"
+    )
+    today_calls_value_label.pack(pady=5)
+
+    # 活跃API Key数量卡片
+    active_keys_frame = ctk.CTkFrame(stats_grid_frame, corner_radius=10, fg_color="#1a1a2e")
+    active_keys_frame.grid(row=0, column=2, padx=10, pady=10, sticky="nsew")
+
+    active_keys_icon = ctk.CTkLabel(
+        active_keys_frame,
+        text="🔑",
+        font=ctk.CTkFont(size=24)
+    )
+    active_keys_icon.pack(pady=(15, 5))
+
+    active_keys_label = ctk.CTkLabel(
+        active_keys_frame,
+        text="活跃API Key",
+        font=ctk.CTkFont(size=12),
+        text_color="#95a5a6"
+    )
+    active_keys_label.pack(pady=5)
+
+    active_keys_value = len([key for key, stats in api_key_stats.items() if stats.get("total_calls", 0) > 0])
+    active_keys_value_label = ctk.CTkLabel(
+        active_keys_frame,
+        text=str(active_keys_value),
+        font=ctk.CTkFont(size=24, weight="bold"),
+        text_color="#FF9800"
+    )
+    active_keys_value_label.pack(pady=5)
+
+    # API服务状态卡片
+    status_frame = ctk.CTkFrame(stats_grid_frame, corner_radius=10, fg_color="#1a1a2e")
+    status_frame.grid(row=0, column=3, padx=10, pady=10, sticky="nsew")
+
+    status_icon = ctk.CTkLabel(
+        status_frame,
+        text="🟢" if gui.api_server_enabled else "🔴",
+        font=ctk.CTkFont(size=24)
+    )
+    status_icon.pack(pady=(15, 5))
+
+    status_label = ctk.CTkLabel(
+        status_frame,
+        text="API服务状态",
+        font=ctk.CTkFont(size=12),
+        text_color="#95a5a6"
+    )
+    status_label.pack(pady=5)
+
+    status_value = "运行中" if gui.api_server_enabled else "已停止"
+    status_value_label = ctk.CTkLabel(
+        status_frame,
+        text=status_value,
+        font=ctk.CTkFont(size=24, weight="bold"),
+        text_color="#4CAF50" if gui.api_server_enabled else "#e74c3c"
+    )
+    status_value_label.pack(pady=5)
+
+    # 工作线程池与排队情况
+    pool_stats = gui.worker_pool.get_stats()
+    queue_stats = gui.request_scheduler.get_stats()
+    pool_label = ctk.CTkLabel(
+        status_frame,
+        text=f"工作线程 {pool_stats['active']}/{pool_stats['workers']} · 排队 {queue_stats['waiting']} · 已取消 {pool_stats['total_cancelled']}",
+        font=ctk.CTkFont(size=11),
+        text_color="#95a5a6"
+    )
+    pool_label.pack(pady=(0, 2))
+
+    # 回复缓存命中情况
+    cache_stats = gui.response_cache.get_stats()
+    cache_label = ctk.CTkLabel(
+        status_frame,
+        text=(f"回复缓存 {'已启用' if gui.response_cache_enabled else '未启用'} · "
+              f"命中 {cache_stats['hits']} · 未命中 {cache_stats['misses']} · 命中率 {cache_stats['hit_rate']:.0%}"),
+        font=ctk.CTkFont(size=11),
+        text_color="#95a5a6"
+    )
+    cache_label.pack(pady=(0, 10))
+
+    # 详细统计区域
+    details_frame = ctk.CTkFrame(dashboard_tab, corner_radius=15, border_width=1, border_color="#444444")
+    details_frame.pack(fill="both", expand=True, padx=20, pady=10)
+    details_frame.grid_columnconfigure(0, weight=1)
+    details_frame.grid_rowconfigure(0, weight=1)
+
+    # API Key使用情况标题
+    usage_title = ctk.CTkLabel(
+        details_frame,
+        text="API Key使用详情",
+        font=ctk.CTkFont(size=14, weight="bold"),
+        text_color="#3498db"
+    )
+    usage_title.pack(pady=(15, 10))
+
+    # 高级表格框架
+    table_frame = ctk.CTkScrollableFrame(details_frame, corner_radius=10)
+    table_frame.pack(fill="both", expand=True, padx=15, pady=10)
+
+    # 表头
+    header_frame = ctk.CTkFrame(table_frame, fg_color="#1a1a2e", corner_radius=5)
+    header_frame.pack(fill="x", pady=5)
+    header_frame.grid_columnconfigure(0, weight=2)
+    header_frame.grid_columnconfigure(1, weight=1)
+    header_frame.grid_columnconfigure(2, weight=1)
+    header_frame.grid_columnconfigure(3, weight=2)
+
+    ctk.CTkLabel(header_frame, text="API Key", font=ctk.CTkFont(weight="bold"), text_color="#3498db").grid(row=0, column=0, padx=10, pady=8, sticky="w")
+    ctk.CTkLabel(header_frame, text="总调用次数", font=ctk.CTkFont(weight="bold"), text_color="#3498db").grid(row=0, column=1, padx=10, pady=8, sticky="w")
+    ctk.CTkLabel(header_frame, text="今日调用次数", font=ctk.CTkFont(weight="bold"), text_color="#3498db").grid(row=0, column=2, padx=10, pady=8, sticky="w")
+    ctk.CTkLabel(header_frame, text="最后调用时间", font=ctk.CTkFont(weight="bold"), text_color="#3498db").grid(row=0, column=3, padx=10, pady=8, sticky="w")
+
+    # 表格数据
+    if api_key_stats:
+        for i, (key, stats) in enumerate(api_key_stats.items(), 1):
+            # 交替行颜色
+            row_bg = "#1a1a2e" if i % 2 == 0 else "#16213e"
+            row_frame = ctk.CTkFrame(table_frame, fg_color=row_bg, corner_radius=5)
+            row_frame.pack(fill="x", pady=2)
+            row_frame.grid_columnconfigure(0, weight=2)
+            row_frame.grid_columnconfigure(1, weight=1)
+            row_frame.grid_columnconfigure(2, weight=1)
+            row_frame.grid_columnconfigure(3, weight=2)
+
+            # API Key
+            key_label = ctk.CTkLabel(row_frame, text=key[:30] + "...", text_color="#ffffff")
+            key_label.grid(row=0, column=0, padx=10, pady=8, sticky="w")
+
+            # 总调用次数
+            total_calls = stats.get("total_calls", 0)
+            total_calls_label = ctk.CTkLabel(row_frame, text=str(total_calls), text_color="#3498db")
+            total_calls_label.grid(row=0, column=1, padx=10, pady=8, sticky="w")
+
+            # 今日调用次数
+            today_calls = stats.get("calls_today", 0)
+            today_calls_label = ctk.CTkLabel(row_frame, text=str(today_calls), text_color="#4CAF50")
+            today_calls_label.grid(row=0, column=2, padx=10, pady=8, sticky="w")
+
+            # 最后调用时间
+            last_call = stats.get("last_call", "-").split('.')[0]
+            last_call_label = ctk.CTkLabel(row_frame, text=last_call, text_color="#95a5a6")
+            last_call_label.grid(row=0, column=3, padx=10, pady=8, sticky="w")
+    else:
+        no_data_frame = ctk.CTkFrame(table_frame, corner_radius=10, fg_color="#1a1a2e")
+        no_data_frame.pack(fill="both", expand=True, pady=20)
+        no_data_label = ctk.CTkLabel(
+            no_data_frame,
+            text="暂无API调用数据",
+            font=ctk.CTkFont(size=14),
+            text_color="#95a5a6"
+        )
+        no_data_label.pack(pady=40)
+
+    # 操作按钮区域
+    buttons_frame = ctk.CTkFrame(dashboard_tab, fg_color="transparent")
+    buttons_frame.pack(fill="x", padx=20, pady=10)
+    buttons_frame.grid_columnconfigure(0, weight=1)
+
+    # 刷新按钮
+    refresh_btn = ctk.CTkButton(
+        buttons_frame,
+        text="🔄 刷新数据",
+        command=lambda: gui.refresh_dashboard(dashboard_tab),
+        fg_color="#3498db",
+        hover_color="#2980b9",
+        font=ctk.CTkFont(size=12, weight="bold")
+    )
+    refresh_btn.pack(side="right", padx=10)
+
+    # 导出数据按钮
+    export_btn = ctk.CTkButton(
+        buttons_frame,
+        text="📤 导出统计",
+        command=lambda: gui.export_dashboard_data(),
+        fg_color="#27ae60",
+        hover_color="#229954",
+        font=ctk.CTkFont(size=12, weight="bold")
+    )
+    export_btn.pack(side="right", padx=10)
+
+
+def refresh_dashboard(gui, dashboard_tab):
+    """刷新仪表盘数据"""
+    # 清除现有仪表盘内容
+    for widget in dashboard_tab.winfo_children():
+        widget.destroy()
+
+    # 重新创建仪表盘UI
+    gui.create_dashboard_ui(dashboard_tab)
+
+
+def export_dashboard_data(gui):
+    """导出仪表盘数据"""
+    try:
+        import json
+        import datetime
+
+        # 准备导出数据（读取内存中的实时统计）
+        api_key_stats = gui.api_key_stats_store.snapshot()
+        export_data = {
+            "export_time": datetime.datetime.now().isoformat(),
+            "total_calls": sum(stats.get("total_calls", 0) for stats in api_key_stats.values()),
+            "today_calls": sum(stats.get("calls_today", 0) for stats in api_key_stats.values()),
+            "active_api_keys": len([key for key, stats in api_key_stats.items() if stats.get("total_calls", 0) > 0]),
+            "worker_pool": gui.worker_pool.get_stats(),
+            "request_queue": gui.request_scheduler.get_stats(),
+            "response_cache": gui.response_cache.get_stats(),
+            "coalesced_requests": gui.inflight_requests.get_stats(),
+            "models": gui.model_manager.get_stats(),
+            "backends": gui.backends.get_stats(),
+            "model_catalog": gui.model_catalog.get_stats(),
+
+            "api_key_stats": api_key_stats
+        }
+
+        # 生成文件名
+        filename = f"api_dashboard_export_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        filepath = gui.get_app_data_path(filename)
+
+        # 写入文件
+        with open(filepath, "w", encoding="utf-8") as f:
+            json.dump(export_data, f, ensure_ascii=False, indent=2)
+
+        # 显示成功消息
+        gui.add_message("system", "系统", f"仪表盘数据已导出到: {filename}")
+    except Exception as e:
+        # 显示错误消息
+        gui.add_message("system", "系统", f"导出仪表盘数据失败: {str(e)}")
@@ -0,0 +1,122 @@
+import threading
+from tkinter import scrolledtext
+
+import customtkinter as ctk
+
+
+def open_port_scan_window(gui):
+    """打开端口扫描窗口"""
+    window = ctk.CTkToplevel(gui.window)
+    window.title("端口扫描")
+    window.geometry("600x500")
+    window.transient(gui.window)
+    window.grab_set()
+
+    window.grid_columnconfigure(0, weight=1)
+    window.grid_rowconfigure(4, weight=1)
+
+    # 标题
+    title_label = ctk.CTkLabel(
+        window,
+        text="🔍 端口扫描工具",
+        font=ctk.CTkFont(size=20, weight="bold")
+    )
+    title_label.grid(row=0, column=0, columnspan=2, pady=(20, 20))
+
+    # 目标IP
+    ip_label = ctk.CTkLabel(window, text="目标IP:")
+    ip_label.grid(row=1, column=0, padx=20, pady=10, sticky="e")
+
+    gui.ip_entry = ctk.CTkEntry(window, width=300)
+    gui.ip_entry.insert(0, "127.0.0.1")
+    gui.ip_entry.grid(row=1, column=1, padx=20, pady=10, sticky="w")
+
+    # 端口范围
+    port_range_label = ctk.CTkLabel(window, text="端口范围:")
+    port_range_label.grid(row=2, column=0, padx=20, pady=10, sticky="e")
+
+    range_frame = ctk.CTkFrame(window, fg_color="transparent")
+    range_frame.grid(row=2, column=1, padx=20, pady=10, sticky="w")
+
+    gui.start_port_entry = ctk.CTkEntry(range_frame, width=100, placeholder_text="开始端口")
+    gui.start_port_entry.insert(0, "1")
+    gui.start_port_entry.grid(row=0, column=0, padx=(0, 10))
+
+    ctk.CTkLabel(range_frame, text="-").grid(row=0, column=1, padx=5)
+
+    gui.end_port_entry = ctk.CTkEntry(range_frame, width=100, placeholder_text="结束端口")
+    gui.end_port_entry.insert(0, "10000")
+    gui.end_port_entry.grid(row=0, column=2, padx=(10, 0))
+
+    # 扫描按钮
+    def start_scan():
+        ip = gui.ip_entry.get().strip()
+        try:
+            start_port = int(gui.start_port_entry.get().strip())
+            end_port = int(gui.end_port_entry.get().strip())
+        except ValueError:
+            result_text.configure(state="normal")
+            result_text.delete(1.0, "end")
+            result_text.insert(1.0, "错误: 端口必须是数字")
+            result_text.configure(state="disabled")
+            return
+
+        if start_port < 1 or end_port > 65535 or start_port > end_port:
+            result_text.configure(state="normal")
+            result_text.delete(1.0, "end")
+            result_text.insert(1.0, "错误: 端口范围无效 (1-65535)")
+            result_text.configure(state="disabled")
+            return
+
+        # 禁用按钮
+        scan_btn.configure(state="disabled")
+        result_text.configure(state="normal")
+        result_text.delete(1.0, "end")
+        result_text.insert(1.0, f"开始扫描 {ip}:{start_port}-{end_port}...\n")
+        result_text.configure(state="disabled")
+
+        # 在新线程中执行扫描
+        def scan_thread():
+            results = gui.scan_ports(ip, start_port, end_port)
+
+            # 更新结果
+            window.after(0, lambda: update_results(results))
+
+        def update_results(results):
+            result_text.configure(state="normal")
+            result_text.delete(1.0, "end")
+            if results:
+                result_text.insert(1.0, f"扫描完成，找到 {len(results)} 个开放端口:\n\n")
+                for port in results:
+                    result_text.insert("end", f"✅ 端口 {port} 开放\n")
+            else:
+                result_text.insert(1.0, "扫描完成，未找到开放端口")
+            result_text.configure(state="disabled")
+            scan_btn.configure(state="normal")
+
+        threading.Thread(target=scan_thread, daemon=True).start()
+
+    scan_btn = ctk.CTkButton(
+        window,
+        text="开始扫描",
+        command=start_scan,
+        fg_color="#27ae60",
+        hover_color="#2ecc71"
+    )
+    scan_btn.grid(row=3, column=0, columnspan=2, padx=20, pady=20, sticky="ew")
+
+    # 结果显示
+    result_frame = ctk.CTkFrame(window, corner_radius=8)
+    result_frame.grid(row=4, column=0, columnspan=2, padx=20, pady=(0, 20), sticky="nsew")
+
+    result_text = scrolledtext.ScrolledText(
+        result_frame,
+        wrap="word",
+        bg="#2b2b2b",
+        fg="white",
+        font=("Microsoft YaHei", 12),
+        padx=15,
+        pady=15,
+        state="disabled"
+    )
+    result_text.pack(fill="both", expand=True)
@@ -0,0 +1,188 @@
+import customtkinter as ctk
+
+
+def init_tts_engine(gui):
+    """初始化TTS引擎"""
+    try:
+        import pyttsx3
+        gui.tts_engine = pyttsx3.init()
+
+        # 应用设置
+        try:
+            gui.tts_engine.setProperty('rate', gui.tts_rate)
+            gui.tts_engine.setProperty('volume', gui.tts_volume)
+
+            # 设置声音
+            voices = gui.tts_engine.getProperty('voices')
+            if voices and gui.tts_voice_index < len(voices):
+                gui.tts_engine.setProperty('voice', voices[gui.tts_voice_index].id)
+        except Exception as e:
+            print(f"应用TTS设置失败: {str(e)}")
+
+        print("TTS引擎已初始化")
+    except ImportError:
+        print("pyttsx3未安装，无法初始化TTS")
+        gui.tts_enabled = False
+    except Exception as e:
+        print(f"初始化TTS失败: {str(e)}")
+
+
+def stop_tts_engine(gui):
+    """停止TTS引擎"""
+    if gui.tts_engine:
+        try:
+            gui.tts_engine.stop()
+        except:
+            pass
+        gui.tts_engine = None
+    print("TTS引擎已停止")
+
+
+def speak_text(gui, text):
+    """使用TTS朗读文本"""
+    if not gui.tts_enabled:
+        return
+
+    if gui.tts_mode == "local":
+        if not gui.tts_engine:
+            return
+        try:
+            gui.tts_engine.say(text)
+            gui.tts_engine.runAndWait()
+        except Exception as e:
+            print(f"TTS朗读失败: {str(e)}")
+    else:
+        print("在线TTS模式待实现")
+
+
+def open_tts_settings(gui, parent_window=None):
+    """打开TTS设置面板"""
+    window = ctk.CTkToplevel(parent_window if parent_window else gui.window)
+    window.title("TTS设置")
+    window.geometry("500x450")
+    if parent_window:
+        window.transient(parent_window)
+    window.grab_set()
+
+    window.grid_columnconfigure(0, weight=1)
+    window.grid_columnconfigure(1, weight=1)
+
+    # 标题
+    title_label = ctk.CTkLabel(
+        window,
+        text="⚙️ TTS语音设置",
+        font=ctk.CTkFont(size=20, weight="bold")
+    )
+    title_label.grid(row=0, column=0, columnspan=2, pady=(20, 20))
+
+    # 语速
+    rate_label = ctk.CTkLabel(window, text="语速:")
+    rate_label.grid(row=1, column=0, padx=20, pady=10, sticky="e")
+
+    rate_var = ctk.IntVar(value=gui.tts_rate)
+
+    rate_slider = ctk.CTkSlider(
+        window,
+        from_=50,
+        to=400,
+        variable=rate_var,
+        width=200
+    )
+    rate_slider.grid(row=1, column=1, padx=20, pady=10, sticky="w")
+
+    rate_value_label = ctk.CTkLabel(window, textvariable=rate_var)
+    rate_value_label.grid(row=1, column=1, padx=20, pady=10, sticky="e")
+
+    # 音量
+    volume_label = ctk.CTkLabel(window, text="音量:")
+    volume_label.grid(row=2, column=0, padx=20, pady=10, sticky="e")
+
+    volume_var = ctk.DoubleVar(value=gui.tts_volume)
+
+    volume_slider = ctk.CTkSlider(
+        window,
+        from_=0.0,
+        to=1.0,
+        variable=volume_var,
+        width=200
+    )
+    volume_slider.grid(row=2, column=1, padx=20, pady=10, sticky="w")
+
+    def update_volume_label(*args):
+        volume_value_label.configure(text=f"{int(volume_var.get() * 100)}%")
+
+    volume_var.trace_add("write", update_volume_label)
+
+    volume_value_label = ctk.CTkLabel(window, text=f"{int(gui.tts_volume * 100)}%")
+    volume_value_label.grid(row=2, column=1, padx=20, pady=10, sticky="e")
+
+    # 声音选择（如果本地TTS可用）
+    voice_label = ctk.CTkLabel(window, text="声音:")
+    voice_label.grid(row=3, column=0, padx=20, pady=10, sticky="e")
+
+    voice_var = ctk.StringVar(value="默认")
+    voice_options = ["默认"]
+
+    # 获取可用声音
+    if gui.tts_engine:
+        try:
+            voices = gui.tts_engine.getProperty('voices')
+            voice_options = [f"{i+1}. {voice.name}" for i, voice in enumerate(voices)]
+            if voice_options:
+                voice_var.set(voice_options[min(gui.tts_voice_index, len(voice_options)-1)])
+        except:
+            pass
+
+    voice_dropdown = ctk.CTkComboBox(
+        window,
+        values=voice_options,
+        variable=voice_var,
+        width=200
+    )
+    voice_dropdown.grid(row=3, column=1, padx=20, pady=10, sticky="w")
+
+    # 测试按钮
+    def test_tts():
+        test_text = "你好，这是TTS语音测试"
+        gui.speak_text(test_text)
+
+    test_btn = ctk.CTkButton(
+        window,
+        text="🔊 测试语音",
+        fg_color="#27ae60",
+        hover_color="#2ecc71",
+        command=test_tts
+    )
+    test_btn.grid(row=4, column=0, columnspan=2, padx=20, pady=20, sticky="ew")
+
+    # 保存按钮
+    def save_settings():
+        gui.tts_rate = rate_var.get()
+        gui.tts_volume = volume_var.get()
+
+        # 设置声音
+        if gui.tts_engine:
+            try:
+                gui.tts_engine.setProperty('rate', gui.tts_rate)
+                gui.tts_engine.setProperty('volume', gui.tts_volume)
+
+                if voice_options and voice_options != ["默认"]:
+                    idx = voice_options.index(voice_var.get())
+                    gui.tts_voice_index = idx
+                    voices = gui.tts_engine.getProperty('voices')
+                    if idx < len(voices):
+                        gui.tts_engine.setProperty('voice', voices[idx].id)
+            except Exception as e:
+                print(f"设置TTS属性失败: {str(e)}")
+
+        window.destroy()
+        if parent_window:
+            parent_window.destroy()
+            gui.open_external_call_console()
+
+    save_btn = ctk.CTkButton(
+        window,
+        text="保存设置",
+        command=save_settings
+    )
+    save_btn.grid(row=5, column=0, columnspan=2, padx=20, pady=(0, 20), sticky="ew")
@@ -3,74 +3,30 @@ import threading
 import time
 from tkinter import scrolledtext
 import requests
-import websocket
 import json
 from typing import List, Dict
-import flask
 import os
-import sys
 import uuid
-from datetime import datetime, timedelta
-import configparser
 from collections import deque
 import gc
-import psutil
 
 # 导入本地搭建管理器
 from local_setup.setup_manager import SetupManager
-from servers.main_server import MainServer
-from servers.memory_server import MemoryServer
-from servers.agent_server import AgentServer
-from servers.monitor_server import MonitorServer
+from core.chat_service import ChatService
+from utils.request_scheduler import SchedulerQueueFull, SchedulerTimeout, PRIORITY_GUI
 
-
-class OllamaChatGUI:
+class OllamaChatGUI(ChatService):
     def __init__(self):
         # 初始化窗口
         ctk.set_appearance_mode("dark")  # 深色模式
         ctk.set_default_color_theme("blue")  # 蓝色主题
 
-        # Ollama配置
-        self.base_url = "http://localhost:11434"  # Ollama默认地址
-        try:
-            self._cached_models = self.get_available_models()
-            self.current_model = self._cached_models[0] if self._cached_models else ""
-        except Exception as e:
-            print(f"获取模型列表失败: {str(e)}")
-            self._cached_models = ["llama2", "mistral", "codellama"]
-            self.current_model = self._cached_models[0]
+        # 非界面部分（配置、HTTP连接池、请求调度、会话等）由ChatService初始化
+        super().__init__()
+
+        # 本地搭建管理器
+        self.setup_manager = SetupManager()
 
-        # API服务配置
-        self.api_server_enabled = False
-        self.api_server_port = 5000
-        try:
-            self.api_keys = self.load_api_keys()
-        except Exception as e:
-            print(f"加载API密钥失败: {str(e)}")
-            self.api_keys = []
-        self.api_server = None
-        # API Key调用统计
-        try:
-            self.api_key_stats = self.load_api_key_stats()
-        except Exception as e:
-            print(f"加载API密钥统计失败: {str(e)}")
-            self.api_key_stats = {}
-        
-        # 向外调用配置
-        self.external_calls = []  # 向外调用配置列表
-        try:
-            self.external_calls = self.load_external_calls()
-        except Exception as e:
-            print(f"加载向外调用配置失败: {str(e)}")
-            self.external_calls = []
-        # 向外调用服务状态
-        self.external_call_enabled = False
-        
-        # MCP Router配置
-        self.mcp_router_enabled = False
-        self.mcp_router_port = 8000
-        self.mcp_router = None
-        
         # TTS配置
         self.tts_enabled = False
         self.tts_engine = None
@@ -78,49 +34,7 @@ class OllamaChatGUI:
         self.tts_rate = 200  # 语速
         self.tts_volume = 1.0  # 音量 0.0-1.0
         self.tts_voice_index = 0  # 声音索引
-        
-        # 初始化本地控制台窗口
-        print("启动本地控制台...")
-        self.window = ctk.CTk()
-        self.window.title("Ollama Chat Client - 本地AI助手")
-        self.window.geometry("1050x700")
-        # 设置窗口最小尺寸
-        self.window.minsize(800, 500)
 
-        # 对话历史管理
-        self.max_history_rounds = 20  # 最大对话轮数
-        # 为每个API Key创建独立的对话历史
-        self.conversation_histories = {}  # {api_key: deque}
-        # 全局对话历史（用于GUI）
-        self.conversation_history = deque(maxlen=self.max_history_rounds)
-
-        # API请求处理配置
-        self.max_concurrent_requests = 5  # 最大并发请求数
-        self.request_timeout = 60  # 请求超时时间（秒）
-        # 请求队列控制
-        self.request_semaphore = threading.Semaphore(self.max_concurrent_requests)
-
-        # 内存管理配置
-        self.memory_check_interval = 300  # 内存检查间隔（秒）- 增加间隔减少资源占用
-        self.max_memory_usage = 85  # 最大内存使用率
-        # GPU内存管理配置
-        self.gpu_memory_check_enabled = False  # 禁用GPU内存监控以减少资源占用
-        
-        # 本地搭建管理器
-        self.setup_manager = SetupManager()
-        
-        # 服务器实例
-        self.servers = {
-            'main': None,
-            'memory': None,
-            'agent': None,
-            'monitor': None
-        }
-        
-        self.max_gpu_memory_usage = 80  # 最大GPU内存使用率
-        # 启动内存监控线程
-        self.memory_monitor_thread = threading.Thread(target=self.monitor_memory, daemon=True)
-        self.memory_monitor_thread.start()
 
         # 是否正在等待AI回复
         self._waiting_response = False
@@ -140,33 +54,14 @@ class OllamaChatGUI:
         # 设置窗口最小尺寸
         self.window.minsize(800, 500)
 
-        # 对话历史管理
-        self.max_history_rounds = 20  # 最大对话轮数
-        # 为每个API Key创建独立的对话历史
-        self.conversation_histories = {}  # {api_key: deque}
-        # 全局对话历史（用于GUI）
-        self.conversation_history = deque(maxlen=self.max_history_rounds)
-
-        # API请求处理配置
-        self.max_concurrent_requests = 5  # 最大并发请求数
-        self.request_timeout = 60  # 请求超时时间（秒）
-        # 请求队列控制
-        self.request_semaphore = threading.Semaphore(self.max_concurrent_requests)
-
-        # 内存管理配置
-        self.memory_check_interval = 300  # 内存检查间隔（秒）- 增加间隔减少资源占用
-        self.max_memory_usage = 85  # 最大内存使用率
-        # GPU内存管理配置
-        self.gpu_memory_check_enabled = False  # 禁用GPU内存监控以减少资源占用
-
         # 加载配置
         self.load_config()
+        # 按配置重新初始化依赖配置的组件
+        self.apply_config()
 
-        # 重新初始化依赖配置的组件
-        # 重新初始化请求信号量
-        self.request_semaphore = threading.Semaphore(self.max_concurrent_requests)
-        # 重新初始化全局对话历史
-        self.conversation_history = deque(maxlen=self.max_history_rounds)
+        # 模型列表在后台获取，变化时更新下拉框和模型查看器（界面创建前订阅，避免漏掉首次结果）
+        self.model_catalog.subscribe(self._on_models_changed)
+        self.model_catalog.refresh()
 
         self.setup_ui()
         self.test_connection()
@@ -608,37 +503,48 @@ class OllamaChatGUI:
         new_url = self.base_url_entry.get().strip()
         if new_url:
             self.base_url = new_url
-            # 测试新地址
-            self._cached_models = self.get_available_models()
-            self.model_dropdown.configure(values=self._cached_models)
-            if self._cached_models:
-                self.current_model = self._cached_models[0]
-                self.model_dropdown.set(self.current_model)
+            self.backends.configure(self._ollama_urls())
+
+            # 在后台获取新地址的模型列表，获取成功后切换到第一个模型
+            def fetch_models():
+                models = self.model_catalog.refresh_now()
+                if models:
+                    self.window.after(0, self._switch_to_model, models[0])
+
+            threading.Thread(target=fetch_models, daemon=True).start()
             self.add_message("system", "系统", f"Ollama地址已更新为: {new_url}")
             self.save_config()
 
+    def _switch_to_model(self, model):
+        """切换当前模型并同步下拉框"""
+        self.current_model = model
+        self.model_dropdown.set(model)
+        self.model_manager.set_primary(model)
+        self.model_manager.preload_async(model)
+
     def on_window_resize(self, event):
         """窗口缩放事件处理"""
         # 可以在这里添加窗口缩放时的逻辑
         pass
 
-    def get_available_models(self):
-        """获取可用的Ollama模型"""
-        try:
-            response = requests.get(f"{self.base_url}/api/tags", timeout=5)
-            if response.status_code == 200:
-                models = response.json().get("models", [])
-                return [model["name"] for model in models]
-        except (requests.RequestException, ValueError, KeyError):
-            pass
-        return ["llama2", "mistral", "codellama"]  # 默认模型列表
+    def _on_models_changed(self, models):
+        """模型目录变化通知（在刷新线程中调用）"""
+        self.window.after(0, self._apply_model_list, models)
+
+    def _apply_model_list(self, models):
+        """把最新的模型列表应用到下拉框和模型查看器"""
+        self._cached_models = models or self.model_catalog.fallback
+        self.model_dropdown.configure(values=self._cached_models)
+        if not self.current_model and models:
+            self._switch_to_model(models[0])
+        self._render_model_viewer(self._cached_models)
 
     def test_connection(self):
         """测试Ollama连接"""
 
         def test():
             try:
-                response = requests.get(f"{self.base_url}/api/tags", timeout=5)
+                response = self.http.get(f"{self.base_url}/api/tags", timeout=5)
                 if response.status_code == 200:
                     self.window.after(0, self.status_label.configure,
                         {"text": "状态: 已连接 ✅", "text_color": "lightgreen"}
@@ -661,25 +567,24 @@ class OllamaChatGUI:
     def change_model(self, choice):
         """切换模型"""
         self.current_model = choice
+        # 新模型成为热模型，并在后台预加载
+        self.model_manager.set_primary(choice)
+        self.model_manager.preload_async(choice)
         self.add_message("system", "系统", f"已切换到模型: {choice}")
 
     def refresh_models(self):
-        """刷新模型列表"""
-        models = self.get_available_models()
-        self._cached_models = models
-        self.model_dropdown.configure(values=models)
-        if models:
-            self.model_dropdown.set(models[0])
-            self.current_model = models[0]
+        """刷新模型列表（在后台获取，列表变化时自动更新下拉框）"""
+        self.model_catalog.invalidate()
 
     def refresh_model_viewer(self):
         """刷新模型查看器列表"""
+        self._render_model_viewer(self.get_available_models())
+
+    def _render_model_viewer(self, models):
+        """重建模型查看器列表"""
         # 清空现有模型列表
         for widget in self.model_listbox.winfo_children():
             widget.destroy()
-
-        # 获取可用模型
-        models = self.get_available_models()
         
         # 存储选中的模型
         self.selected_model = None
@@ -748,13 +653,12 @@ class OllamaChatGUI:
                     "name": self.selected_model
                 }
                 
-                response = requests.post(url, json=data, timeout=30)
+                response = self.http.post(url, json=data, timeout=30)
                 
                 if response.status_code == 200:
                     self.add_message("system", "系统", f"模型 '{self.selected_model}' 删除成功")
-                    # 刷新模型列表和查看器
-                    self.refresh_models()
-                    self.refresh_model_viewer()
+                    # 刷新模型列表（变化后自动更新下拉框和查看器）
+                    self.model_catalog.invalidate()
                 else:
                     self.add_message("system", "系统", f"删除模型失败: {response.status_code}")
             except Exception as e:
@@ -890,7 +794,7 @@ class OllamaChatGUI:
                     }
                     
                     # 发送请求
-                    response = requests.post(url, json=data, stream=True, timeout=300)
+                    response = self.http.post(url, json=data, stream=True, timeout=300)
                     
                     if response.status_code == 200:
                         # 处理流式响应
@@ -1003,7 +907,7 @@ class OllamaChatGUI:
                 if success:
                     result_text.insert(1.0, f"✅ 模型拉取成功: {model_name}\n\n{message}")
                     # 刷新模型列表
-                    window.after(1000, lambda: self.refresh_models())
+                    self.model_catalog.invalidate()
                 else:
                     result_text.insert(1.0, f"❌ 模型拉取失败: {message}")
                 result_text.configure(state="disabled")
@@ -1036,42 +940,6 @@ class OllamaChatGUI:
         )
         result_text.pack(fill="both", expand=True)
 
-    def pull_model(self, model_name):
-        """拉取模型"""
-        try:
-            # 构建API请求
-            url = f"{self.base_url}/api/pull"
-            data = {
-                "name": model_name
-            }
-            
-            # 发送请求
-            response = requests.post(url, json=data, stream=True, timeout=300)
-            
-            if response.status_code == 200:
-                # 处理流式响应
-                output = []
-                for chunk in response.iter_content(chunk_size=1024):
-                    if chunk:
-                        try:
-                            line = chunk.decode('utf-8')
-                            if line.strip():
-                                # 解析JSON
-                                import json
-                                data = json.loads(line)
-                                if 'status' in data:
-                                    output.append(data['status'])
-                                    if 'digest' in data:
-                                        output.append(f"  进度: {data.get('completed', 0)}/{data.get('total', 0)}")
-                        except:
-                            pass
-                
-                return True, "\n".join(output)
-            else:
-                return False, f"HTTP错误: {response.status_code}"
-        except Exception as e:
-            return False, str(e)
-
     def clear_conversation(self):
         """清除对话历史"""
         self.conversation_history = []
@@ -1152,15 +1020,14 @@ class OllamaChatGUI:
         animate()
 
     def get_ai_response(self, message):
-        """获取AI响应（使用 /api/chat 支持多轮对话）"""
+        """获取AI响应（使用 /api/chat 支持多轮对话，可选流式输出）"""
         connected = True
         error_msg = ""
+        slot_acquired = False
         try:
-            # 限制消息长度，避免过长消息占用过多内存
+            # 限制AI回复长度，避免过长回复占用过多内存
             max_message_length = 5000  # 5KB，减少显存占用
-            if len(message) > max_message_length:
-                message = message[:max_message_length] + "...（消息过长，已截断）"
-                print("用户消息过长，已截断")
+            model = self.current_model
 
             # 检查是否启用联网搜索
             search_results = []
@@ -1179,81 +1046,92 @@ class OllamaChatGUI:
                 else:
                     self.add_message("system", "系统", "联网搜索无结果，将基于本地知识回答")
 
-            # 将用户消息加入历史
-            self.conversation_history.append({
+            # 用户消息暂不写入历史，待回复完成后与AI回复一起提交
+            # 单条消息超出整个上下文预算时截断
+            user_message = self.context_builder.fit_message({
                 "role": "user",
                 "content": message
-            })
-
-            # 构建请求时对历史做快照，避免与主线程竞争
-            messages_snapshot = list(self.conversation_history)
-
-            # 进一步限制历史记录长度，减少显存占用
-            if len(messages_snapshot) > 10:  # 最多保留10条消息
-                messages_snapshot = messages_snapshot[-10:]
+            }, model)
 
             # 如果有搜索结果，构建增强的消息
+            extra_messages = []
             if search_results:
                 search_summary = "\n".join(search_results)
                 # 创建一个系统消息，包含搜索结果
-                enhanced_message = {
+                extra_messages.append({
                     "role": "system",
                     "content": f"基于以下搜索结果，回答用户的问题：\n\n{search_summary}\n\n请综合搜索结果和你的知识，提供一个全面、准确的回答。"
-                }
-                messages_snapshot.append(enhanced_message)
+                })
+
+            # 对历史做快照，并按模型的token预算从最近的对话往前装入
+            messages_snapshot = self.context_builder.build(
+                list(self.conversation_history), user_message, model, suffix=extra_messages
+            )
 
             data = {
-                "model": self.current_model,
+                "model": model,
                 "messages": messages_snapshot,
-                "stream": False
+                "stream": self.stream_response,
+                "keep_alive": self.model_manager.keep_alive_for(model)
             }
 
-            response = requests.post(
-                f"{self.base_url}/api/chat",
-                json=data,
-                timeout=self.request_timeout
-            )
-
-            if response.status_code == 200:
-                result = response.json()
-                ai_response = result.get("message", {}).get("content", "")
+            # 控制台对话优先于API Key调用获得槽位
+            self.request_scheduler.acquire("gui", PRIORITY_GUI, timeout=self.request_timeout)
+            slot_acquired = True
 
-                # 限制AI回复长度
-                if len(ai_response) > max_message_length:
-                    ai_response = ai_response[:max_message_length] + "...（回复过长，已截断）"
-                    print("AI回复过长，已截断")
-
-                # 将AI回复也加入历史
-                self.conversation_history.append({
-                    "role": "assistant",
-                    "content": ai_response
-                })
+            # 由后端池选择Ollama后端（连接失败时自动换下一个后端）
+            with self.backends.request(
+                "POST",
+                "/api/chat",
+                model=model,
+                json=data,
+                timeout=self.request_timeout,
+                stream=self.stream_response
+            ) as response:
+                if response.status_code == 200:
+                    if self.stream_response:
+                        ai_response = self._read_stream_response(response)
+                    else:
+                        result = response.json()
+                        ai_response = result.get("message", {}).get("content", "")
+                        del result
+
+                    # 限制AI回复长度
+                    if len(ai_response) > max_message_length:
+                        ai_response = ai_response[:max_message_length] + "...（回复过长，已截断）"
+                        print("AI回复过长，已截断")
+
+                    # 一次性提交本轮对话（用户消息 + AI回复）
+                    self.conversation_history.extend([
+                        user_message,
+                        {
+                            "role": "assistant",
+                            "content": ai_response
+                        }
+                    ])
 
-                self.add_message("assistant", "AI", ai_response)
+                    if not self.stream_response:
+                        self.add_message("assistant", "AI", ai_response)
                 
-                # 释放资源
-                del result, messages_snapshot
-                if 'search_summary' in locals():
-                    del search_summary
-                gc.collect()
-            else:
-                # 请求失败，安全回滚用户消息
-                if self.conversation_history and self.conversation_history[-1].get("role") == "user":
-                    self.conversation_history.pop()
-                self.add_message("system", "系统", f"错误: {response.status_code}")
-                connected = False
-                error_msg = f"请求错误 ({response.status_code})"
+                    # 释放资源
+                    del messages_snapshot
+                    if 'search_summary' in locals():
+                        del search_summary
+                    gc.collect()
+                else:
+                    # 请求失败，历史未被修改，无需回滚
+                    self.add_message("system", "系统", f"错误: {response.status_code}")
+                    connected = False
+                    error_msg = f"请求错误 ({response.status_code})"
                 
-                # 释放资源
-                del messages_snapshot
-                if 'search_summary' in locals():
-                    del search_summary
-                gc.collect()
+                    # 释放资源
+                    del messages_snapshot
+                    if 'search_summary' in locals():
+                        del search_summary
+                    gc.collect()
 
         except requests.RequestException as e:
-            # 网络异常，安全回滚用户消息
-            if self.conversation_history and self.conversation_history[-1].get("role") == "user":
-                self.conversation_history.pop()
+            # 网络异常，历史未被修改，无需回滚
             self.add_message("system", "系统", f"请求失败: {str(e)}")
             connected = False
             error_msg = "连接失败 ❌"
@@ -1266,9 +1144,49 @@ class OllamaChatGUI:
             except:
                 pass
             gc.collect()
+        except (SchedulerQueueFull, SchedulerTimeout):
+            # 排队失败，历史未被修改
+            self.add_message("system", "系统", "请求繁忙，请稍后重试")
+            connected = False
+            error_msg = "请求繁忙 ⏳"
         finally:
+            if slot_acquired:
+                self.request_scheduler.release()
             self.window.after(0, self._set_sending_state, False, connected, error_msg)
 
+    def _read_stream_response(self, response):
+        """逐块读取Ollama的NDJSON流式响应，并实时追加到对话框
+
+        Returns:
+            完整的AI回复文本
+        """
+        parts = []
+        self.window.after(0, self._begin_stream_message, "assistant", "AI")
+        try:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                try:
+                    chunk = json.loads(line)
+                except ValueError:
+                    continue
+
+                if chunk.get("error"):
+                    raise requests.RequestException(chunk["error"])
+
+                content = chunk.get("message", {}).get("content", "")
+                if content:
+                    parts.append(content)
+                    self.window.after(0, self._append_stream_chunk, content)
+
+                if chunk.get("done"):
+                    break
+        finally:
+            response.close()
+            self.window.after(0, self._end_stream_message, "assistant", "".join(parts))
+
+        return "".join(parts)
+
     def add_message(self, sender, name, message):
         """添加消息到对话框"""
         self.window.after(0, self._add_message_gui, sender, name, message)
@@ -1312,152 +1230,39 @@ class OllamaChatGUI:
             
             threading.Thread(target=speak_in_thread, daemon=True).start()
 
-    def load_config(self):
-        """从文件加载配置"""
-        # 优先从config.ini加载配置
-        config_ini_path = self.get_app_data_path("config.ini")
-        config_json_path = self.get_app_data_path("config.json")
-        
-        try:
-            # 加载config.ini
-            if os.path.exists(config_ini_path):
-                # 创建一个自定义的ConfigParser，忽略值中的注释
-                class ConfigParserWithComments(configparser.ConfigParser):
-                    def get(self, section, option, *, raw=False, vars=None, fallback=configparser._UNSET):
-                        value = super().get(section, option, raw=raw, vars=vars, fallback=fallback)
-                        # 去除注释部分
-                        if isinstance(value, str):
-                            value = value.split('#')[0].strip()
-                        return value
-                    
-                    def getint(self, section, option, *, raw=False, vars=None, fallback=configparser._UNSET):
-                        value = self.get(section, option, raw=raw, vars=vars, fallback=fallback)
-                        if value != configparser._UNSET:
-                            try:
-                                return int(value)
-                            except ValueError:
-                                return fallback
-                        return fallback
-                    
-                    def getboolean(self, section, option, *, raw=False, vars=None, fallback=configparser._UNSET):
-                        value = self.get(section, option, raw=raw, vars=vars, fallback=fallback)
-                        if value != configparser._UNSET:
-                            if isinstance(value, str):
-                                value = value.lower()
-                                return value in ('true', '1', 'yes', 'on')
-                            return bool(value)
-                        return fallback
-                
-                config = ConfigParserWithComments()
-                config.read(config_ini_path, encoding="utf-8")
-                
-                # 服务器配置
-                if config.has_section("Server"):
-                    self.api_server_enabled = config.getboolean("Server", "enable_api_server", fallback=False)
-                    self.api_server_port = config.getint("Server", "api_server_port", fallback=5000)
-                
-                # Ollama配置
-                if config.has_section("Ollama"):
-                    self.base_url = config.get("Ollama", "base_url", fallback="http://localhost:11434")
-                    default_model = config.get("Ollama", "default_model", fallback="llama2")
-                    if default_model:
-                        self.current_model = default_model
-                
-                # API配置
-                if config.has_section("API"):
-                    self.use_api_key = config.getboolean("API", "enable_external_api", fallback=False)
-                    self.api_base_url = config.get("API", "external_api_base_url", fallback="https://api.openai.com/v1")
-                
-                # 性能配置
-                if config.has_section("Performance"):
-                    self.max_concurrent_requests = config.getint("Performance", "max_concurrent_requests", fallback=5)
-                    self.request_timeout = config.getint("Performance", "request_timeout", fallback=60)
-                    self.max_history_rounds = config.getint("Performance", "max_history_rounds", fallback=20)
-                    self.memory_check_interval = config.getint("Performance", "memory_check_interval", fallback=60)
-                    self.max_memory_usage = config.getint("Performance", "max_memory_usage", fallback=80)
-                    # GPU内存管理配置
-                    self.gpu_memory_check_enabled = config.getboolean("Performance", "gpu_memory_check_enabled", fallback=True)
-                    self.max_gpu_memory_usage = config.getint("Performance", "max_gpu_memory_usage", fallback=80)
-            
-            # 从config.json加载（保持向后兼容）
-            elif os.path.exists(config_json_path):
-                with open(config_json_path, "r", encoding="utf-8") as f:
-                    config = json.load(f)
-                    self.api_server_enabled = config.get("api_server_enabled", False)
-                    self.api_server_port = config.get("api_server_port", 5000)
-                    if "current_model" in config:
-                        self.current_model = config["current_model"]
-        except Exception as e:
-            print(f"加载配置失败: {e}")
+    def _begin_stream_message(self, sender, name):
+        """在GUI线程中插入流式消息的头部，并设置增量插入位置"""
+        self.conversation_text.configure(state="normal")
 
-    def save_config(self):
-        """保存配置到文件"""
-        config_ini_path = self.get_app_data_path("config.ini")
-        try:
-            config = configparser.ConfigParser()
-            
-            # 读取现有配置
-            if os.path.exists(config_ini_path):
-                config.read(config_ini_path, encoding="utf-8")
-            
-            # 更新配置
-            if not config.has_section("Server"):
-                config.add_section("Server")
-            config.set("Server", "enable_api_server", str(self.api_server_enabled))
-            config.set("Server", "api_server_port", str(self.api_server_port))
-            
-            if not config.has_section("Ollama"):
-                config.add_section("Ollama")
-            config.set("Ollama", "base_url", self.base_url)
-            config.set("Ollama", "default_model", self.current_model)
-            
-            if not config.has_section("Performance"):
-                config.add_section("Performance")
-            config.set("Performance", "max_concurrent_requests", str(self.max_concurrent_requests))
-            config.set("Performance", "request_timeout", str(self.request_timeout))
-            config.set("Performance", "max_history_rounds", str(self.max_history_rounds))
-            config.set("Performance", "memory_check_interval", str(self.memory_check_interval))
-            config.set("Performance", "max_memory_usage", str(self.max_memory_usage))
-            config.set("Performance", "gpu_memory_check_enabled", str(self.gpu_memory_check_enabled))
-            config.set("Performance", "max_gpu_memory_usage", str(self.max_gpu_memory_usage))
-            
-            # 保存配置
-            with open(config_ini_path, "w", encoding="utf-8") as f:
-                config.write(f)
-        except Exception as e:
-            print(f"保存配置失败: {e}")
+        timestamp = time.strftime("%H:%M:%S")
+        prefix = "🤖" if sender == "assistant" else "⚙️"
 
-    def get_app_data_path(self, filename):
-        """获取应用程序数据文件的正确路径（兼容打包后的环境）"""
-        if getattr(sys, 'frozen', False):
-            # 如果是打包后的可执行文件，使用可执行文件所在目录
-            base_path = os.path.dirname(sys.executable)
-        else:
-            # 开发环境，使用脚本所在目录
-            base_path = os.path.dirname(__file__)
-        return os.path.join(base_path, filename)
-    
-    def load_api_keys(self):
-        """加载API Keys"""
-        api_keys_path = self.get_app_data_path("api_keys.json")
-        try:
-            if os.path.exists(api_keys_path):
-                with open(api_keys_path, "r", encoding="utf-8") as f:
-                    return json.load(f)
-        except Exception as e:
-            print(f"加载API Keys失败: {e}")
-        return []
+        self.conversation_text.insert("end", f"\n[{timestamp}] {prefix} {name}:\n", f"timestamp_{sender}")
+        # 使用右侧重力的标记，后续片段都插入到该位置
+        self.conversation_text.mark_set("stream_insert", "end-1c")
+        self.conversation_text.mark_gravity("stream_insert", "right")
 
-    def save_api_keys(self):
-        """保存API Keys"""
-        api_keys_path = self.get_app_data_path("api_keys.json")
-        try:
-            with open(api_keys_path, "w", encoding="utf-8") as f:
-                json.dump(self.api_keys, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"保存API Keys失败: {e}")
+        self.conversation_text.see("end")
+        self.conversation_text.configure(state="disabled")
 
+    def _append_stream_chunk(self, chunk):
+        """在GUI线程中追加流式消息片段"""
+        self.conversation_text.configure(state="normal")
+        self.conversation_text.insert("stream_insert", chunk, "message_assistant")
+        self.conversation_text.see("end")
+        self.conversation_text.configure(state="disabled")
+
+    def _end_stream_message(self, sender, message):
+        """在GUI线程中结束流式消息"""
+        self.conversation_text.configure(state="normal")
+        self.conversation_text.insert("stream_insert", "\n" + "-" * 50 + "\n")
+        self.conversation_text.mark_unset("stream_insert")
+        self.conversation_text.see("end")
+        self.conversation_text.configure(state="disabled")
 
+        # 如果是AI回复且TTS启用，自动朗读
+        if sender == "assistant" and self.tts_enabled and message:
+            threading.Thread(target=self.speak_text, args=(message,), daemon=True).start()
 
     def view_api_keys(self):
         """查看已有的API Keys"""
@@ -1473,413 +1278,13 @@ class OllamaChatGUI:
         
         self.add_message("system", "系统", keys_info)
 
-    def create_api_app(self):
-        """创建API应用，支持阿里API调用方式"""
-        app = flask.Flask(__name__)
-        
-        # 初始化API调用速率限制
-        self.api_rate_limit = {}  # {api_key: {timestamp, count}}
-        self.api_rate_limit_window = 60  # 60秒窗口
-        self.api_rate_limit_max = 100  # 每分钟最多100次请求
-        self.api_ip_whitelist = []  # IP白名单（可选）
-        self.api_ip_blacklist = []  # IP黑名单
-        
-        # API认证中间件
-        @app.before_request
-        def authenticate():
-            # 跳过OPTIONS请求
-            if flask.request.method == 'OPTIONS':
-                return
-            
-            # 检查IP黑名单
-            client_ip = flask.request.remote_addr
-            if client_ip in self.api_ip_blacklist:
-                return flask.jsonify({"code": 403, "message": "IP address blocked", "data": None}), 403
-            
-            # 检查IP白名单（如果启用）
-            if self.api_ip_whitelist and client_ip not in self.api_ip_whitelist:
-                return flask.jsonify({"code": 403, "message": "IP address not allowed", "data": None}), 403
-            
-            # 获取API Key（支持多种认证方式）
-            api_key = None
-            
-            # 方式1: Bearer token（标准方式）
-            auth_header = flask.request.headers.get('Authorization')
-            if auth_header and auth_header.startswith('Bearer '):
-                api_key = auth_header[7:]
-            
-            # 方式2: 阿里API方式（通过公共参数）
-            if not api_key:
-                # 从查询参数或表单获取
-                api_key = flask.request.args.get('AccessKeyId') or flask.request.form.get('AccessKeyId')
-                
-            # 方式3: 从JSON请求体获取（阿里API可能的方式）
-            if not api_key:
-                try:
-                    data = flask.request.json
-                    if data:
-                        api_key = data.get('AccessKeyId')
-                except:
-                    pass
-            
-            if not api_key:
-                return flask.jsonify({"code": 401, "message": "Missing API Key", "data": None}), 401
-            
-            # 验证API Key
-            valid = False
-            api_key_info = None
-            for key_info in self.api_keys:
-                if key_info['key'] == api_key:
-                    api_key_info = key_info
-                    # 检查是否过期
-                    expires_at = datetime.fromisoformat(key_info['expires_at'])
-                    if datetime.now() < expires_at:
-                        valid = True
-                    break
-            
-            if not valid:
-                return flask.jsonify({"code": 401, "message": "Invalid or expired API Key", "data": None}), 401
-            
-            # 检查速率限制
-            current_time = time.time()
-            if api_key not in self.api_rate_limit:
-                self.api_rate_limit[api_key] = {'timestamp': current_time, 'count': 0}
-            
-            rate_info = self.api_rate_limit[api_key]
-            if current_time - rate_info['timestamp'] > self.api_rate_limit_window:
-                # 重置窗口
-                rate_info['timestamp'] = current_time
-                rate_info['count'] = 0
-            
-            if rate_info['count'] >= self.api_rate_limit_max:
-                return flask.jsonify({"code": 429, "message": "Too many requests", "data": None}), 429
-            
-            rate_info['count'] += 1
-            
-            # 确保为该API Key创建对话历史
-            if api_key not in self.conversation_histories:
-                self.conversation_histories[api_key] = deque(maxlen=self.max_history_rounds)
-            
-            # 记录API调用统计
-            self.record_api_call(api_key)
-        
-        # 聊天API端点（支持阿里API格式）
-        @app.route('/api/chat', methods=['POST'])
-        def chat():
-            try:
-                # 检查是否超过最大并发请求数
-                if not self.request_semaphore.acquire(blocking=False):
-                    return flask.jsonify({"code": 429, "message": "Too many concurrent requests", "data": None}), 429
-                
-                try:
-                    # 获取API Key
-                    api_key = None
-                    
-                    # 从请求中获取API Key
-                    if flask.request.is_json:
-                        data = flask.request.json
-                        api_key = data.get('AccessKeyId')
-                    if not api_key:
-                        api_key = flask.request.args.get('AccessKeyId') or flask.request.form.get('AccessKeyId')
-                    if not api_key:
-                        auth_header = flask.request.headers.get('Authorization')
-                        if auth_header and auth_header.startswith('Bearer '):
-                            api_key = auth_header[7:]
-                    
-                    # 解析请求（支持多种格式）
-                    message = None
-                    model = self.current_model
-                    
-                    # 方式1: 标准JSON格式
-                    if flask.request.is_json:
-                        data = flask.request.json
-                        message = data.get('message') or data.get('Message')  # 支持阿里API的参数名
-                        model = data.get('model', self.current_model) or data.get('Model', self.current_model)
-                    
-                    # 方式2: 表单格式（阿里API可能使用）
-                    if not message:
-                        message = flask.request.form.get('message') or flask.request.form.get('Message')
-                        model = flask.request.form.get('model', self.current_model) or flask.request.form.get('Model', self.current_model)
-                    
-                    # 方式3: 查询参数（阿里API可能使用）
-                    if not message:
-                        message = flask.request.args.get('message') or flask.request.args.get('Message')
-                        model = flask.request.args.get('model', self.current_model) or flask.request.args.get('Model', self.current_model)
-                    
-                    if not message:
-                        return flask.jsonify({"code": 400, "message": "Missing message", "data": None}), 400
-                    
-                    # 使用同步版本获取回复，传入API Key，添加超时
-                    import threading
-                    import queue
-                    
-                    # 创建结果队列
-                    result_queue = queue.Queue()
-                    
-                    # 定义工作函数
-                    def worker():
-                        try:
-                            result = self.get_ai_response_sync(message, model, api_key)
-                            result_queue.put((True, result))
-                        except Exception as e:
-                            result_queue.put((False, str(e)))
-                    
-                    # 启动工作线程
-                    thread = threading.Thread(target=worker)
-                    thread.daemon = True
-                    thread.start()
-                    
-                    # 等待结果，设置超时
-                    try:
-                        success, result = result_queue.get(timeout=self.request_timeout)
-                        if success:
-                            response = result
-                        else:
-                            return flask.jsonify({"code": 500, "message": result, "data": None}), 500
-                    except queue.Empty:
-                        return flask.jsonify({"code": 408, "message": "Request timeout", "data": None}), 408
-                    
-                    # 返回阿里API标准格式
-                    return flask.jsonify({
-                        "code": 200,
-                        "message": "Success",
-                        "data": {
-                            "response": response
-                        }
-                    })
-                finally:
-                    # 释放信号量
-                    self.request_semaphore.release()
-            except Exception as e:
-                # 确保释放信号量
-                try:
-                    self.request_semaphore.release()
-                except:
-                    pass
-                return flask.jsonify({"code": 500, "message": str(e), "data": None}), 500
-        
-        # 模型列表API端点（支持阿里API格式）
-        @app.route('/api/models', methods=['GET'])
-        def models():
-            try:
-                models = self.get_available_models()
-                # 返回阿里API标准格式
-                return flask.jsonify({
-                    "code": 200,
-                    "message": "Success",
-                    "data": {
-                        "models": models
-                    }
-                })
-            except Exception as e:
-                return flask.jsonify({"code": 500, "message": str(e), "data": None}), 500
-        
-        # WebSocket聊天API端点
-        @app.route('/api/chat/ws')
-        def chat_ws():
-            # 获取API Key
-            api_key = flask.request.args.get('AccessKeyId')
-            if not api_key:
-                # 尝试从查询参数获取
-                api_key = flask.request.args.get('api_key')
-            
-            # 验证API Key
-            valid = False
-            for key_info in self.api_keys:
-                if key_info['key'] == api_key:
-                    # 检查是否过期
-                    expires_at = datetime.fromisoformat(key_info['expires_at'])
-                    if datetime.now() < expires_at:
-                        valid = True
-                    break
-            
-            if not valid:
-                return flask.jsonify({"code": 401, "message": "Invalid or expired API Key", "data": None}), 401
-            
-            # 记录API调用统计
-            self.record_api_call(api_key)
-            
-            # 处理WebSocket连接
-            from flask import request
-            from werkzeug.wrappers import Response
-            
-            def wsgi_app(environ, start_response):
-                # 检查是否是WebSocket请求
-                if environ.get('HTTP_UPGRADE') == 'websocket':
-                    # 这里简化处理，实际应该使用专门的WebSocket库
-                    # 由于Flask默认不支持WebSocket，我们返回一个错误
-                    response = flask.jsonify({"code": 501, "message": "WebSocket not fully implemented", "data": None})
-                    return response(environ, start_response)
-                else:
-                    # 不是WebSocket请求，返回错误
-                    response = flask.jsonify({"code": 400, "message": "Not a WebSocket request", "data": None})
-                    return response(environ, start_response)
-            
-            return wsgi_app
-        
-        return app
-
-    def get_ai_response_sync(self, message, model=None, api_key=None):
-        """同步获取AI响应"""
-        if model:
-            self.current_model = model
-        
-        # 选择对话历史
-        if api_key:
-            # 使用API Key对应的对话历史
-            history = self.conversation_histories.get(api_key)
-            if not history:
-                history = deque(maxlen=self.max_history_rounds)
-                self.conversation_histories[api_key] = history
-        else:
-            # 使用全局对话历史（用于GUI）
-            history = self.conversation_history
-        
-        # 限制消息长度，避免过长消息占用过多内存
-        max_message_length = 5000  # 5KB，减少显存占用
-        if len(message) > max_message_length:
-            message = message[:max_message_length] + "...（消息过长，已截断）"
-            print("用户消息过长，已截断")
-
-        # 检查是否启用联网搜索
-        # API Key远程调用默认启用联网搜索
-        use_web_search = self.web_search_var.get() or api_key is not None
-        search_results = []
-        
-        if use_web_search:
-            # 执行联网搜索
-            print(f"执行联网搜索: {message}")
-            search_results = self.perform_web_search(message)
-            
-            if search_results:
-                print(f"联网搜索完成，获取到 {len(search_results)} 条相关结果")
-            else:
-                print("联网搜索无结果，将基于本地知识回答")
-
-        # 将用户消息加入历史
-        history.append({
-            "role": "user",
-            "content": message
-        })
-
-        # 构建请求时对历史做快照，避免与主线程竞争
-        messages_snapshot = list(history)
-
-        # 进一步限制历史记录长度，减少显存占用
-        if len(messages_snapshot) > 10:  # 最多保留10条消息
-            messages_snapshot = messages_snapshot[-10:]
-
-        # 如果有搜索结果，构建增强的消息
-        if search_results:
-            search_summary = "\n".join(search_results)
-            # 创建一个系统消息，包含搜索结果
-            enhanced_message = {
-                "role": "system",
-                "content": f"基于以下搜索结果，回答用户的问题：\n\n{search_summary}\n\n请综合搜索结果和你的知识，提供一个全面、准确的回答。"
-            }
-            messages_snapshot.append(enhanced_message)
-
-        data = {
-            "model": self.current_model,
-            "messages": messages_snapshot,
-            "stream": False
-        }
-
-        try:
-            response = requests.post(
-                f"{self.base_url}/api/chat",
-                json=data,
-                timeout=300
-            )
-
-            if response.status_code == 200:
-                result = response.json()
-                ai_response = result.get("message", {}).get("content", "")
-
-                # 限制AI回复长度
-                if len(ai_response) > max_message_length:
-                    ai_response = ai_response[:max_message_length] + "...（回复过长，已截断）"
-                    print("AI回复过长，已截断")
-
-                # 将AI回复也加入历史
-                history.append({
-                    "role": "assistant",
-                    "content": ai_response
-                })
-
-                # 释放资源
-                del result, messages_snapshot
-                if 'search_summary' in locals():
-                    del search_summary
-                gc.collect()
-
-                return ai_response
-            else:
-                # 请求失败，安全回滚用户消息
-                if history and history[-1].get("role") == "user":
-                    history.pop()
-                # 释放资源
-                del messages_snapshot
-                if 'search_summary' in locals():
-                    del search_summary
-                gc.collect()
-                return f"错误: {response.status_code}"
-        except Exception as e:
-            # 网络异常，安全回滚用户消息
-            if history and history[-1].get("role") == "user":
-                history.pop()
-            # 释放资源
-            try:
-                del messages_snapshot
-                if 'search_summary' in locals():
-                    del search_summary
-            except:
-                pass
-            gc.collect()
-            return f"错误: {str(e)}"
-
     def start_api_server(self):
-        """启动API服务"""
+        """启动API服务（端口优先从主窗口的 api_port_entry 获取）"""
         try:
-            # 获取端口，优先从主窗口的 api_port_entry 获取
-            try:
-                if hasattr(self, 'api_port_entry'):
-                    port = int(self.api_port_entry.get())
-                else:
-                    port = self.api_server_port
-            except (ValueError, AttributeError):
-                port = self.api_server_port
-            
-            self.api_server_port = port
-            
-            # 创建API应用
-            self.api_server = self.create_api_app()
-            
-            # 在后台线程中运行API服务
-            def run_server():
-                self.api_server.run(host='0.0.0.0', port=port, debug=False)
-            
-            threading.Thread(target=run_server, daemon=True).start()
-            
-            # 更新状态
-            self.api_server_enabled = True
-            self.add_message("system", "系统", f"API服务已启动，端口: {port}")
-            
-            # 保存配置
-            self.save_config()
-        except Exception as e:
-            self.add_message("system", "系统", f"API服务启动失败: {str(e)}")
-
-    def stop_api_server(self):
-        """停止API服务"""
-        # 注意：Flask的开发服务器不支持优雅停止
-        # 这里我们只是标记为已停止
-        self.api_server_enabled = False
-        self.add_message("system", "系统", "API服务已停止")
-        self.api_server = None
-        
-        # 保存配置
-        self.save_config()
+            port = int(self.api_port_entry.get())
+        except (ValueError, AttributeError):
+            port = self.api_server_port
+        super().start_api_server(port)
 
     def toggle_api_server(self):
         """切换API服务状态"""
@@ -1890,86 +1295,6 @@ class OllamaChatGUI:
     
 
 
-    def load_api_key_stats(self):
-        """加载API Key调用统计数据"""
-        stats_path = self.get_app_data_path("api_key_stats.json")
-        try:
-            if os.path.exists(stats_path):
-                with open(stats_path, "r", encoding="utf-8") as f:
-                    return json.load(f)
-        except Exception as e:
-            print(f"加载API Key统计数据失败: {e}")
-        return {}
-
-    def save_api_key_stats(self):
-        """保存API Key调用统计数据"""
-        stats_path = self.get_app_data_path("api_key_stats.json")
-        try:
-            with open(stats_path, "w", encoding="utf-8") as f:
-                json.dump(self.api_key_stats, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"保存API Key统计数据失败: {e}")
-    
-    def load_external_calls(self):
-        """加载向外调用配置"""
-        external_calls_path = self.get_app_data_path("external_calls.json")
-        try:
-            if os.path.exists(external_calls_path):
-                with open(external_calls_path, "r", encoding="utf-8") as f:
-                    return json.load(f)
-        except Exception as e:
-            print(f"加载向外调用配置失败: {str(e)}")
-        return []
-    
-    def save_external_calls(self):
-        """保存向外调用配置"""
-        external_calls_path = self.get_app_data_path("external_calls.json")
-        try:
-            # 确保目录存在
-            os.makedirs(os.path.dirname(external_calls_path), exist_ok=True)
-            # 保存配置
-            with open(external_calls_path, "w", encoding="utf-8") as f:
-                json.dump(self.external_calls, f, ensure_ascii=False, indent=2)
-            print(f"向外调用配置已保存到: {external_calls_path}")
-        except Exception as e:
-            print(f"保存向外调用配置失败: {str(e)}")
-            # 尝试使用绝对路径
-            try:
-                import tempfile
-                temp_path = os.path.join(tempfile.gettempdir(), "external_calls.json")
-                with open(temp_path, "w", encoding="utf-8") as f:
-                    json.dump(self.external_calls, f, ensure_ascii=False, indent=2)
-                print(f"向外调用配置已保存到临时路径: {temp_path}")
-            except Exception as e2:
-                print(f"保存到临时路径也失败: {str(e2)}")
-    
-    def create_external_call(self, name, model, model_type, url, port, api_key, expires_days):
-        """创建新的向外调用配置"""
-        # 生成唯一ID
-        call_id = str(uuid.uuid4())
-        # 计算过期时间
-        expires_at = (datetime.now() + timedelta(days=expires_days)).isoformat()
-        # 创建向外调用配置
-        external_call = {
-            "id": call_id,
-            "name": name,
-            "model": model,
-            "model_type": model_type,
-            "url": url,
-            "port": port,
-            "api_key": api_key,
-            "created_at": datetime.now().isoformat(),
-            "expires_at": expires_at,
-            "enabled": True,
-            "call_count": 0,
-            "last_call": None
-        }
-        # 添加到列表
-        self.external_calls.append(external_call)
-        # 保存配置
-        self.save_external_calls()
-        return external_call
-    
     def delete_external_call(self, call_id, console_window=None):
         """删除向外调用配置"""
         self.external_calls = [call for call in self.external_calls if call['id'] != call_id]
@@ -1979,177 +1304,6 @@ class OllamaChatGUI:
             console_window.destroy()
             self.open_external_call_console()
     
-    def make_external_call(self, call_id, message, use_websocket=True):
-        """执行向外调用"""
-        # 检查全局向外调用服务是否启用
-        if not self.external_call_enabled:
-            return "错误: 向外调用服务未启用"
-        
-        # 查找向外调用配置
-        external_call = None
-        for call in self.external_calls:
-            if call['id'] == call_id:
-                external_call = call
-                break
-        
-        if not external_call:
-            return "错误: 未找到向外调用配置"
-        
-        # 检查是否启用
-        if not external_call.get('enabled', True):
-            return "错误: 该向外调用已禁用"
-        
-        # 检查是否过期
-        expires_at = datetime.fromisoformat(external_call['expires_at'])
-        if datetime.now() > expires_at:
-            return "错误: 向外调用配置已过期"
-        
-        # 更新调用统计
-        external_call['call_count'] = external_call.get('call_count', 0) + 1
-        external_call['last_call'] = datetime.now().isoformat()
-        self.save_external_calls()
-        
-        # 构建URL
-        url = external_call['url'].strip()
-        port = external_call['port']
-        
-        # 检查URL是否已经包含端口
-        if ':' in url and not url.startswith(('http://', 'https://', 'ws://', 'wss://')):
-            # URL格式不正确，应该包含协议
-            return "错误: URL格式不正确，必须包含http://、https://、ws://或wss://"
-        
-        if use_websocket:
-            # WebSocket模式
-            try:
-                # 构建WebSocket URL
-                if '://' in url:
-                    # 已经包含协议，转换为WebSocket协议
-                    if url.startswith('http://'):
-                        ws_url = url.replace('http://', 'ws://')
-                    elif url.startswith('https://'):
-                        ws_url = url.replace('https://', 'wss://')
-                    else:
-                        # 已经是WebSocket协议
-                        ws_url = url
-                else:
-                    # 添加默认WebSocket协议
-                    ws_url = f"ws://{url}"
-                
-                # 检查是否需要添加端口
-                if ':' not in ws_url.split('://')[1].split('/')[0]:
-                    # URL中没有端口，添加配置的端口
-                    ws_url = f"{ws_url}:{port}"
-                
-                # 添加WebSocket路径
-                ws_url = f"{ws_url}/api/chat/ws"
-                
-                # 构建请求数据
-                data = {
-                    "AccessKeyId": external_call['api_key'],
-                    "Message": message,
-                    "Model": external_call['model']
-                }
-                
-                # WebSocket连接和通信
-                def on_message(ws, message):
-                    nonlocal response_data
-                    response_data = message
-                    ws.close()
-                
-                def on_error(ws, error):
-                    nonlocal error_message
-                    error_message = str(error)
-                    ws.close()
-                
-                def on_close(ws, close_status_code, close_msg):
-                    nonlocal connection_closed
-                    connection_closed = True
-                
-                def on_open(ws):
-                    # 发送消息
-                    ws.send(json.dumps(data))
-                
-                response_data = None
-                error_message = None
-                connection_closed = False
-                
-                # 创建WebSocket连接
-                ws = websocket.WebSocketApp(
-                    ws_url,
-                    on_open=on_open,
-                    on_message=on_message,
-                    on_error=on_error,
-                    on_close=on_close
-                )
-                
-                # 运行WebSocket连接，设置超时
-                ws.run_forever(timeout=self.request_timeout)
-                
-                if error_message:
-                    # WebSocket连接失败，尝试使用HTTP POST
-                    return self._make_external_call_http(external_call, message)
-                
-                if response_data:
-                    try:
-                        result = json.loads(response_data)
-                        return result.get("data", {}).get("response", "无响应内容")
-                    except json.JSONDecodeError:
-                        return f"错误: WebSocket响应格式不正确: {response_data}"
-                else:
-                    # 无响应，尝试使用HTTP POST
-                    return self._make_external_call_http(external_call, message)
-                    
-            except Exception as e:
-                # WebSocket连接失败，尝试使用HTTP POST
-                return self._make_external_call_http(external_call, message)
-        else:
-            # HTTP POST模式
-            return self._make_external_call_http(external_call, message)
-    
-    def _make_external_call_http(self, external_call, message):
-        """使用HTTP POST执行向外调用"""
-        # 构建API URL
-        url = external_call['url'].strip()
-        port = external_call['port']
-        
-        if '://' in url:
-            # 已经包含协议
-            base_url = url
-        else:
-            # 添加默认协议
-            base_url = f"http://{url}"
-        
-        # 检查是否需要添加端口
-        if ':' not in base_url.split('://')[1].split('/')[0]:
-            # URL中没有端口，添加配置的端口
-            api_url = f"{base_url}:{port}/api/chat"
-        else:
-            # URL中已经有端口，直接使用
-            api_url = f"{base_url}/api/chat"
-        
-        # 构建请求数据
-        data = {
-            "AccessKeyId": external_call['api_key'],
-            "Message": message,
-            "Model": external_call['model']
-        }
-        
-        try:
-            # 发送请求
-            response = requests.post(
-                api_url,
-                json=data,
-                timeout=self.request_timeout
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                return result.get("data", {}).get("response", "无响应内容")
-            else:
-                return f"错误: API调用失败，状态码: {response.status_code}\n{response.text}"
-        except Exception as e:
-            return f"错误: API调用失败，{str(e)}"
-    
     def toggle_external_call_service(self):
         """切换向外调用服务状态"""
         self.external_call_enabled = not self.external_call_enabled
@@ -2178,45 +1332,6 @@ class OllamaChatGUI:
             console_window.destroy()
             self.open_external_call_console()
     
-    def start_mcp_router(self):
-        """启动MCP Router服务"""
-        try:
-            def run_mcp_server():
-                app = flask.Flask(__name__)
-                
-                @app.route('/mcp/tools', methods=['GET'])
-                def list_tools():
-                    return flask.jsonify({
-                        "tools": [
-                            {"name": "search", "description": "搜索网络"},
-                            {"name": "calculate", "description": "数学计算"}
-                        ]
-                    })
-                
-                @app.route('/mcp/call', methods=['POST'])
-                def call_tool():
-                    data = flask.request.json
-                    tool_name = data.get('tool')
-                    params = data.get('params', {})
-                    
-                    if tool_name == 'search':
-                        return flask.jsonify({"result": f"搜索结果: {params.get('query', '')}"})
-                    elif tool_name == 'calculate':
-                        return flask.jsonify({"result": f"计算结果: {params.get('expression', '')}"})
-                    return flask.jsonify({"error": "Unknown tool"}), 400
-                
-                app.run(host='0.0.0.0', port=self.mcp_router_port, threaded=True, use_reloader=False)
-            
-            self.mcp_router = threading.Thread(target=run_mcp_server, daemon=True)
-            self.mcp_router.start()
-            print(f"MCP Router已启动在端口 {self.mcp_router_port}")
-        except Exception as e:
-            print(f"启动MCP Router失败: {str(e)}")
-    
-    def stop_mcp_router(self):
-        """停止MCP Router服务"""
-        print("MCP Router已停止")
-    
     def toggle_tts(self, enabled, console_window=None):
         """切换TTS服务状态"""
         self.tts_enabled = enabled
@@ -2232,54 +1347,18 @@ class OllamaChatGUI:
     
     def init_tts_engine(self):
         """初始化TTS引擎"""
-        try:
-            import pyttsx3
-            self.tts_engine = pyttsx3.init()
-            
-            # 应用设置
-            try:
-                self.tts_engine.setProperty('rate', self.tts_rate)
-                self.tts_engine.setProperty('volume', self.tts_volume)
-                
-                # 设置声音
-                voices = self.tts_engine.getProperty('voices')
-                if voices and self.tts_voice_index < len(voices):
-                    self.tts_engine.setProperty('voice', voices[self.tts_voice_index].id)
-            except Exception as e:
-                print(f"应用TTS设置失败: {str(e)}")
-            
-            print("TTS引擎已初始化")
-        except ImportError:
-            print("pyttsx3未安装，无法初始化TTS")
-            self.tts_enabled = False
-        except Exception as e:
-            print(f"初始化TTS失败: {str(e)}")
+        from gui.tts import init_tts_engine
+        return init_tts_engine(self)
     
     def stop_tts_engine(self):
         """停止TTS引擎"""
-        if self.tts_engine:
-            try:
-                self.tts_engine.stop()
-            except:
-                pass
-            self.tts_engine = None
-        print("TTS引擎已停止")
+        from gui.tts import stop_tts_engine
+        return stop_tts_engine(self)
     
     def speak_text(self, text):
         """使用TTS朗读文本"""
-        if not self.tts_enabled:
-            return
-        
-        if self.tts_mode == "local":
-            if not self.tts_engine:
-                return
-            try:
-                self.tts_engine.say(text)
-                self.tts_engine.runAndWait()
-            except Exception as e:
-                print(f"TTS朗读失败: {str(e)}")
-        else:
-            print("在线TTS模式待实现")
+        from gui.tts import speak_text
+        return speak_text(self, text)
     
     def open_settings_window(self):
         """打开设置窗口"""
@@ -2373,8 +1452,10 @@ class OllamaChatGUI:
             self.max_memory_usage = max_memory_var.get()
             
             # 重新初始化依赖配置的组件
-            self.request_semaphore = threading.Semaphore(self.max_concurrent_requests)
+            self.request_scheduler.resize(self.max_concurrent_requests)
+            self.worker_pool.resize(self.max_concurrent_requests)
             self.conversation_history = deque(maxlen=self.max_history_rounds)
+            self.sessions.resize(self.max_history_rounds)
             
             # 保存配置到文件
             self.save_config()
@@ -2409,136 +1490,9 @@ class OllamaChatGUI:
         save_btn.grid(row=3, column=0, columnspan=2, padx=20, pady=20, sticky="ew")
 
     def open_tts_settings(self, parent_window=None):
-        """打开TTS设置面板"""
-        window = ctk.CTkToplevel(parent_window if parent_window else self.window)
-        window.title("TTS设置")
-        window.geometry("500x450")
-        if parent_window:
-            window.transient(parent_window)
-        window.grab_set()
-        
-        window.grid_columnconfigure(0, weight=1)
-        window.grid_columnconfigure(1, weight=1)
-        
-        # 标题
-        title_label = ctk.CTkLabel(
-            window,
-            text="⚙️ TTS语音设置",
-            font=ctk.CTkFont(size=20, weight="bold")
-        )
-        title_label.grid(row=0, column=0, columnspan=2, pady=(20, 20))
-        
-        # 语速
-        rate_label = ctk.CTkLabel(window, text="语速:")
-        rate_label.grid(row=1, column=0, padx=20, pady=10, sticky="e")
-        
-        rate_var = ctk.IntVar(value=self.tts_rate)
-        
-        rate_slider = ctk.CTkSlider(
-            window,
-            from_=50,
-            to=400,
-            variable=rate_var,
-            width=200
-        )
-        rate_slider.grid(row=1, column=1, padx=20, pady=10, sticky="w")
-        
-        rate_value_label = ctk.CTkLabel(window, textvariable=rate_var)
-        rate_value_label.grid(row=1, column=1, padx=20, pady=10, sticky="e")
-        
-        # 音量
-        volume_label = ctk.CTkLabel(window, text="音量:")
-        volume_label.grid(row=2, column=0, padx=20, pady=10, sticky="e")
-        
-        volume_var = ctk.DoubleVar(value=self.tts_volume)
-        
-        volume_slider = ctk.CTkSlider(
-            window,
-            from_=0.0,
-            to=1.0,
-            variable=volume_var,
-            width=200
-        )
-        volume_slider.grid(row=2, column=1, padx=20, pady=10, sticky="w")
-        
-        def update_volume_label(*args):
-            volume_value_label.configure(text=f"{int(volume_var.get() * 100)}%")
-        
-        volume_var.trace_add("write", update_volume_label)
-        
-        volume_value_label = ctk.CTkLabel(window, text=f"{int(self.tts_volume * 100)}%")
-        volume_value_label.grid(row=2, column=1, padx=20, pady=10, sticky="e")
-        
-        # 声音选择（如果本地TTS可用）
-        voice_label = ctk.CTkLabel(window, text="声音:")
-        voice_label.grid(row=3, column=0, padx=20, pady=10, sticky="e")
-        
-        voice_var = ctk.StringVar(value="默认")
-        voice_options = ["默认"]
-        
-        # 获取可用声音
-        if self.tts_engine:
-            try:
-                voices = self.tts_engine.getProperty('voices')
-                voice_options = [f"{i+1}. {voice.name}" for i, voice in enumerate(voices)]
-                if voice_options:
-                    voice_var.set(voice_options[min(self.tts_voice_index, len(voice_options)-1)])
-            except:
-                pass
-        
-        voice_dropdown = ctk.CTkComboBox(
-            window,
-            values=voice_options,
-            variable=voice_var,
-            width=200
-        )
-        voice_dropdown.grid(row=3, column=1, padx=20, pady=10, sticky="w")
-        
-        # 测试按钮
-        def test_tts():
-            test_text = "你好，这是TTS语音测试"
-            self.speak_text(test_text)
-        
-        test_btn = ctk.CTkButton(
-            window,
-            text="🔊 测试语音",
-            fg_color="#27ae60",
-            hover_color="#2ecc71",
-            command=test_tts
-        )
-        test_btn.grid(row=4, column=0, columnspan=2, padx=20, pady=20, sticky="ew")
-        
-        # 保存按钮
-        def save_settings():
-            self.tts_rate = rate_var.get()
-            self.tts_volume = volume_var.get()
-            
-            # 设置声音
-            if self.tts_engine:
-                try:
-                    self.tts_engine.setProperty('rate', self.tts_rate)
-                    self.tts_engine.setProperty('volume', self.tts_volume)
-                    
-                    if voice_options and voice_options != ["默认"]:
-                        idx = voice_options.index(voice_var.get())
-                        self.tts_voice_index = idx
-                        voices = self.tts_engine.getProperty('voices')
-                        if idx < len(voices):
-                            self.tts_engine.setProperty('voice', voices[idx].id)
-                except Exception as e:
-                    print(f"设置TTS属性失败: {str(e)}")
-            
-            window.destroy()
-            if parent_window:
-                parent_window.destroy()
-                self.open_external_call_console()
-        
-        save_btn = ctk.CTkButton(
-            window,
-            text="保存设置",
-            command=save_settings
-        )
-        save_btn.grid(row=5, column=0, columnspan=2, padx=20, pady=(0, 20), sticky="ew")
+        """打开TTS设置窗口"""
+        from gui.tts import open_tts_settings
+        return open_tts_settings(self, parent_window)
     
     def open_local_service_window(self):
         """打开本地服务搭建窗口"""
@@ -2814,174 +1768,34 @@ class OllamaChatGUI:
             
             if service_type in service_map:
                 service_name = service_map[service_type]
-                
-                # 停止服务
-                result = self.setup_manager.stop_service(service_name)
-                if result['success']:
-                    log_message(f"服务停止成功: {service_type}")
-                    return True, result['message']
-                else:
-                    log_message(f"服务停止失败: {result['message']}")
-                    return False, result['message']
-            elif service_type == "NOKE服务器":
-                # 停止NOKE服务器集群
-                log_message("停止NOKE服务器集群...")
-                return self.stop_noke_servers()
-            else:
-                return False, "不支持的服务类型"
-                
-        except Exception as e:
-            return False, str(e)
-    
-    def start_noke_servers(self):
-        """启动NOKE服务器集群"""
-        try:
-            # 记录日志
-            def log_message(message):
-                if hasattr(self, 'log_text'):
-                    self.log_text.configure(state="normal")
-                    self.log_text.insert("end", f"[{time.strftime('%H:%M:%S')}] {message}\n")
-                    self.log_text.see("end")
-                    self.log_text.configure(state="disabled")
-                print(f"[{time.strftime('%H:%M:%S')}] {message}")
-            
-            # 启动顺序：memory -> agent -> monitor -> main
-            
-            # 启动记忆服务器
-            if self.servers['memory'] is None:
-                log_message("启动记忆服务器...")
-                self.servers['memory'] = MemoryServer()
-                self.servers['memory'].start()
-                time.sleep(1)
-            
-            # 启动智能体服务器
-            if self.servers['agent'] is None:
-                log_message("启动智能体服务器...")
-                self.servers['agent'] = AgentServer()
-                self.servers['agent'].start()
-                time.sleep(1)
-            
-            # 启动监控服务器
-            if self.servers['monitor'] is None:
-                log_message("启动监控服务器...")
-                self.servers['monitor'] = MonitorServer()
-                self.servers['monitor'].start()
-                time.sleep(1)
-            
-            # 启动主服务器
-            if self.servers['main'] is None:
-                log_message("启动主服务器...")
-                self.servers['main'] = MainServer()
-                self.servers['main'].start()
-                time.sleep(1)
-            
-            log_message("NOKE服务器集群启动完成")
-            return True, "NOKE服务器集群启动成功"
-        except Exception as e:
-            log_message(f"启动NOKE服务器集群失败: {str(e)}")
-            return False, f"启动NOKE服务器集群失败: {str(e)}"
-    
-    def stop_noke_servers(self):
-        """停止NOKE服务器集群"""
-        try:
-            # 记录日志
-            def log_message(message):
-                if hasattr(self, 'log_text'):
-                    self.log_text.configure(state="normal")
-                    self.log_text.insert("end", f"[{time.strftime('%H:%M:%S')}] {message}\n")
-                    self.log_text.see("end")
-                    self.log_text.configure(state="disabled")
-                print(f"[{time.strftime('%H:%M:%S')}] {message}")
-            
-            # 停止顺序：main -> monitor -> agent -> memory
-            
-            # 停止主服务器
-            if self.servers['main']:
-                log_message("停止主服务器...")
-                self.servers['main'].stop()
-                self.servers['main'] = None
-                time.sleep(0.5)
-            
-            # 停止监控服务器
-            if self.servers['monitor']:
-                log_message("停止监控服务器...")
-                self.servers['monitor'].stop()
-                self.servers['monitor'] = None
-                time.sleep(0.5)
-            
-            # 停止智能体服务器
-            if self.servers['agent']:
-                log_message("停止智能体服务器...")
-                self.servers['agent'].stop()
-                self.servers['agent'] = None
-                time.sleep(0.5)
-            
-            # 停止记忆服务器
-            if self.servers['memory']:
-                log_message("停止记忆服务器...")
-                self.servers['memory'].stop()
-                self.servers['memory'] = None
-                time.sleep(0.5)
-            
-            log_message("NOKE服务器集群停止完成")
-            return True, "NOKE服务器集群停止成功"
-        except Exception as e:
-            log_message(f"停止NOKE服务器集群失败: {str(e)}")
-            return False, f"停止NOKE服务器集群失败: {str(e)}"
-    
-    def start_single_server(self, server_key, port):
-        """启动单个服务器"""
-        try:
-            print(f"启动{server_key}服务器，端口: {port}...")
-            
-            # 停止之前的服务器实例
-            if self.servers[server_key]:
-                print(f"停止之前的{server_key}服务器实例...")
-                self.servers[server_key].stop()
-                self.servers[server_key] = None
-                time.sleep(0.5)
-            
-            # 根据服务器类型启动不同的服务器
-            if server_key == 'main':
-                from servers.main_server import MainServer
-                self.servers[server_key] = MainServer()
-            elif server_key == 'memory':
-                from servers.memory_server import MemoryServer
-                self.servers[server_key] = MemoryServer()
-            elif server_key == 'agent':
-                from servers.agent_server import AgentServer
-                self.servers[server_key] = AgentServer()
-            elif server_key == 'monitor':
-                from servers.monitor_server import MonitorServer
-                self.servers[server_key] = MonitorServer()
-            
-            # 启动服务器
-            if self.servers[server_key]:
-                # 这里可以添加端口设置逻辑
-                # 目前服务器使用配置文件中的端口
-                self.servers[server_key].start()
-                print(f"{server_key}服务器启动成功，端口: {port}")
-            else:
-                print(f"无法启动{server_key}服务器")
-                
-        except Exception as e:
-            print(f"启动{server_key}服务器失败: {str(e)}")
-    
-    def stop_single_server(self, server_key):
-        """停止单个服务器"""
-        try:
-            print(f"停止{server_key}服务器...")
-            
-            if self.servers[server_key]:
-                self.servers[server_key].stop()
-                self.servers[server_key] = None
-                print(f"{server_key}服务器停止成功")
+                
+                # 停止服务
+                result = self.setup_manager.stop_service(service_name)
+                if result['success']:
+                    log_message(f"服务停止成功: {service_type}")
+                    return True, result['message']
+                else:
+                    log_message(f"服务停止失败: {result['message']}")
+                    return False, result['message']
+            elif service_type == "NOKE服务器":
+                # 停止NOKE服务器集群
+                log_message("停止NOKE服务器集群...")
+                return self.stop_noke_servers()
             else:
-                print(f"{server_key}服务器未运行")
+                return False, "不支持的服务类型"
                 
         except Exception as e:
-            print(f"停止{server_key}服务器失败: {str(e)}")
+            return False, str(e)
     
+    def log_server_message(self, message):
+        """记录NOKE服务器日志（同时写入服务器日志框）"""
+        if hasattr(self, 'log_text'):
+            self.log_text.configure(state="normal")
+            self.log_text.insert("end", f"[{time.strftime('%H:%M:%S')}] {message}\n")
+            self.log_text.see("end")
+            self.log_text.configure(state="disabled")
+        super().log_server_message(message)
+
     def start_server_mode(self):
         """启动服务器模式，关闭之前的所有控制台，启动服务器专用的专业控制台"""
 
@@ -3402,6 +2216,7 @@ class OllamaChatGUI:
         system_monitor_frame.grid(row=0, column=1, padx=20, pady=20)
         
         try:
+            import psutil
             cpu_percent = psutil.cpu_percent(interval=0.1)
             memory = psutil.virtual_memory()
             mem_percent = memory.percent
@@ -4110,14 +2925,6 @@ class OllamaChatGUI:
         except Exception as e:
             print(f"复制失败: {e}")
     
-    def toggle_external_call_enabled(self, call_id, enabled):
-        """切换向外调用的启用状态"""
-        for call in self.external_calls:
-            if call['id'] == call_id:
-                call['enabled'] = enabled
-                break
-        self.save_external_calls()
-    
     def start_all_external_services(self):
         """启动所有向外调用服务"""
         self.external_call_enabled = True
@@ -4314,33 +3121,6 @@ class OllamaChatGUI:
         )
         test_btn.grid(row=3, column=0, padx=20, pady=20, sticky="ew")
 
-    def record_api_call(self, api_key):
-        """记录API调用"""
-        # 初始化统计数据
-        if api_key not in self.api_key_stats:
-            self.api_key_stats[api_key] = {
-                "total_calls": 0,
-                "last_call": None,
-                "calls_today": 0,
-                "today": datetime.now().strftime("%Y-%m-%d")
-            }
-        
-        # 更新统计数据
-        stats = self.api_key_stats[api_key]
-        stats["total_calls"] += 1
-        stats["last_call"] = datetime.now().isoformat()
-        
-        # 更新今日调用次数
-        today = datetime.now().strftime("%Y-%m-%d")
-        if stats["today"] != today:
-            stats["today"] = today
-            stats["calls_today"] = 1
-        else:
-            stats["calls_today"] += 1
-        
-        # 保存统计数据
-        self.save_api_key_stats()
-
     def open_api_key_console(self):
         """打开API Key管理控制台"""
         # 创建控制台窗口
@@ -4399,8 +3179,9 @@ class OllamaChatGUI:
             
             # 获取调用统计
             total_calls = 0
-            if key in self.api_key_stats:
-                total_calls = self.api_key_stats[key].get("total_calls", 0)
+            key_stats = self.api_key_stats_store.get(key)
+            if key_stats:
+                total_calls = key_stats.get("total_calls", 0)
             
             # 创建行
             row_frame = ctk.CTkFrame(key_list_frame, corner_radius=6)
@@ -4460,8 +3241,7 @@ class OllamaChatGUI:
         # 从列表中删除
         self.api_keys = [key_info for key_info in self.api_keys if key_info['key'] != api_key]
         # 从统计数据中删除
-        if api_key in self.api_key_stats:
-            del self.api_key_stats[api_key]
+        self.api_key_stats_store.delete(api_key)
         # 保存
         self.save_api_keys()
         self.save_api_key_stats()
@@ -4571,203 +3351,6 @@ class OllamaChatGUI:
         )
         test_btn.grid(row=3, column=0, padx=20, pady=20)
 
-    def monitor_memory(self):
-        """监控内存使用情况"""
-        import psutil
-        import time
-        
-        while True:
-            try:
-                # 获取当前进程的内存使用情况
-                process = psutil.Process()
-                memory_info = process.memory_info()
-                memory_percent = process.memory_percent()
-                
-                # 检查内存使用率
-                if memory_percent > self.max_memory_usage:
-                    self.release_resources()
-                    print(f"内存使用率过高 ({memory_percent:.2f}%%)，已释放部分资源")
-                
-                # 监控GPU内存使用情况
-                if self.gpu_memory_check_enabled:
-                    gpu_memory_percent = self.get_gpu_memory_usage()
-                    if gpu_memory_percent > self.max_gpu_memory_usage:
-                        self.release_resources()
-                        print(f"GPU内存使用率过高 ({gpu_memory_percent:.2f}%%)，已释放部分资源")
-            except Exception as e:
-                print(f"内存监控错误: {str(e)}")
-            
-            # 等待下一次检查
-            time.sleep(self.memory_check_interval)
-    
-    def get_gpu_memory_usage(self):
-        """获取GPU内存使用情况"""
-        try:
-            # 尝试使用pynvml库
-            try:
-                import pynvml
-                pynvml.nvmlInit()
-                device_count = pynvml.nvmlDeviceGetCount()
-                total_memory = 0
-                used_memory = 0
-                
-                for i in range(device_count):
-                    handle = pynvml.nvmlDeviceGetHandleByIndex(i)
-                    info = pynvml.nvmlDeviceGetMemoryInfo(handle)
-                    total_memory += info.total
-                    used_memory += info.used
-                
-                pynvml.nvmlShutdown()
-                
-                if total_memory > 0:
-                    return (used_memory / total_memory) * 100
-            except ImportError:
-                # pynvml未安装，尝试使用nvidia-smi命令
-                import subprocess
-                import re
-                
-                result = subprocess.run(['nvidia-smi', '--query-gpu=memory.total,memory.used', '--format=csv,noheader,nounits'], 
-                                      capture_output=True, text=True)
-                
-                if result.returncode == 0:
-                    total_memory = 0
-                    used_memory = 0
-                    
-                    for line in result.stdout.strip().split('\n'):
-                        if line:
-                            parts = line.split(',')
-                            if len(parts) == 2:
-                                try:
-                                    total = int(parts[0].strip())
-                                    used = int(parts[1].strip())
-                                    total_memory += total
-                                    used_memory += used
-                                except ValueError:
-                                    pass
-                    
-                    if total_memory > 0:
-                        return (used_memory / total_memory) * 100
-        except Exception as e:
-            print(f"GPU内存监控错误: {str(e)}")
-        
-        return 0
-
-    def release_resources(self):
-        """释放资源"""
-        try:
-            # 1. 清理不活跃的对话历史
-            # 检查API Key的最后使用时间，清理长时间未使用的
-            current_time = datetime.now()
-            inactive_keys = []
-            
-            for api_key, stats in self.api_key_stats.items():
-                last_call = stats.get("last_call")
-                if last_call:
-                    last_call_time = datetime.fromisoformat(last_call)
-                    # 如果超过12小时未使用，清理对话历史
-                    if (current_time - last_call_time).total_seconds() > 12 * 3600:
-                        inactive_keys.append(api_key)
-                else:
-                    # 如果从未使用过，也清理
-                    inactive_keys.append(api_key)
-            
-            # 清理不活跃的对话历史
-            for api_key in inactive_keys:
-                if api_key in self.conversation_histories:
-                    del self.conversation_histories[api_key]
-                    print(f"清理不活跃的API Key对话历史: {api_key}")
-            
-            # 2. 清理全局对话历史（更激进）
-            if len(self.conversation_history) > 5:
-                # 保留最近5轮对话
-                from collections import deque
-                new_history = deque(maxlen=self.max_history_rounds)
-                # 复制最近的对话
-                for msg in list(self.conversation_history)[-5:]:
-                    new_history.append(msg)
-                self.conversation_history = new_history
-                print("清理全局对话历史，保留最近5轮")
-            
-            # 3. 清理所有对话历史（如果内存仍然紧张）
-            # 这里可以根据实际情况调整触发条件
-            
-            # 4. 尝试清理Python垃圾回收
-            import gc
-            gc.collect()
-            print("执行垃圾回收")
-            
-            # 5. 限制并发请求数（临时降低）
-            # 注意：这只是临时措施，下次启动会恢复配置值
-            if self.max_concurrent_requests > 3:
-                self.max_concurrent_requests = 3
-                # 重新初始化信号量
-                import threading
-                self.request_semaphore = threading.Semaphore(self.max_concurrent_requests)
-                print("临时降低最大并发请求数到3")
-                
-        except Exception as e:
-            print(f"释放资源错误: {str(e)}")
-    
-    def release_gpu_resources(self):
-        """释放GPU资源"""
-        try:
-            # 1. 清理所有对话历史
-            self.conversation_history.clear()
-            self.conversation_histories.clear()
-            print("清理所有对话历史")
-            
-            # 2. 强制垃圾回收
-            import gc
-            gc.collect()
-            print("执行强制垃圾回收")
-            
-            # 3. 尝试使用pynvml释放GPU内存
-            try:
-                import pynvml
-                pynvml.nvmlInit()
-                device_count = pynvml.nvmlDeviceGetCount()
-                for i in range(device_count):
-                    handle = pynvml.nvmlDeviceGetHandleByIndex(i)
-                    # 获取GPU内存信息
-                    info = pynvml.nvmlDeviceGetMemoryInfo(handle)
-                    print(f"GPU {i} 内存使用: {info.used / (1024 * 1024 * 1024):.2f} GB / {info.total / (1024 * 1024 * 1024):.2f} GB")
-                pynvml.nvmlShutdown()
-            except ImportError:
-                print("pynvml未安装，跳过GPU内存检查")
-            except Exception as e:
-                print(f"GPU内存释放错误: {str(e)}")
-                
-        except Exception as e:
-            print(f"释放GPU资源错误: {str(e)}")
-    
-    def cleanup_resources(self):
-        """清理所有资源"""
-        try:
-            # 1. 清理API速率限制数据
-            if hasattr(self, 'api_rate_limit'):
-                self.api_rate_limit.clear()
-            
-            # 2. 清理请求信号量
-            if hasattr(self, 'request_semaphore'):
-                # 释放所有信号量
-                try:
-                    for _ in range(self.max_concurrent_requests):
-                        self.request_semaphore.release()
-                except:
-                    pass
-            
-            # 3. 清理模型缓存
-            if hasattr(self, '_cached_models'):
-                self._cached_models = []
-            
-            # 4. 强制垃圾回收
-            import gc
-            gc.collect()
-            print("清理所有资源完成")
-            
-        except Exception as e:
-            print(f"清理资源错误: {str(e)}")
-
     def exit_application(self):
         """退出应用程序，正确释放所有资源"""
         print("正在退出应用程序...")
@@ -4776,7 +3359,7 @@ class OllamaChatGUI:
             # 1. 停止API服务器
             if hasattr(self, 'api_server_enabled') and self.api_server_enabled:
                 print("停止API服务器...")
-                self.stop_api_server()
+                self.stop_api_server(wait=True)
             
             # 2. 释放GPU资源
             print("释放GPU资源...")
@@ -4786,9 +3369,10 @@ class OllamaChatGUI:
             print("清理所有资源...")
             self.cleanup_resources()
             
-            # 4. 保存配置
+            # 4. 保存配置和尚未写盘的调用统计
             print("保存配置...")
             self.save_config()
+            self.save_api_key_stats()
             
             # 5. 退出应用程序
             print("退出应用程序...")
@@ -4877,570 +3461,23 @@ class OllamaChatGUI:
 
     def open_port_scan_window(self):
         """打开端口扫描窗口"""
-        window = ctk.CTkToplevel(self.window)
-        window.title("端口扫描")
-        window.geometry("600x500")
-        window.transient(self.window)
-        window.grab_set()
-        
-        window.grid_columnconfigure(0, weight=1)
-        window.grid_rowconfigure(4, weight=1)
-        
-        # 标题
-        title_label = ctk.CTkLabel(
-            window,
-            text="🔍 端口扫描工具",
-            font=ctk.CTkFont(size=20, weight="bold")
-        )
-        title_label.grid(row=0, column=0, columnspan=2, pady=(20, 20))
-        
-        # 目标IP
-        ip_label = ctk.CTkLabel(window, text="目标IP:")
-        ip_label.grid(row=1, column=0, padx=20, pady=10, sticky="e")
-        
-        self.ip_entry = ctk.CTkEntry(window, width=300)
-        self.ip_entry.insert(0, "127.0.0.1")
-        self.ip_entry.grid(row=1, column=1, padx=20, pady=10, sticky="w")
-        
-        # 端口范围
-        port_range_label = ctk.CTkLabel(window, text="端口范围:")
-        port_range_label.grid(row=2, column=0, padx=20, pady=10, sticky="e")
-        
-        range_frame = ctk.CTkFrame(window, fg_color="transparent")
-        range_frame.grid(row=2, column=1, padx=20, pady=10, sticky="w")
-        
-        self.start_port_entry = ctk.CTkEntry(range_frame, width=100, placeholder_text="开始端口")
-        self.start_port_entry.insert(0, "1")
-        self.start_port_entry.grid(row=0, column=0, padx=(0, 10))
-        
-        ctk.CTkLabel(range_frame, text="-").grid(row=0, column=1, padx=5)
-        
-        self.end_port_entry = ctk.CTkEntry(range_frame, width=100, placeholder_text="结束端口")
-        self.end_port_entry.insert(0, "10000")
-        self.end_port_entry.grid(row=0, column=2, padx=(10, 0))
-        
-        # 扫描按钮
-        def start_scan():
-            ip = self.ip_entry.get().strip()
-            try:
-                start_port = int(self.start_port_entry.get().strip())
-                end_port = int(self.end_port_entry.get().strip())
-            except ValueError:
-                result_text.configure(state="normal")
-                result_text.delete(1.0, "end")
-                result_text.insert(1.0, "错误: 端口必须是数字")
-                result_text.configure(state="disabled")
-                return
-            
-            if start_port < 1 or end_port > 65535 or start_port > end_port:
-                result_text.configure(state="normal")
-                result_text.delete(1.0, "end")
-                result_text.insert(1.0, "错误: 端口范围无效 (1-65535)")
-                result_text.configure(state="disabled")
-                return
-            
-            # 禁用按钮
-            scan_btn.configure(state="disabled")
-            result_text.configure(state="normal")
-            result_text.delete(1.0, "end")
-            result_text.insert(1.0, f"开始扫描 {ip}:{start_port}-{end_port}...\n")
-            result_text.configure(state="disabled")
-            
-            # 在新线程中执行扫描
-            def scan_thread():
-                results = self.scan_ports(ip, start_port, end_port)
-                
-                # 更新结果
-                window.after(0, lambda: update_results(results))
-            
-            def update_results(results):
-                result_text.configure(state="normal")
-                result_text.delete(1.0, "end")
-                if results:
-                    result_text.insert(1.0, f"扫描完成，找到 {len(results)} 个开放端口:\n\n")
-                    for port in results:
-                        result_text.insert("end", f"✅ 端口 {port} 开放\n")
-                else:
-                    result_text.insert(1.0, "扫描完成，未找到开放端口")
-                result_text.configure(state="disabled")
-                scan_btn.configure(state="normal")
-            
-            threading.Thread(target=scan_thread, daemon=True).start()
-        
-        scan_btn = ctk.CTkButton(
-            window,
-            text="开始扫描",
-            command=start_scan,
-            fg_color="#27ae60",
-            hover_color="#2ecc71"
-        )
-        scan_btn.grid(row=3, column=0, columnspan=2, padx=20, pady=20, sticky="ew")
-        
-        # 结果显示
-        result_frame = ctk.CTkFrame(window, corner_radius=8)
-        result_frame.grid(row=4, column=0, columnspan=2, padx=20, pady=(0, 20), sticky="nsew")
-        
-        result_text = scrolledtext.ScrolledText(
-            result_frame,
-            wrap="word",
-            bg="#2b2b2b",
-            fg="white",
-            font=("Microsoft YaHei", 12),
-            padx=15,
-            pady=15,
-            state="disabled"
-        )
-        result_text.pack(fill="both", expand=True)
-
-    def scan_ports(self, ip, start_port, end_port):
-        """扫描指定IP的端口范围"""
-        open_ports = []
-        
-        # 限制扫描速度，避免网络拥塞
-        max_workers = 100
-        from concurrent.futures import ThreadPoolExecutor
-        
-        def scan_port(port):
-            if self.is_port_open(ip, port):
-                return port
-            return None
-        
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            results = executor.map(scan_port, range(start_port, end_port + 1))
-            
-        for port in results:
-            if port:
-                open_ports.append(port)
-        
-        return open_ports
-
-    def is_port_open(self, ip, port):
-        """检查指定端口是否开放"""
-        import socket
-        
-        try:
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.settimeout(0.1)
-                result = s.connect_ex((ip, port))
-                return result == 0
-        except:
-            return False
-
-    def perform_web_search(self, query):
-        """执行联网搜索，包含关键词提取和内容分析"""
-        try:
-            # 网络安全措施
-            # 1. 输入验证和清理
-            if not query or len(query) > 1000:  # 限制搜索词长度
-                return ["搜索词无效或过长，请尝试更简洁的搜索词。"]
-            
-            # 2. 清理搜索词，防止注入攻击
-            import re
-            # 只允许字母、数字、中文和常见标点符号
-            clean_query = re.sub(r'[^\w\s\u4e00-\u9fa5\-.,!?]', '', query)
-            if not clean_query:
-                return ["搜索词包含无效字符，请重新输入。"]
-            
-            # 3. 关键词提取（重点识别）
-            keywords = self.extract_keywords(clean_query)
-            
-            # 4. 根据关键词拟定搜索词
-            search_terms = self.generate_search_terms(keywords, clean_query)
-            
-            # 5. 搜索API安全配置
-            search_api = self.search_api_var.get() if hasattr(self, 'search_api_var') else "模拟搜索"
-            
-            # 6. 模拟搜索结果（实际应用中应集成安全的搜索API）
-            import time
-            import random
-            
-            # 模拟网络延迟，添加随机性
-            time.sleep(random.uniform(0.5, 1.5))
-            
-            # 7. 模拟搜索结果，确保内容安全
-            search_results = []
-            for i, term in enumerate(search_terms[:3], 1):  # 只使用前3个搜索词
-                # 为每个搜索词生成结果
-                search_results.extend([
-                    f"搜索结果 {len(search_results) + 1}: {term} - 这是关于'{term}'的详细信息，包含相关概念和最新数据。",
-                    f"搜索结果 {len(search_results) + 1}: {term} - 这是关于'{term}'的应用案例和实践经验。"
-                ])
-            
-            # 8. 内容分析和整合
-            analyzed_results = self.analyze_search_results(search_results, clean_query, keywords)
-            
-            # 9. 记录搜索请求（便于审计）
-            print(f"[安全日志] 执行联网搜索: {clean_query}")
-            print(f"[安全日志] 提取关键词: {keywords}")
-            print(f"[安全日志] 生成搜索词: {search_terms}")
-            
-            return analyzed_results
-        except Exception as e:
-            # 10. 错误处理，避免泄露敏感信息
-            print(f"[安全日志] 搜索失败: {str(e)}")
-            return ["搜索服务暂时不可用，请稍后再试。"]
-    
-    def extract_keywords(self, query):
-        """从用户查询中提取关键词"""
-        import re
-        import jieba
-        
-        # 移除停用词
-        stopwords = set([
-            '的', '了', '是', '在', '我', '有', '和', '就', '不', '人', '都', '一', '一个', '上', '也', '很', '到', '说', '要', '去', '你',
-            '会', '着', '没有', '看', '好', '自己', '这', '关于', '对于', '怎么', '如何', '什么', '为什么', '吗', '呢', '啊'
-        ])
-        
-        # 使用结巴分词提取关键词
-        try:
-            words = jieba.cut_for_search(query)
-            keywords = [word for word in words if word not in stopwords and len(word) > 1]
-            
-            # 如果结巴分词失败，使用简单的方法
-            if not keywords:
-                # 简单分词（按空格和标点）
-                words = re.findall(r'[\w\u4e00-\u9fa5]+', query)
-                keywords = [word for word in words if word not in stopwords and len(word) > 1]
-        except:
-            # 降级方案
-            words = re.findall(r'[\w\u4e00-\u9fa5]+', query)
-            keywords = [word for word in words if word not in stopwords and len(word) > 1]
-        
-        # 确保至少有一个关键词
-        if not keywords:
-            keywords = [query[:20]]  # 使用查询的前20个字符作为关键词
-        
-        return keywords[:5]  # 最多返回5个关键词
-    
-    def generate_search_terms(self, keywords, original_query):
-        """根据关键词生成搜索词"""
-        search_terms = []
-        
-        # 1. 使用原始查询
-        search_terms.append(original_query)
-        
-        # 2. 使用单个关键词
-        for keyword in keywords:
-            if keyword not in search_terms:
-                search_terms.append(keyword)
-        
-        # 3. 使用关键词组合
-        if len(keywords) > 1:
-            # 两两组合
-            for i in range(len(keywords)):
-                for j in range(i + 1, len(keywords)):
-                    combined = f"{keywords[i]} {keywords[j]}"
-                    if combined not in search_terms:
-                        search_terms.append(combined)
-        
-        return search_terms[:5]  # 最多返回5个搜索词
-    
-    def analyze_search_results(self, results, original_query, keywords):
-        """分析搜索结果并整合"""
-        # 1. 统计关键词出现频率
-        keyword_freq = {}
-        for keyword in keywords:
-            freq = sum(1 for result in results if keyword in result)
-            keyword_freq[keyword] = freq
-        
-        # 2. 按相关性排序结果
-        def get_relevance(result):
-            relevance = 0
-            for keyword, freq in keyword_freq.items():
-                if keyword in result:
-                    relevance += freq
-            return relevance
-        
-        sorted_results = sorted(results, key=get_relevance, reverse=True)
-        
-        # 3. 生成分析摘要
-        analyzed_results = []
-        analyzed_results.append(f"🔍 搜索分析: 根据您的问题，我识别到的重点是: {', '.join(keywords)}")
-        analyzed_results.append("\n📋 搜索结果摘要:")
-        
-        # 添加前5个最相关的结果
-        for i, result in enumerate(sorted_results[:5], 1):
-            analyzed_results.append(f"{i}. {result}")
-        
-        analyzed_results.append("\n💡 提示: 以上结果基于关键词搜索，可能需要结合您的具体问题进行进一步分析。")
-        
-        return analyzed_results
-
-
-
+        from gui.port_scanner import open_port_scan_window
+        return open_port_scan_window(self)
 
     def create_dashboard_ui(self, dashboard_tab):
         """创建仪表盘UI"""
-        # 高级仪表盘标题
-        dashboard_title = ctk.CTkLabel(
-            dashboard_tab,
-            text="API服务实时监测仪表盘",
-            font=ctk.CTkFont(size=18, weight="bold"),
-            text_color="#3498db"
-        )
-        dashboard_title.pack(pady=(20, 10))
-        
-        # 统计卡片网格
-        stats_grid_frame = ctk.CTkFrame(dashboard_tab, corner_radius=15, border_width=1, border_color="#444444")
-        stats_grid_frame.pack(fill="x", padx=20, pady=10)
-        stats_grid_frame.grid_columnconfigure(0, weight=1)
-        stats_grid_frame.grid_columnconfigure(1, weight=1)
-        stats_grid_frame.grid_columnconfigure(2, weight=1)
-        stats_grid_frame.grid_columnconfigure(3, weight=1)
-        
-        # 总调用次数卡片
-        total_calls_frame = ctk.CTkFrame(stats_grid_frame, corner_radius=10, fg_color="#1a1a2e")
-        total_calls_frame.grid(row=0, column=0, padx=10, pady=10, sticky="nsew")
-        
-        total_calls_icon = ctk.CTkLabel(
-            total_calls_frame,
-            text="📊",
-            font=ctk.CTkFont(size=24)
-        )
-        total_calls_icon.pack(pady=(15, 5))
-        
-        total_calls_label = ctk.CTkLabel(
-            total_calls_frame,
-            text="总调用次数",
-            font=ctk.CTkFont(size=12),
-            text_color="#95a5a6"
-        )
-        total_calls_label.pack(pady=5)
-        
-        total_calls_value = sum(stats.get("total_calls", 0) for stats in self.api_key_stats.values())
-        total_calls_value_label = ctk.CTkLabel(
-            total_calls_frame,
-            text=str(total_calls_value),
-            font=ctk.CTkFont(size=24, weight="bold"),
-            text_color="#3498db"
-        )
-        total_calls_value_label.pack(pady=5)
-        
-        # 今日调用次数卡片
-        today_calls_frame = ctk.CTkFrame(stats_grid_frame, corner_radius=10, fg_color="#1a1a2e")
-        today_calls_frame.grid(row=0, column=1, padx=10, pady=10, sticky="nsew")
-        
-        today_calls_icon = ctk.CTkLabel(
-            today_calls_frame,
-            text="📅",
-            font=ctk.CTkFont(size=24)
-        )
-        today_calls_icon.pack(pady=(15, 5))
-        
-        today_calls_label = ctk.CTkLabel(
-            today_calls_frame,
-            text="今日调用次数",
-            font=ctk.CTkFont(size=12),
-            text_color="#95a5a6"
-        )
-        today_calls_label.pack(pady=5)
-        
-        today_calls_value = sum(stats.get("calls_today", 0) for stats in self.api_key_stats.values())
-        today_calls_value_label = ctk.CTkLabel(
-            today_calls_frame,
-            text=str(today_calls_value),
-            font=ctk.CTkFont(size=24, weight="bold"),
-            text_color="#4CAF50"
-        )
-        today_calls_value_label.pack(pady=5)
-        
-        # 活跃API Key数量卡片
-        active_keys_frame = ctk.CTkFrame(stats_grid_frame, corner_radius=10, fg_color="#1a1a2e")
-        active_keys_frame.grid(row=0, column=2, padx=10, pady=10, sticky="nsew")
-        
-        active_keys_icon = ctk.CTkLabel(
-            active_keys_frame,
-            text="🔑",
-            font=ctk.CTkFont(size=24)
-        )
-        active_keys_icon.pack(pady=(15, 5))
-        
-        active_keys_label = ctk.CTkLabel(
-            active_keys_frame,
-            text="活跃API Key",
-            font=ctk.CTkFont(size=12),
-            text_color="#95a5a6"
-        )
-        active_keys_label.pack(pady=5)
-        
-        active_keys_value = len([key for key, stats in self.api_key_stats.items() if stats.get("total_calls", 0) > 0])
-        active_keys_value_label = ctk.CTkLabel(
-            active_keys_frame,
-            text=str(active_keys_value),
-            font=ctk.CTkFont(size=24, weight="bold"),
-            text_color="#FF9800"
-        )
-        active_keys_value_label.pack(pady=5)
-        
-        # API服务状态卡片
-        status_frame = ctk.CTkFrame(stats_grid_frame, corner_radius=10, fg_color="#1a1a2e")
-        status_frame.grid(row=0, column=3, padx=10, pady=10, sticky="nsew")
-        
-        status_icon = ctk.CTkLabel(
-            status_frame,
-            text="🟢" if self.api_server_enabled else "🔴",
-            font=ctk.CTkFont(size=24)
-        )
-        status_icon.pack(pady=(15, 5))
-        
-        status_label = ctk.CTkLabel(
-            status_frame,
-            text="API服务状态",
-            font=ctk.CTkFont(size=12),
-            text_color="#95a5a6"
-        )
-        status_label.pack(pady=5)
-        
-        status_value = "运行中" if self.api_server_enabled else "已停止"
-        status_value_label = ctk.CTkLabel(
-            status_frame,
-            text=status_value,
-            font=ctk.CTkFont(size=24, weight="bold"),
-            text_color="#4CAF50" if self.api_server_enabled else "#e74c3c"
-        )
-        status_value_label.pack(pady=5)
-        
-        # 详细统计区域
-        details_frame = ctk.CTkFrame(dashboard_tab, corner_radius=15, border_width=1, border_color="#444444")
-        details_frame.pack(fill="both", expand=True, padx=20, pady=10)
-        details_frame.grid_columnconfigure(0, weight=1)
-        details_frame.grid_rowconfigure(0, weight=1)
-        
-        # API Key使用情况标题
-        usage_title = ctk.CTkLabel(
-            details_frame,
-            text="API Key使用详情",
-            font=ctk.CTkFont(size=14, weight="bold"),
-            text_color="#3498db"
-        )
-        usage_title.pack(pady=(15, 10))
-        
-        # 高级表格框架
-        table_frame = ctk.CTkScrollableFrame(details_frame, corner_radius=10)
-        table_frame.pack(fill="both", expand=True, padx=15, pady=10)
-        
-        # 表头
-        header_frame = ctk.CTkFrame(table_frame, fg_color="#1a1a2e", corner_radius=5)
-        header_frame.pack(fill="x", pady=5)
-        header_frame.grid_columnconfigure(0, weight=2)
-        header_frame.grid_columnconfigure(1, weight=1)
-        header_frame.grid_columnconfigure(2, weight=1)
-        header_frame.grid_columnconfigure(3, weight=2)
-        
-        ctk.CTkLabel(header_frame, text="API Key", font=ctk.CTkFont(weight="bold"), text_color="#3498db").grid(row=0, column=0, padx=10, pady=8, sticky="w")
-        ctk.CTkLabel(header_frame, text="总调用次数", font=ctk.CTkFont(weight="bold"), text_color="#3498db").grid(row=0, column=1, padx=10, pady=8, sticky="w")
-        ctk.CTkLabel(header_frame, text="今日调用次数", font=ctk.CTkFont(weight="bold"), text_color="#3498db").grid(row=0, column=2, padx=10, pady=8, sticky="w")
-        ctk.CTkLabel(header_frame, text="最后调用时间", font=ctk.CTkFont(weight="bold"), text_color="#3498db").grid(row=0, column=3, padx=10, pady=8, sticky="w")
-        
-        # 表格数据
-        if self.api_key_stats:
-            for i, (key, stats) in enumerate(self.api_key_stats.items(), 1):
-                # 交替行颜色
-                row_bg = "#1a1a2e" if i % 2 == 0 else "#16213e"
-                row_frame = ctk.CTkFrame(table_frame, fg_color=row_bg, corner_radius=5)
-                row_frame.pack(fill="x", pady=2)
-                row_frame.grid_columnconfigure(0, weight=2)
-                row_frame.grid_columnconfigure(1, weight=1)
-                row_frame.grid_columnconfigure(2, weight=1)
-                row_frame.grid_columnconfigure(3, weight=2)
-                
-                # API Key
-                key_label = ctk.CTkLabel(row_frame, text=key[:30] + "...", text_color="#ffffff")
-                key_label.grid(row=0, column=0, padx=10, pady=8, sticky="w")
-                
-                # 总调用次数
-                total_calls = stats.get("total_calls", 0)
-                total_calls_label = ctk.CTkLabel(row_frame, text=str(total_calls), text_color="#3498db")
-                total_calls_label.grid(row=0, column=1, padx=10, pady=8, sticky="w")
-                
-                # 今日调用次数
-                today_calls = stats.get("calls_today", 0)
-                today_calls_label = ctk.CTkLabel(row_frame, text=str(today_calls), text_color="#4CAF50")
-                today_calls_label.grid(row=0, column=2, padx=10, pady=8, sticky="w")
-                
-                # 最后调用时间
-                last_call = stats.get("last_call", "-").split('.')[0]
-                last_call_label = ctk.CTkLabel(row_frame, text=last_call, text_color="#95a5a6")
-                last_call_label.grid(row=0, column=3, padx=10, pady=8, sticky="w")
-        else:
-            no_data_frame = ctk.CTkFrame(table_frame, corner_radius=10, fg_color="#1a1a2e")
-            no_data_frame.pack(fill="both", expand=True, pady=20)
-            no_data_label = ctk.CTkLabel(
-                no_data_frame,
-                text="暂无API调用数据",
-                font=ctk.CTkFont(size=14),
-                text_color="#95a5a6"
-            )
-            no_data_label.pack(pady=40)
-        
-        # 操作按钮区域
-        buttons_frame = ctk.CTkFrame(dashboard_tab, fg_color="transparent")
-        buttons_frame.pack(fill="x", padx=20, pady=10)
-        buttons_frame.grid_columnconfigure(0, weight=1)
-        
-        # 刷新按钮
-        refresh_btn = ctk.CTkButton(
-            buttons_frame,
-            text="🔄 刷新数据",
-            command=lambda: self.refresh_dashboard(dashboard_tab),
-            fg_color="#3498db",
-            hover_color="#2980b9",
-            font=ctk.CTkFont(size=12, weight="bold")
-        )
-        refresh_btn.pack(side="right", padx=10)
-        
-        # 导出数据按钮
-        export_btn = ctk.CTkButton(
-            buttons_frame,
-            text="📤 导出统计",
-            command=lambda: self.export_dashboard_data(),
-            fg_color="#27ae60",
-            hover_color="#229954",
-            font=ctk.CTkFont(size=12, weight="bold")
-        )
-        export_btn.pack(side="right", padx=10)
+        from gui.dashboard import create_dashboard_ui
+        return create_dashboard_ui(self, dashboard_tab)
 
     def refresh_dashboard(self, dashboard_tab):
-        """刷新仪表盘数据"""
-        # 重新加载API Key统计数据
-        self.api_key_stats = self.load_api_key_stats()
-        
-        # 清除现有仪表盘内容
-        for widget in dashboard_tab.winfo_children():
-            widget.destroy()
-        
-        # 重新创建仪表盘UI
-        self.create_dashboard_ui(dashboard_tab)
+        """刷新仪表盘"""
+        from gui.dashboard import refresh_dashboard
+        return refresh_dashboard(self, dashboard_tab)
 
     def export_dashboard_data(self):
         """导出仪表盘数据"""
-        try:
-            import json
-            import datetime
-            
-            # 准备导出数据
-            export_data = {
-                "export_time": datetime.datetime.now().isoformat(),
-                "total_calls": sum(stats.get("total_calls", 0) for stats in self.api_key_stats.values()),
-                "today_calls": sum(stats.get("calls_today", 0) for stats in self.api_key_stats.values()),
-                "active_api_keys": len([key for key, stats in self.api_key_stats.items() if stats.get("total_calls", 0) > 0]),
-
-                "api_key_stats": self.api_key_stats
-            }
-            
-            # 生成文件名
-            filename = f"api_dashboard_export_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-            filepath = self.get_app_data_path(filename)
-            
-            # 写入文件
-            with open(filepath, "w", encoding="utf-8") as f:
-                json.dump(export_data, f, ensure_ascii=False, indent=2)
-            
-            # 显示成功消息
-            self.add_message("system", "系统", f"仪表盘数据已导出到: {filename}")
-        except Exception as e:
-            # 显示错误消息
-            self.add_message("system", "系统", f"导出仪表盘数据失败: {str(e)}")
+        from gui.dashboard import export_dashboard_data
+        return export_dashboard_data(self)
 
     def show_console_selector(self):
         """显示控制台选择界面"""
@@ -5563,7 +3600,7 @@ class OllamaChatGUI:
         self.save_config()
         # 停止API服务
         if self.api_server_enabled:
-            self.stop_api_server()
+            self.stop_api_server(wait=True)
         # 释放GPU资源
         self.release_gpu_resources()
         # 清理所有资源
@@ -0,0 +1,563 @@
+import itertools
+import json
+import queue
+import select
+import selectors
+import socket
+import threading
+import time
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+def client_disconnected(environ) -> bool:
+    """检查发起当前请求的客户端是否已断开连接
+
+    Args:
+        environ: WSGI环境（werkzeug在werkzeug.socket中提供客户端socket）
+
+    Returns:
+        客户端已关闭连接时返回True
+    """
+    sock = environ.get('werkzeug.socket')
+    if sock is None:
+        return False
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+        if not readable:
+            return False
+        # 可读但读不到数据，说明对端已关闭
+        return sock.recv(1, socket.MSG_PEEK) == b''
+    except (OSError, ValueError):
+        return True
+
+
+def release_worker(environ) -> bool:
+    """当前请求即将长时间阻塞（排队、流式输出），让出常驻工作线程
+
+    之后由单独的线程继续处理该请求，常驻工作线程可以处理其他连接；
+    让出的线程数达到上限时继续占用原工作线程。
+
+    Args:
+        environ: WSGI环境（PooledWSGIServer在neko.release_worker中提供让出函数）
+
+    Returns:
+        是否已让出（不是由PooledWSGIServer处理时返回False）
+    """
+    release = environ.get('neko.release_worker')
+    if release is None:
+        return False
+    return release()
+
+
+class PooledRequestHandler(WSGIRequestHandler):
+    """按请求处理的请求处理器：连接上的每个请求分别交给工作线程，请求之间不占用线程"""
+
+    protocol_version = "HTTP/1.1"
+
+    def __init__(self, request, client_address, server):
+        # 构造时不处理请求，由服务器在连接可读时调用handle_request()
+        self.request = request
+        self.client_address = client_address
+        self.server = server
+        self.close_connection = True
+        self.setup()
+
+    def setup(self):
+        # 已收到数据的请求在读取过程中停顿超过该时间时断开
+        self.timeout = self.server.keepalive_timeout
+        super().setup()
+
+    def handle_request(self):
+        """处理连接上的一个请求（忽略客户端断开）"""
+        self.close_connection = True
+        try:
+            self.handle_one_request()
+        except (ConnectionError, socket.timeout) as e:
+            self.close_connection = True
+            self.connection_dropped(e)
+
+    def parse_request(self):
+        if not super().parse_request():
+            return False
+        # WebSocket长连接由应用自行管理，不使用空闲超时，也不占用常驻工作线程
+        if self.headers.get('Upgrade', '').lower() == 'websocket':
+            self.connection.settimeout(None)
+            self.server.release_worker()
+        return True
+
+    def make_environ(self):
+        environ = super().make_environ()
+        environ['neko.release_worker'] = self.server.release_worker
+        return environ
+
+
+class _Connection:
+    """服务器管理的客户端连接"""
+
+    __slots__ = ('sock', 'client_address', 'handler', 'deadline', 'released')
+
+    def __init__(self, sock, client_address):
+        self.sock = sock
+        self.client_address = client_address
+        self.handler = None
+        self.deadline = 0.0
+        # 当前请求是否已让出常驻工作线程
+        self.released = False
+
+
+class DetachableWorkerPool:
+    """固定数量的常驻工作线程，长时间阻塞的任务可以让出工作线程
+
+    任务调用detach()后立即补充一个常驻工作线程，当前线程执行完该任务后退出；
+    让出的线程数有上限，达到上限时任务继续占用原工作线程。
+    """
+
+    def __init__(self, workers: int, max_detached: int, thread_name_prefix: str = "api-worker"):
+        """
+        初始化工作线程池
+
+        Args:
+            workers: 常驻工作线程数
+            max_detached: 最多同时让出的线程数
+            thread_name_prefix: 线程名前缀
+        """
+        self.workers = workers
+        self.max_detached = max_detached
+        self.thread_name_prefix = thread_name_prefix
+        self._tasks = queue.Queue()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._detached = 0
+        self._shutdown = False
+        self._counter = itertools.count(1)
+        for _ in range(workers):
+            self._spawn()
+
+    def _spawn(self):
+        threading.Thread(
+            target=self._worker_loop,
+            name=f"{self.thread_name_prefix}-{next(self._counter)}",
+            daemon=True
+        ).start()
+
+    def submit(self, fn, *args):
+        """提交任务"""
+        self._tasks.put((fn, args))
+
+    def _worker_loop(self):
+        """依次执行任务；任务让出线程后执行完即退出"""
+        while True:
+            task = self._tasks.get()
+            if task is None:
+                return
+            fn, args = task
+            self._local.detached = False
+            try:
+                fn(*args)
+            finally:
+                detached = self._local.detached
+                self._local.detached = None
+            if detached:
+                with self._lock:
+                    self._detached -= 1
+                return
+
+    def detach(self) -> bool:
+        """当前任务让出常驻工作线程
+
+        Returns:
+            是否已让出（不在工作线程中或达到上限时返回False）
+        """
+        state = getattr(self._local, 'detached', None)
+        if state is None:
+            return False
+        if state:
+            return True
+        with self._lock:
+            if self._shutdown or self._detached >= self.max_detached:
+                return False
+            self._detached += 1
+        self._local.detached = True
+        self._spawn()
+        return True
+
+    def shutdown(self) -> list:
+        """停止常驻工作线程
+
+        Returns:
+            尚未开始的任务参数列表
+        """
+        with self._lock:
+            self._shutdown = True
+        pending = []
+        while True:
+            try:
+                task = self._tasks.get_nowait()
+            except queue.Empty:
+                break
+            if task is not None:
+                pending.append(task[1])
+        for _ in range(self.workers):
+            self._tasks.put(None)
+        return pending
+
+    def get_stats(self) -> dict:
+        """获取线程池统计
+
+        Returns:
+            统计信息字典
+        """
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'detached': self._detached,
+                'max_detached': self.max_detached,
+                'pending': self._tasks.qsize()
+            }
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """使用固定大小线程池处理请求、带有界等待队列的WSGI服务器
+
+    连接在收到请求数据之前由单个选择器线程等待，不占用工作线程；
+    WebSocket、流式响应和排队中的请求可以让出工作线程（数量有上限），
+    常驻工作线程只用于处理普通请求。
+    """
+
+    multithread = True
+    daemon_threads = True
+
+    def __init__(self, host: str, port: int, app, workers: int = 8, max_queue: int = 32,
+                 keepalive_timeout: float = 15, max_streams: int = 64, max_idle_connections: int = 1024):
+        """
+        初始化WSGI服务器
+
+        Args:
+            host: 监听地址
+            port: 监听端口
+            app: WSGI应用
+            workers: 工作线程数
+            max_queue: 所有工作线程忙碌时最多排队的请求数，超出时直接返回503
+            keepalive_timeout: 连接等待请求的空闲超时（秒）
+            max_streams: WebSocket、流式响应和排队中的请求最多让出的工作线程数
+            max_idle_connections: 最多保持的空闲连接数，超出时直接返回503
+        """
+        self.workers = workers
+        self.max_queue = max_queue
+        self.keepalive_timeout = keepalive_timeout
+        self.max_idle_connections = max_idle_connections
+        # 监听队列与等待队列保持一致
+        self.request_queue_size = max(workers + max_queue, 5)
+
+        self.pool = DetachableWorkerPool(workers, max_streams)
+        self._local = threading.local()
+        # 正在常驻工作线程中处理和排队的请求总数上限（已让出工作线程的请求不计入）
+        self.slots = threading.BoundedSemaphore(workers + max_queue)
+        self.inflight = 0
+        self.inflight_cond = threading.Condition()
+        # 等待请求数据的空闲连接 {socket: _Connection}，由选择器线程管理
+        self._selector = selectors.DefaultSelector()
+        self._idle = {}
+        self._parking = []
+        self._parking_lock = threading.Lock()
+        self._wakeup_recv, self._wakeup_send = socket.socketpair()
+        self._wakeup_recv.setblocking(False)
+        self._selector.register(self._wakeup_recv, selectors.EVENT_READ)
+        self._closing = False
+
+        try:
+            super().__init__(host, port, app, handler=PooledRequestHandler)
+        except SystemExit:
+            # werkzeug在端口被占用时会调用sys.exit，这里转换为普通异常
+            self.pool.shutdown()
+            self._close_selector()
+            raise OSError(f"端口 {port} 已被占用")
+
+        self._selector_thread = threading.Thread(target=self._selector_loop, name="api-selector", daemon=True)
+        self._selector_thread.start()
+
+    def process_request(self, request, client_address):
+        """新连接先等待请求数据，不占用工作线程"""
+        self._park(_Connection(request, client_address))
+
+    def _park(self, connection: _Connection):
+        """连接交给选择器线程等待下一个请求"""
+        connection.deadline = time.monotonic() + self.keepalive_timeout
+        with self._parking_lock:
+            if self._closing:
+                self._close_connection(connection)
+                return
+            self._parking.append(connection)
+        try:
+            self._wakeup_send.send(b'\0')
+        except OSError:
+            pass
+
+    def _selector_loop(self):
+        """等待空闲连接的请求数据，可读时交给线程池处理，超时则关闭"""
+        while True:
+            with self._parking_lock:
+                if self._closing:
+                    break
+                parking, self._parking = self._parking, []
+            for connection in parking:
+                if len(self._idle) >= self.max_idle_connections:
+                    self._reject(connection.sock)
+                    continue
+                try:
+                    self._selector.register(connection.sock, selectors.EVENT_READ, connection)
+                except (ValueError, OSError):
+                    self._close_connection(connection)
+                    continue
+                self._idle[connection.sock] = connection
+
+            timeout = 1.0
+            if self._idle:
+                timeout = max(0.0, min(timeout, min(c.deadline for c in self._idle.values()) - time.monotonic()))
+            for key, _ in self._selector.select(timeout):
+                if key.fileobj is self._wakeup_recv:
+                    try:
+                        while self._wakeup_recv.recv(4096):
+                            pass
+                    except OSError:
+                        pass
+                    continue
+                connection = key.data
+                self._unpark(connection)
+                self._dispatch(connection)
+
+            now = time.monotonic()
+            for connection in [c for c in self._idle.values() if c.deadline <= now]:
+                self._unpark(connection)
+                self._close_connection(connection)
+
+        for connection in list(self._idle.values()):
+            self._unpark(connection)
+            self._close_connection(connection)
+        self._close_selector()
+
+    def _unpark(self, connection: _Connection):
+        """在选择器线程中调用：停止等待连接"""
+        self._idle.pop(connection.sock, None)
+        try:
+            self._selector.unregister(connection.sock)
+        except (KeyError, ValueError):
+            pass
+
+    def _dispatch(self, connection: _Connection):
+        """将收到请求的连接交给线程池处理，队列已满时直接拒绝"""
+        if not self.slots.acquire(blocking=False):
+            self._reject(connection.sock)
+            return
+
+        with self.inflight_cond:
+            self.inflight += 1
+        self.pool.submit(self._process_in_worker, connection)
+
+    def _process_in_worker(self, connection: _Connection):
+        """在工作线程中处理连接上的一个请求，之后连接回到选择器等待下一个请求"""
+        self._local.connection = connection
+        keep_open = False
+        try:
+            if connection.handler is None:
+                connection.handler = self.RequestHandlerClass(connection.sock, connection.client_address, self)
+            connection.handler.handle_request()
+            keep_open = not connection.handler.close_connection and not self._closing
+        except Exception:
+            self.handle_error(connection.sock, connection.client_address)
+        finally:
+            self._local.connection = None
+            if not connection.released:
+                self.slots.release()
+            connection.released = False
+            with self.inflight_cond:
+                self.inflight -= 1
+                self.inflight_cond.notify_all()
+
+        if not keep_open:
+            self._close_connection(connection)
+        elif self._has_buffered_request(connection):
+            # 客户端已发送下一个请求（可能已读入缓冲区），直接继续处理
+            self._dispatch(connection)
+        else:
+            self._park(connection)
+
+    @staticmethod
+    def _has_buffered_request(connection: _Connection) -> bool:
+        """不阻塞地检查连接上是否已有下一个请求的数据（包括已读入缓冲区的数据）"""
+        sock = connection.sock
+        try:
+            sock.setblocking(False)
+            try:
+                return bool(connection.handler.rfile.peek(1))
+            finally:
+                sock.settimeout(connection.handler.timeout)
+        except (OSError, ValueError):
+            return False
+
+    def release_worker(self) -> bool:
+        """当前请求让出常驻工作线程，并释放其占用的排队名额
+
+        Returns:
+            是否已让出
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            return False
+        if connection.released:
+            return True
+        if not self.pool.detach():
+            return False
+        connection.released = True
+        self.slots.release()
+        return True
+
+    def _close_connection(self, connection: _Connection):
+        """关闭连接"""
+        if connection.handler is not None:
+            try:
+                connection.handler.finish()
+            except Exception:
+                pass
+        self.shutdown_request(connection.sock)
+
+    def _close_selector(self):
+        """关闭选择器和唤醒socket"""
+        self._selector.close()
+        self._wakeup_recv.close()
+        self._wakeup_send.close()
+
+    def _reject(self, request):
+        """返回503（阿里API格式），告知调用方服务繁忙"""
+        body = json.dumps({"code": 503, "message": "Server busy", "data": None}).encode('utf-8')
+        try:
+            request.sendall(
+                b"HTTP/1.1 503 Service Unavailable\r\n"
+                b"Content-Type: application/json\r\n"
+                b"Retry-After: 1\r\n"
+                b"Connection: close\r\n"
+                + f"Content-Length: {len(body)}\r\n\r\n".encode('ascii')
+                + body
+            )
+        except OSError:
+            pass
+        finally:
+            self.shutdown_request(request)
+
+    def wait_for_inflight(self, timeout: float) -> bool:
+        """等待正在处理的请求完成
+
+        Args:
+            timeout: 最长等待时间（秒）
+
+        Returns:
+            是否所有请求都已完成
+        """
+        deadline = time.time() + timeout
+        with self.inflight_cond:
+            while self.inflight > 0:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False
+                self.inflight_cond.wait(remaining)
+        return True
+
+    def close_workers(self):
+        """关闭线程池和空闲连接，丢弃仍在排队的请求"""
+        with self._parking_lock:
+            self._closing = True
+            parking, self._parking = self._parking, []
+        for connection in parking:
+            self._close_connection(connection)
+        try:
+            self._wakeup_send.send(b'\0')
+        except OSError:
+            pass
+        for (connection,) in self.pool.shutdown():
+            self._close_connection(connection)
+
+
+class ApiServer:
+    """API服务的生产级运行容器：线程池、有界队列和优雅停止"""
+
+    def __init__(self, app, host: str = '0.0.0.0', port: int = 5000, workers: int = 8,
+                 max_queue: int = 32, keepalive_timeout: float = 15, shutdown_timeout: float = 10,
+                 max_streams: int = 64):
+        """
+        初始化API服务
+
+        Args:
+            app: Flask应用
+            host: 监听地址
+            port: 监听端口
+            workers: 工作线程数
+            max_queue: 最大排队请求数
+            keepalive_timeout: keep-alive连接的空闲超时（秒）
+            shutdown_timeout: 停止时等待正在处理的请求完成的最长时间（秒）
+            max_streams: WebSocket、流式响应和排队中的请求最多让出的工作线程数
+        """
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.max_queue = max_queue
+        self.keepalive_timeout = keepalive_timeout
+        self.shutdown_timeout = shutdown_timeout
+        self.max_streams = max_streams
+        self.server = None
+        self.server_thread = None
+        self.running = False
+
+    def start(self):
+        """启动API服务（端口绑定失败时抛出异常）"""
+        if self.running:
+            print("API服务已经在运行中")
+            return
+
+        self.server = PooledWSGIServer(
+            self.host,
+            self.port,
+            self.app,
+            workers=self.workers,
+            max_queue=self.max_queue,
+            keepalive_timeout=self.keepalive_timeout,
+            max_streams=self.max_streams
+        )
+        self.running = True
+
+        self.server_thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.server_thread.start()
+
+        print(f"API服务启动成功，端口: {self.port}，工作线程: {self.workers}，最大排队: {self.max_queue}")
+
+    def stop(self):
+        """优雅停止API服务：停止接收新连接，等待正在处理的请求完成后关闭"""
+        if not self.running:
+            print("API服务未运行")
+            return
+
+        self.running = False
+
+        # 停止接收新连接（serve_forever退出时werkzeug会关闭监听socket）
+        self.server.shutdown()
+
+        # 等待正在处理的请求完成
+        if not self.server.wait_for_inflight(self.shutdown_timeout):
+            print(f"仍有 {self.server.inflight} 个请求未完成，强制关闭API服务")
+
+        self.server.close_workers()
+        print("API服务已停止")
+
+    def get_stats(self):
+        """获取服务运行统计
+
+        Returns:
+            统计信息字典
+        """
+        return {
+            'running': self.running,
+            'workers': self.workers,
+            'max_queue': self.max_queue,
+            'max_streams': self.max_streams,
+            'streams': self.server.pool.get_stats()['detached'] if self.server else 0,
+            'inflight': self.server.inflight if self.server else 0
+        }
@@ -1,41 +1,105 @@
+import importlib.util
+import sys
 import threading
 import time
-import json
-import os
+from collections import OrderedDict
+from typing import Optional
 from communication.websocket_server import WebSocketServer
+from config.environment import EnvironmentConfig
 from config.ports import PortConfig
+from utils.memory_store import SqliteMemoryStore
+from utils.memory_index import MemoryIndex
+from utils.memory_columns import UserMemories
 
 class MemoryServer:
     """记忆服务器，负责存储和管理对话历史"""
     
-    def __init__(self):
-        """初始化记忆服务器"""
+    def __init__(self, db_file: str = "memory_store.db", max_memories_per_user: int = 1000,
+                 compact_interval: float = 300, embedding_model: Optional[str] = None,
+                 ollama_url: Optional[str] = None, memory_ttl: Optional[float] = None,
+                 max_loaded_memories: Optional[int] = None, user_idle_timeout: float = 3600):
+        """初始化记忆服务器
+        
+        Args:
+            db_file: 记忆数据库文件路径
+            max_memories_per_user: 每个用户保留的记忆数量
+            compact_interval: 存储压缩间隔（秒）
+            embedding_model: 用于语义检索的Ollama嵌入模型（默认读取环境变量NEKO_EMBEDDING_MODEL，为空时不启用）
+            ollama_url: Ollama地址（默认读取环境变量NEKO_OLLAMA_URL）
+            memory_ttl: 记忆保留时间（秒，默认读取环境变量NEKO_MEMORY_TTL，为0时不过期）
+            max_loaded_memories: 内存中最多保留的记忆总数，超出时卸载最久未访问的用户
+                （默认读取环境变量NEKO_MEMORY_MAX_LOADED，未设置时为100000）
+            user_idle_timeout: 用户超过该时间（秒）未访问时卸载其记忆，为0时不按空闲时间卸载
+        """
         self.port = PortConfig.get_memory_server_port()
         self.websocket_server = None
         self.running = False
+        # 已加载到内存的用户记忆 {user_id: UserMemories}（首次访问用户时从数据库读取）
         self.memory_store = {}
+        # 各用户记忆的倒排索引 {user_id: MemoryIndex}
+        self.memory_indexes = {}
+        # 旧版JSON存储文件，首次启动时导入数据库
         self.memory_file = "memory_store.json"
+        self.max_memories_per_user = max_memories_per_user
+        self.compact_interval = compact_interval
+        self.memory_ttl = memory_ttl if memory_ttl is not None else EnvironmentConfig.get_int(EnvironmentConfig.MEMORY_TTL, 0)
+        self.max_loaded_memories = max_loaded_memories or EnvironmentConfig.get_int(EnvironmentConfig.MEMORY_MAX_LOADED, 100000)
+        self.user_idle_timeout = user_idle_timeout
+        self._lock = threading.RLock()
+        self._stop_event = threading.Event()
+        self.compact_thread = None
+        self.store = SqliteMemoryStore(db_file, max_per_user=max_memories_per_user)
+        # 已加载用户的最近访问时间（按访问顺序排列，最久未访问的在前）和已加载的记忆总数
+        self._user_lru = OrderedDict()
+        self._loaded_count = 0
+        # 淘汰统计
+        self.total_users_evicted = 0
+        self.total_idle_users_evicted = 0
+        self.total_memories_expired = 0
+        self.total_memories_capped = 0
+        
+        # 语义检索（可选）：各用户记忆的向量矩阵 {user_id: VectorIndex}
+        self.vector_indexes = {}
+        self.embedder = None
+        self.embedding_model = embedding_model or EnvironmentConfig.get(EnvironmentConfig.EMBEDDING_MODEL)
+        if self.embedding_model:
+            self._init_embedder(ollama_url or EnvironmentConfig.get(EnvironmentConfig.OLLAMA_URL, "http://localhost:11434"))
         
         # 加载记忆数据
         self.load_memory()
     
+    def _init_embedder(self, ollama_url: str):
+        """初始化向量计算（需要numpy，未安装时只支持关键词检索）"""
+        if importlib.util.find_spec("numpy") is None:
+            print("未安装numpy，记忆服务器不启用语义检索")
+            self.embedding_model = None
+            return
+        from utils.embeddings import EmbeddingWorker
+        from utils.http_client import PooledHttpClient
+        
+        self.embedder = EmbeddingWorker(
+            PooledHttpClient(pool_size=2),
+            ollama_url,
+            self.embedding_model,
+            on_result=self._on_embeddings
+        )
+        print(f"记忆服务器启用语义检索，嵌入模型: {self.embedding_model}")
+    
     def load_memory(self):
-        """从文件加载记忆数据"""
+        """加载记忆数据（导入旧版JSON文件；记忆内容按用户按需读取）"""
         try:
-            if os.path.exists(self.memory_file):
-                with open(self.memory_file, 'r', encoding='utf-8') as f:
-                    self.memory_store = json.load(f)
-                print(f"已加载 {len(self.memory_store)} 条记忆数据")
+            migrated = self.store.migrate_json(self.memory_file)
+            if migrated:
+                print(f"已从 {self.memory_file} 导入 {migrated} 条记忆数据")
+            print(f"已加载 {len(self.store.user_counts())} 位用户的记忆数据")
         except Exception as e:
             print(f"加载记忆数据失败: {str(e)}")
-            self.memory_store = {}
     
     def save_memory(self):
-        """保存记忆数据到文件"""
+        """压缩记忆存储（每条记忆写入时已提交，这里只合并WAL并回收空间）"""
         try:
-            with open(self.memory_file, 'w', encoding='utf-8') as f:
-                json.dump(self.memory_store, f, ensure_ascii=False, indent=2)
-            print(f"已保存 {len(self.memory_store)} 条记忆数据")
+            self.store.compact()
+            print(f"已保存 {sum(self.store.user_counts().values())} 条记忆数据")
         except Exception as e:
             print(f"保存记忆数据失败: {str(e)}")
     
@@ -46,6 +110,9 @@ class MemoryServer:
             return
         
         self.running = True
+        self._stop_event.clear()
+        # 停止时已关闭存储，重新启动时再打开
+        self.store.open()
         
         # 启动WebSocket服务器
         self.websocket_server = WebSocketServer('0.0.0.0', self.port)
@@ -54,9 +121,13 @@ class MemoryServer:
         
         print(f"记忆服务器启动成功，端口: {self.port}")
         
-        # 启动定期保存任务
-        self.save_thread = threading.Thread(target=self._periodic_save, daemon=True)
-        self.save_thread.start()
+        # 启动后台向量计算
+        if self.embedder:
+            self.embedder.start()
+        
+        # 启动定期压缩任务
+        self.compact_thread = threading.Thread(target=self._periodic_compact, daemon=True)
+        self.compact_thread.start()
     
     def stop(self):
         """停止记忆服务器"""
@@ -65,22 +136,52 @@ class MemoryServer:
             return
         
         self.running = False
+        self._stop_event.set()
         
         # 停止WebSocket服务器
         if self.websocket_server:
             self.websocket_server.stop()
         
-        # 保存记忆数据
+        if self.embedder:
+            self.embedder.stop()
+        
+        # 等待正在进行的定期压缩结束，再保存记忆数据并关闭数据库
+        if self.compact_thread:
+            self.compact_thread.join(timeout=10)
         self.save_memory()
+        self.store.close()
         
         print("记忆服务器已停止")
     
-    def _periodic_save(self):
-        """定期保存记忆数据"""
-        while self.running:
-            time.sleep(60)  # 每分钟保存一次
-            if self.running:
-                self.save_memory()
+    def _periodic_compact(self):
+        """定期压缩记忆存储"""
+        while not self._stop_event.wait(self.compact_interval):
+            self.expire_memories()
+            self.save_memory()
+    
+    def expire_memories(self):
+        """删除过期的记忆，卸载长时间未访问的用户"""
+        now = time.time()
+        cutoff = now - self.memory_ttl if self.memory_ttl else None
+        with self._lock:
+            if cutoff is not None:
+                for user_id in list(self.memory_store):
+                    self._expire_user(user_id, cutoff)
+            if self.user_idle_timeout:
+                # 按访问顺序检查，遇到未超时的用户即可停止
+                for user_id, last_access in list(self._user_lru.items()):
+                    if now - last_access <= self.user_idle_timeout:
+                        break
+                    self._evict_user(user_id)
+                    self.total_idle_users_evicted += 1
+        
+        if cutoff is not None:
+            try:
+                expired = self.store.expire(cutoff)
+                if expired:
+                    print(f"已删除 {expired} 条过期记忆")
+            except Exception as e:
+                print(f"删除过期记忆失败: {str(e)}")
     
     def _on_websocket_message(self, client, message):
         """处理WebSocket消息"""
@@ -111,8 +212,9 @@ class MemoryServer:
                     user_id = message.get('user_id')
                     query = message.get('query', '')
                     limit = message.get('limit', 5)
+                    mode = message.get('mode', 'keyword')
                     
-                    memories = self.retrieve_memory(user_id, query, limit)
+                    memories = self.retrieve_memory(user_id, query, limit, mode)
                     self.websocket_server.send_to_client(
                         client, 
                         {'type': 'retrieve_memory_response', 'memories': memories}
@@ -153,54 +255,178 @@ class MemoryServer:
             user_id: 用户ID
             memory: 记忆数据字典
         """
-        if user_id not in self.memory_store:
-            self.memory_store[user_id] = []
+        # 同一用户的ID只保留一份字符串
+        user_id = sys.intern(user_id)
+        # 时间戳由服务器添加，创建时间在返回时才由时间戳格式化
+        timestamp = time.time()
+        data = {key: value for key, value in memory.items() if key not in ('timestamp', 'created_at')}
+        
+        with self._lock:
+            memories = self._load_user(user_id)
+            index = self.memory_indexes[user_id]
+            
+            # 先写入数据库（追加一行并提交），再更新内存和索引
+            memory_id = self.store.append(user_id, timestamp, data)
+            # 达到每用户上限时覆盖最旧的记忆（数据库中的旧记录在压缩时裁剪）
+            evicted_id = memories.append(memory_id, timestamp, data)
+            text = memories.text(len(memories) - 1)
+            index.add(memory_id, text, timestamp)
+            if evicted_id is not None:
+                index.remove(evicted_id)
+                if self.embedder:
+                    self.vector_indexes[user_id].remove(evicted_id)
+                self.total_memories_capped += 1
+            else:
+                self._loaded_count += 1
+                self._enforce_budget(keep=user_id)
+        
+        # 向量在后台批量计算，不阻塞写入
+        if self.embedder:
+            self.embedder.submit((user_id, memory_id), text)
+    
+    def _load_user(self, user_id: str, create: bool = True):
+        """获取用户的记忆，尚未加载时从数据库读取并建立索引（调用方需持有锁）
         
-        # 添加时间戳
-        memory['timestamp'] = time.time()
-        memory['created_at'] = time.strftime('%Y-%m-%d %H:%M:%S')
+        Args:
+            user_id: 用户ID
+            create: 数据库中没有该用户的记忆时是否仍为其建立空记录（只有写入时需要）
+            
+        Returns:
+            用户的记忆；create为False且用户没有记忆时返回None（不占用内存）
+        """
+        now = time.time()
+        cutoff = now - self.memory_ttl if self.memory_ttl else None
+        memories = self.memory_store.get(user_id)
+        if memories is None:
+            rows = self.store.load_user(user_id, min_timestamp=cutoff)
+            if not rows and not create:
+                return None
+            user_id = sys.intern(user_id)
+            memories = UserMemories(self.max_memories_per_user)
+            index = MemoryIndex()
+            for memory_id, timestamp, data in rows:
+                memories.append(memory_id, timestamp, data)
+                index.add(memory_id, memories.text(len(memories) - 1), timestamp)
+            self.memory_store[user_id] = memories
+            self.memory_indexes[user_id] = index
+            if self.embedder:
+                self._load_vectors(user_id, memories)
+            self._user_lru[user_id] = now
+            self._loaded_count += len(memories)
+            self._enforce_budget(keep=user_id)
+        else:
+            self._user_lru[user_id] = now
+            self._user_lru.move_to_end(user_id)
+            if cutoff is not None:
+                self._expire_user(user_id, cutoff)
+        return memories
+    
+    def _expire_user(self, user_id: str, cutoff: float):
+        """移除已加载用户在指定时间之前写入的记忆（调用方需持有锁）"""
+        memories = self.memory_store[user_id]
+        index = self.memory_indexes[user_id]
+        vectors = self.vector_indexes.get(user_id)
+        expired = 0
+        # 记忆按写入顺序存放，只需检查最旧的几条
+        while memories and memories.oldest_timestamp() < cutoff:
+            memory_id = memories.pop_oldest()
+            index.remove(memory_id)
+            if vectors is not None:
+                vectors.remove(memory_id)
+            expired += 1
+        self._loaded_count -= expired
+        self.total_memories_expired += expired
+    
+    def _evict_user(self, user_id: str):
+        """从内存中卸载用户的记忆和索引（记忆写入时已提交，数据库中的数据不受影响；调用方需持有锁）"""
+        memories = self.memory_store.pop(user_id, None)
+        self.memory_indexes.pop(user_id, None)
+        self.vector_indexes.pop(user_id, None)
+        self._user_lru.pop(user_id, None)
+        if memories is not None:
+            self._loaded_count -= len(memories)
+    
+    def _enforce_budget(self, keep: str):
+        """已加载的记忆总数超出预算时，卸载最久未访问的用户（调用方需持有锁）
         
-        # 存储记忆
-        self.memory_store[user_id].append(memory)
+        Args:
+            keep: 正在访问、不能卸载的用户
+        """
+        while self._loaded_count > self.max_loaded_memories and self._user_lru:
+            user_id = next(iter(self._user_lru))
+            if user_id == keep:
+                break
+            self._evict_user(user_id)
+            self.total_users_evicted += 1
+    
+    def _load_vectors(self, user_id: str, memories):
+        """从数据库读取用户记忆的向量，缺少向量的记忆提交后台计算（调用方需持有锁）"""
+        import numpy as np
+        from utils.vector_index import VectorIndex
         
-        # 限制每个用户的记忆数量
-        max_memories_per_user = 1000
-        if len(self.memory_store[user_id]) > max_memories_per_user:
-            self.memory_store[user_id] = self.memory_store[user_id][-max_memories_per_user:]
+        vectors = self.vector_indexes[user_id] = VectorIndex()
+        saved = self.store.load_embeddings(user_id, self.embedding_model)
+        for memory_id, _, text in memories.texts():
+            vector = saved.get(memory_id)
+            if vector is not None:
+                vectors.add(memory_id, np.frombuffer(vector, dtype=np.float32))
+            else:
+                self.embedder.submit((user_id, memory_id), text)
+    
+    def _on_embeddings(self, keys, embeddings):
+        """后台向量计算完成：加入向量矩阵并保存到数据库"""
+        rows = []
+        with self._lock:
+            for (user_id, memory_id), embedding in zip(keys, embeddings):
+                vectors = self.vector_indexes.get(user_id)
+                memories = self.memory_store.get(user_id)
+                if vectors is None or memories is None or memory_id not in memories:
+                    # 记忆已被删除或用户已卸载，下次加载时会重新提交
+                    continue
+                vectors.add(memory_id, embedding)
+                rows.append((memory_id, self.embedding_model, vectors.normalize(embedding).tobytes()))
+        if rows:
+            self.store.save_embeddings(rows)
     
-    def retrieve_memory(self, user_id: str, query: str = '', limit: int = 5):
+    def retrieve_memory(self, user_id: str, query: str = '', limit: int = 5, mode: str = 'keyword'):
         """检索记忆
         
         Args:
             user_id: 用户ID
             query: 检索查询
             limit: 返回数量限制
+            mode: 检索方式，keyword（关键词）或 semantic（向量相似度，未启用或失败时按关键词检索）
             
         Returns:
             记忆列表
         """
-        if user_id not in self.memory_store:
+        if not user_id:
             return []
         
-        memories = self.memory_store[user_id]
+        if mode == 'semantic' and query and self.embedder:
+            # 查询向量在锁外计算，避免网络请求阻塞写入
+            embeddings = self.embedder.embed([query])
+            if embeddings:
+                with self._lock:
+                    memories = self._load_user(user_id, create=False)
+                    if memories is None:
+                        return []
+                    results = self.vector_indexes[user_id].search(embeddings[0], limit)
+                    return memories.get([memory_id for memory_id, _ in results])
         
-        # 如果有查询，进行简单的关键词匹配
-        if query:
-            query_lower = query.lower()
-            filtered_memories = []
+        with self._lock:
+            # 没有记忆的用户不在内存中建立记录，大量未知用户的查询不会占用内存
+            memories = self._load_user(user_id, create=False)
+            if memories is None:
+                return []
             
-            for memory in memories:
-                # 检查记忆内容是否包含查询关键词
-                content = str(memory.get('content', '')).lower()
-                if query_lower in content:
-                    filtered_memories.append(memory)
+            # 有查询时按倒排索引检索（BM25加时间衰减），只计算命中查询词的记忆
+            if query:
+                memory_ids = self.memory_indexes[user_id].search(query, limit)
+                return memories.get(memory_ids)
             
-            memories = filtered_memories
-        
-        # 按时间戳排序，返回最新的
-        memories.sort(key=lambda x: x.get('timestamp', 0), reverse=True)
-        
-        return memories[:limit]
+            # 没有查询时返回最新的记忆（按写入顺序倒序读取，无需排序）
+            return memories.newest(limit)
     
     def clear_memory(self, user_id: str):
         """清除用户记忆
@@ -208,8 +434,9 @@ class MemoryServer:
         Args:
             user_id: 用户ID
         """
-        if user_id in self.memory_store:
-            del self.memory_store[user_id]
+        with self._lock:
+            self._evict_user(user_id)
+            self.store.delete_user(user_id)
     
     def get_memory_stats(self):
         """获取记忆统计信息
@@ -217,16 +444,36 @@ class MemoryServer:
         Returns:
             统计信息字典
         """
-        total_memories = 0
-        user_counts = {}
-        
-        for user_id, memories in self.memory_store.items():
-            count = len(memories)
-            total_memories += count
-            user_counts[user_id] = count
+        user_counts = self.store.user_counts()
+        with self._lock:
+            index_stats = [index.get_stats() for index in self.memory_indexes.values()]
+            vector_stats = [vectors.get_stats() for vectors in self.vector_indexes.values()]
+            loaded_memories = sum(len(memories) for memories in self.memory_store.values())
+            memory_bytes = sum(memories.nbytes() for memories in self.memory_store.values())
         
         return {
-            'total_users': len(self.memory_store),
-            'total_memories': total_memories,
-            'user_counts': user_counts
+            'total_users': len(user_counts),
+            'total_memories': sum(user_counts.values()),
+            'user_counts': user_counts,
+            'loaded_users': len(self.memory_store),
+            'loaded_memories': loaded_memories,
+            'memory_bytes': memory_bytes,
+            'max_loaded_memories': self.max_loaded_memories,
+            'memory_ttl': self.memory_ttl,
+            'evictions': {
+                'users_evicted': self.total_users_evicted,
+                'idle_users_evicted': self.total_idle_users_evicted,
+                'memories_expired': self.total_memories_expired,
+                'memories_capped': self.total_memories_capped
+            },
+            'index': {
+                'terms': sum(stats['terms'] for stats in index_stats),
+                'postings': sum(stats['postings'] for stats in index_stats)
+            },
+            'embeddings': dict(
+                self.embedder.get_stats(),
+                vectors=sum(stats['vectors'] for stats in vector_stats),
+                bytes=sum(stats['bytes'] for stats in vector_stats)
+            ) if self.embedder else None,
+            'storage': self.store.get_stats()
         }
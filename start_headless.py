@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+无界面启动脚本 - 不创建Tk窗口、不导入customtkinter，直接运行API服务、MCP Router和NOKE服务器
+适合在没有显示器的服务器上以守护进程方式运行，配置与图形界面共用config.ini
+"""
+
+import argparse
+import os
+import signal
+import sys
+import threading
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from core.chat_service import ChatService
+
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="Ollama Chat Client 无界面服务")
+    parser.add_argument("--port", type=int, default=None, help="API服务端口（默认使用config.ini中的api_server_port）")
+    parser.add_argument("--no-api", action="store_true", help="不启动API服务")
+    parser.add_argument("--mcp", action="store_true", help="启动MCP Router")
+    parser.add_argument("--mcp-port", type=int, default=None, help="MCP Router端口（默认8000）")
+    parser.add_argument("--noke", action="store_true", help="启动NOKE服务器集群")
+    parser.add_argument("--external-calls", action="store_true", help="启用向外调用服务")
+    return parser.parse_args()
+
+
+def main():
+    """主函数"""
+    args = parse_args()
+
+    print("启动Ollama Chat Client（无界面模式）...")
+    service = ChatService()
+    service.load_config()
+    service.apply_config()
+    # 在后台获取模型列表，不阻塞启动
+    service.model_catalog.refresh()
+
+    if args.external_calls:
+        service.external_call_enabled = True
+
+    if not args.no_api:
+        service.start_api_server(args.port)
+        if not service.api_server_enabled:
+            service.shutdown()
+            sys.exit(1)
+
+    if args.mcp:
+        if args.mcp_port:
+            service.mcp_router_port = args.mcp_port
+        service.mcp_router_enabled = True
+        service.start_mcp_router()
+
+    if args.noke:
+        success, message = service.start_noke_servers()
+        if not success:
+            print(message)
+
+    # 收到SIGINT/SIGTERM时优雅退出
+    stop_event = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+
+    print("服务已启动，按Ctrl+C停止")
+    # 带超时等待，保证Windows上也能及时响应Ctrl+C
+    while not stop_event.wait(1):
+        pass
+
+    print("正在停止服务...")
+    service.shutdown()
+    print("服务已停止")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+class ApiKeyIndex:
+    """API Key内存索引：O(1)查找，过期时间在构建索引时预先解析
+
+    索引字典在重建时整体替换，读取方无需加锁。
+    """
+
+    def __init__(self, sweep_interval: int = 60):
+        """
+        初始化API Key索引
+
+        Args:
+            sweep_interval: 后台清理过期Key的间隔（秒）
+        """
+        # {api_key: (过期时间戳, key_info)}
+        self._index: Dict[str, Tuple[float, dict]] = {}
+        self._lock = threading.Lock()
+        self.sweep_interval = sweep_interval
+        self.sweeper_thread = None
+        self.running = False
+
+    def rebuild(self, api_keys: List[dict]):
+        """根据API Key列表重建索引
+
+        Args:
+            api_keys: API Key信息列表（包含key和expires_at）
+        """
+        now = time.time()
+        index = {}
+        for key_info in api_keys:
+            try:
+                expires_ts = datetime.fromisoformat(key_info['expires_at']).timestamp()
+            except (KeyError, TypeError, ValueError):
+                print(f"API Key过期时间无效，已忽略: {str(key_info.get('key', ''))[:8]}...")
+                continue
+            # 已过期的Key不进入索引
+            if expires_ts > now:
+                index[key_info['key']] = (expires_ts, key_info)
+
+        with self._lock:
+            self._index = index
+
+    def validate(self, api_key: Optional[str]) -> Optional[dict]:
+        """验证API Key
+
+        Args:
+            api_key: 待验证的API Key
+
+        Returns:
+            有效时返回key_info，无效或过期返回None
+        """
+        if not api_key:
+            return None
+        entry = self._index.get(api_key)
+        if entry is None or entry[0] <= time.time():
+            return None
+        return entry[1]
+
+    def sweep_expired(self) -> int:
+        """从索引中移除已过期的Key
+
+        Returns:
+            移除的数量
+        """
+        now = time.time()
+        with self._lock:
+            expired = [key for key, (expires_ts, _) in self._index.items() if expires_ts <= now]
+            if expired:
+                index = dict(self._index)
+                for key in expired:
+                    del index[key]
+                self._index = index
+        return len(expired)
+
+    def start_sweeper(self):
+        """启动后台清理线程"""
+        if self.running:
+            return
+        self.running = True
+        self.sweeper_thread = threading.Thread(target=self._sweep_loop, daemon=True)
+        self.sweeper_thread.start()
+
+    def stop_sweeper(self):
+        """停止后台清理线程"""
+        self.running = False
+
+    def _sweep_loop(self):
+        """定期清理过期Key"""
+        while self.running:
+            time.sleep(self.sweep_interval)
+            try:
+                removed = self.sweep_expired()
+                if removed:
+                    print(f"已从索引中移除 {removed} 个过期API Key")
+            except Exception as e:
+                print(f"清理过期API Key失败: {str(e)}")
+
+    def __len__(self):
+        return len(self._index)
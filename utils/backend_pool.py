@@ -0,0 +1,345 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterable, Iterator, List, Optional
+
+import requests
+
+# 路由策略
+ROUTING_LEAST_LOADED = "least_loaded"  # 进行中请求最少的后端
+ROUTING_AFFINITY = "affinity"  # 优先已加载该模型的后端，其次进行中请求最少
+
+
+def normalize_model_name(name: str) -> str:
+    """规范化模型名（未带标签时视为 :latest）"""
+    return name if ":" in name else f"{name}:latest"
+
+
+class OllamaBackend:
+    """单个Ollama后端的状态"""
+
+    __slots__ = ('url', 'inflight', 'failures', 'ejected_until', 'models', 'loaded',
+                 'latency', 'last_checked', 'total_requests', 'total_failures', 'total_ejections')
+
+    def __init__(self, url: str):
+        """
+        初始化后端
+
+        Args:
+            url: Ollama地址
+        """
+        self.url = url.rstrip("/")
+        self.inflight = 0
+        # 连续失败次数，达到上限后暂时剔除
+        self.failures = 0
+        self.ejected_until = 0.0
+        # 已安装的模型（/api/tags）和已加载到内存的模型（/api/ps）
+        self.models = set()
+        self.loaded = set()
+        # 健康检查延迟（秒，指数平滑）
+        self.latency: Optional[float] = None
+        self.last_checked = 0.0
+        # 统计
+        self.total_requests = 0
+        self.total_failures = 0
+        self.total_ejections = 0
+
+    def is_ejected(self, now: float) -> bool:
+        """是否处于剔除期"""
+        return self.ejected_until > now
+
+    def has_model(self, model: str) -> bool:
+        """是否已安装该模型"""
+        return normalize_model_name(model) in self.models
+
+
+class OllamaBackendPool:
+    """多个Ollama后端的负载均衡
+
+    按路由策略选择后端并统计进行中的请求数；连接失败时换下一个后端重试，
+    连续失败的后端会被暂时剔除，由后台健康检查恢复。
+    只配置一个地址时行为与直接请求该地址相同。
+    """
+
+    def __init__(self, http, urls: Iterable[str], strategy: str = ROUTING_LEAST_LOADED,
+                 max_failures: int = 3, eject_time: float = 30, health_interval: float = 15):
+        """
+        初始化后端池
+
+        Args:
+            http: HTTP客户端（PooledHttpClient）
+            urls: Ollama地址列表（第一个为主后端）
+            strategy: 路由策略（least_loaded / affinity）
+            max_failures: 连续失败多少次后剔除后端
+            eject_time: 剔除时长（秒）
+            health_interval: 健康检查间隔（秒）
+        """
+        self.http = http
+        self.strategy = strategy
+        self.max_failures = max_failures
+        self.eject_time = eject_time
+        self.health_interval = health_interval
+        self._backends: List[OllamaBackend] = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self.health_thread = None
+        self.running = False
+        self.configure(urls)
+
+    def configure(self, urls: Iterable[str], strategy: Optional[str] = None,
+                  max_failures: Optional[int] = None, eject_time: Optional[float] = None,
+                  health_interval: Optional[float] = None):
+        """更新后端地址和策略（保留地址未变的后端的状态）"""
+        if strategy is not None:
+            self.strategy = strategy
+        if max_failures is not None:
+            self.max_failures = max_failures
+        if eject_time is not None:
+            self.eject_time = eject_time
+        if health_interval is not None:
+            self.health_interval = health_interval
+
+        with self._lock:
+            existing = {backend.url: backend for backend in self._backends}
+            backends = []
+            for url in urls:
+                url = url.strip().rstrip("/")
+                if url and all(backend.url != url for backend in backends):
+                    backends.append(existing.get(url) or OllamaBackend(url))
+            self._backends = backends
+        # 地址变化后立即做一次健康检查
+        self._wakeup.set()
+
+    @property
+    def primary_url(self) -> str:
+        """主后端地址"""
+        with self._lock:
+            return self._backends[0].url if self._backends else ""
+
+    def __len__(self):
+        return len(self._backends)
+
+    def available(self) -> List[OllamaBackend]:
+        """未被剔除的后端（全部被剔除时返回最早恢复的一个）"""
+        now = time.monotonic()
+        with self._lock:
+            backends = [backend for backend in self._backends if not backend.is_ejected(now)]
+            if not backends and self._backends:
+                backends = [min(self._backends, key=lambda backend: backend.ejected_until)]
+            return backends
+
+    def choose(self, model: Optional[str] = None, exclude: Iterable[OllamaBackend] = ()) -> Optional[OllamaBackend]:
+        """按路由策略选择后端
+
+        Args:
+            model: 请求的模型（有后端已安装该模型时只在这些后端中选择）
+            exclude: 本次请求已尝试失败的后端
+
+        Returns:
+            选中的后端，没有可用后端时返回None
+        """
+        candidates = [backend for backend in self.available() if backend not in exclude]
+        if model:
+            having = [backend for backend in candidates if backend.has_model(model)]
+            if having:
+                candidates = having
+        if not candidates:
+            return None
+
+        name = normalize_model_name(model) if model else None
+        with self._lock:
+            if self.strategy == ROUTING_AFFINITY and name:
+                key = lambda backend: (name not in backend.loaded, backend.inflight, backend.total_requests)
+            else:
+                key = lambda backend: (backend.inflight, backend.total_requests)
+            return min(candidates, key=key)
+
+    def _begin(self, backend: OllamaBackend):
+        with self._lock:
+            backend.inflight += 1
+            backend.total_requests += 1
+
+    def _end(self, backend: OllamaBackend, ok: bool):
+        with self._lock:
+            backend.inflight -= 1
+        if ok:
+            self.mark_success(backend)
+        else:
+            self.mark_failure(backend)
+
+    def mark_success(self, backend: OllamaBackend):
+        """记录一次成功（清零连续失败次数）"""
+        with self._lock:
+            backend.failures = 0
+
+    def mark_failure(self, backend: OllamaBackend):
+        """记录一次失败，连续失败达到上限时剔除后端"""
+        with self._lock:
+            backend.failures += 1
+            backend.total_failures += 1
+            if backend.failures >= self.max_failures and not backend.is_ejected(time.monotonic()):
+                backend.ejected_until = time.monotonic() + self.eject_time
+                backend.total_ejections += 1
+                print(f"Ollama后端连续失败，暂时剔除: {backend.url}")
+
+    @contextmanager
+    def request(self, method: str, path: str, model: Optional[str] = None, **kwargs) -> Iterator[requests.Response]:
+        """向选中的后端发送请求，在with块内读取响应
+
+        建立连接失败时换下一个后端重试；with块结束前该请求计入后端的进行中请求数，
+        5xx响应和块内抛出的网络异常也计为后端失败。
+
+        Args:
+            method: HTTP方法
+            path: API路径（如 /api/chat）
+            model: 请求的模型（用于路由）
+            **kwargs: 透传给HTTP客户端的参数（json、stream、timeout等）
+
+        Raises:
+            requests.ConnectionError: 所有后端都无法连接（消息中包含最后一次连接错误）
+        """
+        tried = []
+        last_error = None
+        while True:
+            backend = self.choose(model, exclude=tried)
+            if backend is None:
+                if last_error is not None:
+                    # 保留最后一次连接错误（含主机和端口），便于排查
+                    raise requests.ConnectionError(f"没有可用的Ollama后端: {last_error}") from last_error
+                raise requests.ConnectionError("没有可用的Ollama后端")
+            self._begin(backend)
+            try:
+                response = self.http.request(method, backend.url + path, **kwargs)
+            except requests.ConnectionError as e:
+                # 请求尚未送达，可以安全地换下一个后端
+                self._end(backend, False)
+                tried.append(backend)
+                last_error = e
+                continue
+            except requests.RequestException:
+                self._end(backend, False)
+                raise
+            break
+
+        # 5xx说明后端自身异常，同样计为失败（请求已送达，不再重试）
+        ok = response.status_code < 500
+        try:
+            yield response
+        except requests.RequestException:
+            ok = False
+            raise
+        finally:
+            response.close()
+            self._end(backend, ok)
+
+    def list_model_entries(self) -> Optional[List[dict]]:
+        """获取所有可用后端的模型并合并（同时刷新各后端已安装的模型）
+
+        Returns:
+            合并后的 /api/tags 模型列表（按后端顺序按模型名去重），所有后端都不可用时返回None
+        """
+        merged = []
+        seen = set()
+        responded = False
+        for backend in self.available():
+            entries = self._fetch_tags(backend, timeout=5)
+            if entries is None:
+                continue
+            responded = True
+            for entry in entries:
+                if entry["name"] not in seen:
+                    seen.add(entry["name"])
+                    merged.append(entry)
+        return merged if responded else None
+
+    def list_models(self) -> List[str]:
+        """获取所有可用后端合并后的模型名列表，所有后端都不可用时返回空列表"""
+        return [entry["name"] for entry in self.list_model_entries() or []]
+
+    def _fetch_tags(self, backend: OllamaBackend, timeout: float) -> Optional[List[dict]]:
+        """获取后端已安装的模型，失败时记录一次后端失败并返回None"""
+        try:
+            started = time.monotonic()
+            response = self.http.get(f"{backend.url}/api/tags", timeout=timeout)
+            if response.status_code != 200:
+                raise requests.RequestException(f"HTTP {response.status_code}")
+            entries = response.json().get("models", [])
+            names = [entry["name"] for entry in entries]
+        except (requests.RequestException, ValueError, KeyError):
+            self.mark_failure(backend)
+            return None
+
+        elapsed = time.monotonic() - started
+        with self._lock:
+            backend.models = {normalize_model_name(name) for name in names}
+            backend.latency = elapsed if backend.latency is None else backend.latency * 0.7 + elapsed * 0.3
+            backend.last_checked = time.time()
+            # 健康检查通过的后端立即恢复
+            backend.failures = 0
+            backend.ejected_until = 0.0
+        return entries
+
+    def _fetch_loaded(self, backend: OllamaBackend, timeout: float):
+        """刷新后端已加载到内存的模型（用于亲和路由）"""
+        try:
+            response = self.http.get(f"{backend.url}/api/ps", timeout=timeout)
+            if response.status_code == 200:
+                loaded = {normalize_model_name(model["name"]) for model in response.json().get("models", [])}
+                with self._lock:
+                    backend.loaded = loaded
+        except (requests.RequestException, ValueError, KeyError):
+            pass
+
+    def check_health(self):
+        """检查所有后端（包括被剔除的后端），恢复已可用的后端"""
+        with self._lock:
+            backends = list(self._backends)
+        for backend in backends:
+            if self._fetch_tags(backend, timeout=3) is not None:
+                self._fetch_loaded(backend, timeout=3)
+
+    def start(self):
+        """启动后台健康检查线程"""
+        if self.running:
+            return
+        self.running = True
+        self.health_thread = threading.Thread(target=self._health_loop, daemon=True)
+        self.health_thread.start()
+
+    def stop(self):
+        """停止后台健康检查线程"""
+        self.running = False
+        self._wakeup.set()
+
+    def _health_loop(self):
+        """定期健康检查"""
+        while self.running:
+            self.check_health()
+            self._wakeup.wait(self.health_interval)
+            self._wakeup.clear()
+
+    def get_stats(self) -> dict:
+        """获取后端统计
+
+        Returns:
+            统计信息字典
+        """
+        now = time.monotonic()
+        with self._lock:
+            return {
+                'strategy': self.strategy,
+                'backends': [
+                    {
+                        'url': backend.url,
+                        'healthy': not backend.is_ejected(now),
+                        'inflight': backend.inflight,
+                        'models': len(backend.models),
+                        'loaded': sorted(backend.loaded),
+                        'latency_ms': round(backend.latency * 1000, 1) if backend.latency is not None else None,
+                        'total_requests': backend.total_requests,
+                        'total_failures': backend.total_failures,
+                        'total_ejections': backend.total_ejections
+                    }
+                    for backend in self._backends
+                ]
+            }
@@ -0,0 +1,152 @@
+import re
+from typing import Dict, Iterable, List, Optional
+
+# 中日韩字符及全角符号，近似按每个字符1个token计算
+_CJK_RE = re.compile(r'[\u3000-\u303f\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uff00-\uffef]')
+
+# 每条消息的角色、分隔符等固定开销
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# 缓存在消息字典中的token数字段，发送给Ollama前会去掉
+TOKENS_FIELD = "_tokens"
+
+
+def estimate_tokens(text: str) -> int:
+    """快速估算文本的token数
+
+    中日韩字符按每字1个token，其余字符按每4个字符1个token，
+    对常见的BPE分词器是偏保守的近似。
+
+    Args:
+        text: 文本
+
+    Returns:
+        估算的token数
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def truncate_to_tokens(text: str, max_tokens: int, suffix: str = "...（消息过长，已截断）") -> str:
+    """把文本截断到大约max_tokens个token以内"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    # 二分查找满足预算的最长前缀
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if estimate_tokens(text[:mid]) <= max_tokens:
+            low = mid
+        else:
+            high = mid - 1
+    return text[:low] + suffix
+
+
+def parse_model_budgets(value: str) -> Dict[str, int]:
+    """解析按模型配置的token预算，格式如：qwen2.5:7b=8192, llama3=6144"""
+    budgets = {}
+    for item in (value or "").split(","):
+        name, sep, budget = item.strip().rpartition("=")
+        if not sep or not name.strip():
+            continue
+        try:
+            budgets[name.strip()] = int(budget)
+        except ValueError:
+            print(f"模型上下文预算配置无效，已忽略: {item.strip()}")
+    return budgets
+
+
+def format_model_budgets(budgets: Dict[str, int]) -> str:
+    """把按模型的token预算格式化为配置字符串"""
+    return ", ".join(f"{name}={budget}" for name, budget in budgets.items())
+
+
+class ContextBuilder:
+    """按token预算构建对话上下文
+
+    从最新的对话往前装入历史，直到用完该模型的token预算；每条消息的token数
+    只计算一次并缓存在消息字典中，长对话时不会反复计算。
+    """
+
+    def __init__(self, default_budget: int = 3072, model_budgets: Optional[Dict[str, int]] = None):
+        """
+        初始化上下文构建器
+
+        Args:
+            default_budget: 默认的提示词token预算
+            model_budgets: 按模型名覆盖的token预算
+        """
+        self.default_budget = default_budget
+        self.model_budgets = dict(model_budgets or {})
+
+    def configure(self, default_budget: int, model_budgets: Optional[Dict[str, int]] = None):
+        """更新预算配置"""
+        self.default_budget = default_budget
+        self.model_budgets = dict(model_budgets or {})
+
+    def budget_for(self, model: Optional[str]) -> int:
+        """获取模型的token预算（先精确匹配，再匹配不带标签的模型名）"""
+        if model:
+            if model in self.model_budgets:
+                return self.model_budgets[model]
+            base_name = model.split(":", 1)[0]
+            if base_name in self.model_budgets:
+                return self.model_budgets[base_name]
+        return self.default_budget
+
+    @staticmethod
+    def message_tokens(message: dict) -> int:
+        """获取消息的token数（首次计算后缓存在消息中）"""
+        tokens = message.get(TOKENS_FIELD)
+        if tokens is None:
+            tokens = estimate_tokens(message.get("content", "")) + MESSAGE_OVERHEAD_TOKENS
+            message[TOKENS_FIELD] = tokens
+        return tokens
+
+    def fit_message(self, message: dict, model: Optional[str]) -> dict:
+        """单条消息超出整个预算时截断其内容"""
+        budget = self.budget_for(model)
+        if self.message_tokens(message) <= budget:
+            return message
+        content = truncate_to_tokens(message.get("content", ""), budget - MESSAGE_OVERHEAD_TOKENS)
+        print("消息超出上下文预算，已截断")
+        return {"role": message.get("role", "user"), "content": content}
+
+    def build(self, history: Iterable[dict], user_message: dict, model: Optional[str],
+              prefix: Iterable[dict] = (), suffix: Iterable[dict] = ()) -> List[dict]:
+        """构建发送给Ollama的消息列表
+
+        Args:
+            history: 对话历史（按时间顺序）
+            user_message: 本轮用户消息
+            model: 模型名
+            prefix: 放在历史之前、必定保留的消息（如对话摘要）
+            suffix: 放在用户消息之后、必定保留的消息（如联网搜索结果）
+
+        Returns:
+            不含缓存字段的消息列表
+        """
+        prefix = list(prefix)
+        suffix = list(suffix)
+        remaining = self.budget_for(model) - self.message_tokens(user_message)
+        for message in prefix + suffix:
+            remaining -= self.message_tokens(message)
+
+        # 从最新的消息往前装入，直到预算用完
+        history = list(history)
+        start = len(history)
+        while start > 0:
+            tokens = self.message_tokens(history[start - 1])
+            if tokens > remaining:
+                break
+            remaining -= tokens
+            start -= 1
+        # 不以孤立的AI回复开头
+        while start < len(history) and history[start].get("role") == "assistant":
+            start += 1
+
+        messages = prefix + history[start:] + [user_message] + suffix
+        return [{key: value for key, value in message.items() if key != TOKENS_FIELD}
+                for message in messages]
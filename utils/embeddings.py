@@ -0,0 +1,132 @@
+import queue
+import threading
+from typing import Callable, Hashable, List, Optional
+
+import requests
+
+class EmbeddingWorker:
+    """后台批量计算文本向量（Ollama /api/embed）
+
+    写入方只把文本放入队列后立即返回；后台线程把积压的文本合并成一次请求（最多batch_size条），
+    结果通过回调交给调用方。队列已满或请求失败的文本会被丢弃并计入统计。
+    """
+
+    def __init__(self, http, base_url: str, model: str,
+                 on_result: Callable[[List[Hashable], List[List[float]]], None],
+                 batch_size: int = 32, max_queue: int = 10000, timeout: float = 60):
+        """
+        初始化向量计算线程
+
+        Args:
+            http: HTTP客户端（PooledHttpClient）
+            base_url: Ollama地址
+            model: 嵌入模型名称
+            on_result: 结果回调，参数为 (键列表, 向量列表)，在后台线程中调用
+            batch_size: 每次请求最多包含的文本数
+            max_queue: 队列中最多等待的文本数
+            timeout: 单次请求超时（秒）
+        """
+        self.http = http
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.on_result = on_result
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self._queue = queue.Queue(maxsize=max_queue)
+        self.worker_thread = None
+        self.running = False
+        # 统计
+        self.total_embedded = 0
+        self.total_batches = 0
+        self.total_failures = 0
+        self.total_dropped = 0
+
+    def embed(self, texts: List[str]) -> Optional[List[List[float]]]:
+        """同步计算向量（用于查询）
+
+        Args:
+            texts: 文本列表
+
+        Returns:
+            向量列表，失败时返回None
+        """
+        try:
+            response = self.http.post(
+                f"{self.base_url}/api/embed",
+                json={"model": self.model, "input": texts},
+                timeout=self.timeout
+            )
+            if response.status_code != 200:
+                raise requests.RequestException(f"HTTP {response.status_code}")
+            embeddings = response.json().get("embeddings") or []
+            if len(embeddings) != len(texts):
+                raise ValueError("返回的向量数量与文本数量不一致")
+            return embeddings
+        except (requests.RequestException, ValueError) as e:
+            self.total_failures += 1
+            print(f"计算向量失败: {str(e)}")
+            return None
+
+    def submit(self, key: Hashable, text: str):
+        """提交一条待计算的文本（不阻塞）
+
+        Args:
+            key: 调用方用于识别结果的键
+            text: 文本
+        """
+        try:
+            self._queue.put_nowait((key, text))
+        except queue.Full:
+            self.total_dropped += 1
+
+    def start(self):
+        """启动后台线程"""
+        if self.running:
+            return
+        self.running = True
+        self.worker_thread = threading.Thread(target=self._worker_loop, daemon=True)
+        self.worker_thread.start()
+
+    def stop(self):
+        """停止后台线程（未处理的文本保留在队列中，重新启动后继续处理）"""
+        self.running = False
+
+    def _worker_loop(self):
+        """合并积压的文本批量计算"""
+        while self.running:
+            try:
+                batch = [self._queue.get(timeout=0.5)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            keys = [key for key, _ in batch]
+            embeddings = self.embed([text for _, text in batch])
+            self.total_batches += 1
+            if embeddings is None:
+                self.total_dropped += len(batch)
+                continue
+            self.total_embedded += len(batch)
+            try:
+                self.on_result(keys, embeddings)
+            except Exception as e:
+                print(f"保存向量失败: {str(e)}")
+
+    def get_stats(self) -> dict:
+        """获取向量计算统计
+
+        Returns:
+            统计信息字典
+        """
+        return {
+            'model': self.model,
+            'pending': self._queue.qsize(),
+            'total_embedded': self.total_embedded,
+            'total_batches': self.total_batches,
+            'total_failures': self.total_failures,
+            'total_dropped': self.total_dropped
+        }
@@ -0,0 +1,121 @@
+import threading
+from typing import Optional, Union, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+class PooledHttpClient:
+    """共享的HTTP客户端，基于连接池和keep-alive复用TCP连接
+
+    所有线程共用同一个requests.Session，底层urllib3连接池是线程安全的，
+    避免每次调用都新建TCP连接（以及随之堆积的TIME_WAIT）。
+    """
+
+    def __init__(self, pool_size: int = 10, max_retries: int = 2,
+                 connect_timeout: float = 5, read_timeout: float = 60,
+                 backoff_factor: float = 0.3):
+        """
+        初始化HTTP客户端
+
+        Args:
+            pool_size: 每个主机的最大保持连接数
+            max_retries: 连接失败时的重试次数（已发出的请求不会因读超时重发）
+            connect_timeout: 建立连接的超时时间（秒）
+            read_timeout: 默认读取超时时间（秒）
+            backoff_factor: 重试退避系数
+        """
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.backoff_factor = backoff_factor
+        self.session_lock = threading.Lock()
+        self.session = self._create_session()
+
+    def _create_session(self) -> requests.Session:
+        """创建带连接池和重试策略的Session"""
+        retry = Retry(
+            total=self.max_retries,
+            connect=self.max_retries,
+            read=0,
+            status=self.max_retries,
+            status_forcelist=(502, 503, 504),
+            backoff_factor=self.backoff_factor,
+            # 只有幂等请求才会因状态码重试，POST生成请求不会被重复执行
+            allowed_methods=frozenset(['GET', 'HEAD', 'OPTIONS', 'DELETE']),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_size,
+            pool_maxsize=self.pool_size,
+            max_retries=retry
+        )
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers.update({'Connection': 'keep-alive'})
+        return session
+
+    def configure(self, pool_size: Optional[int] = None, max_retries: Optional[int] = None,
+                  connect_timeout: Optional[float] = None, read_timeout: Optional[float] = None):
+        """更新连接池配置，并用新配置替换Session
+
+        Args:
+            pool_size: 每个主机的最大保持连接数
+            max_retries: 连接失败时的重试次数
+            connect_timeout: 建立连接的超时时间（秒）
+            read_timeout: 默认读取超时时间（秒）
+        """
+        if pool_size is not None:
+            self.pool_size = pool_size
+        if max_retries is not None:
+            self.max_retries = max_retries
+        if connect_timeout is not None:
+            self.connect_timeout = connect_timeout
+        if read_timeout is not None:
+            self.read_timeout = read_timeout
+
+        with self.session_lock:
+            old_session = self.session
+            self.session = self._create_session()
+        old_session.close()
+
+    def _timeout(self, timeout: Union[None, float, Tuple[float, float]]):
+        """将单个超时值转换为 (连接超时, 读取超时)"""
+        if timeout is None:
+            return (self.connect_timeout, self.read_timeout)
+        if isinstance(timeout, tuple):
+            return timeout
+        return (min(self.connect_timeout, timeout), timeout)
+
+    def request(self, method: str, url: str, timeout=None, **kwargs) -> requests.Response:
+        """发送HTTP请求
+
+        Args:
+            method: HTTP方法
+            url: 完整URL
+            timeout: 读取超时（秒）或 (连接超时, 读取超时)，默认使用客户端配置
+            **kwargs: 透传给requests的其他参数（json、stream等）
+
+        Returns:
+            requests.Response
+        """
+        return self.session.request(method, url, timeout=self._timeout(timeout), **kwargs)
+
+    def get(self, url: str, timeout=None, **kwargs) -> requests.Response:
+        """发送GET请求"""
+        return self.request('GET', url, timeout=timeout, **kwargs)
+
+    def post(self, url: str, timeout=None, **kwargs) -> requests.Response:
+        """发送POST请求"""
+        return self.request('POST', url, timeout=timeout, **kwargs)
+
+    def delete(self, url: str, timeout=None, **kwargs) -> requests.Response:
+        """发送DELETE请求"""
+        return self.request('DELETE', url, timeout=timeout, **kwargs)
+
+    def close(self):
+        """关闭所有连接"""
+        with self.session_lock:
+            self.session.close()
@@ -0,0 +1,217 @@
+import sys
+import time
+from array import array
+from typing import Iterator, List, Optional, Tuple
+
+# 由记忆服务器维护、不作为其余字段保存的字段
+_RESERVED_FIELDS = ('content', 'timestamp', 'created_at')
+
+# 相同的其余字段（如 {"role": "user"}）只保留一份
+_extras_cache = {}
+_EXTRAS_CACHE_SIZE = 4096
+
+
+def compact_extra(memory: dict):
+    """提取记忆中除内容和时间以外的字段
+
+    Returns:
+        None（没有其余字段）、共享的 (键, 值) 元组（字段可哈希时），或字典
+    """
+    extra = tuple((key, value) for key, value in memory.items() if key not in _RESERVED_FIELDS)
+    if not extra:
+        return None
+    try:
+        shared = _extras_cache.get(extra)
+    except TypeError:
+        # 字段值不可哈希（如嵌套字典），单独保存
+        return dict(extra)
+    if shared is None:
+        if len(_extras_cache) >= _EXTRAS_CACHE_SIZE:
+            return extra
+        shared = _extras_cache[extra] = extra
+    return shared
+
+
+class UserMemories:
+    """单个用户的记忆，按列存放的环形缓冲区
+
+    记忆ID和时间戳放在紧凑数组中，内容和其余字段各一个列表（其余字段多数为共享元组或None），
+    不为每条记忆创建字典或对象；created_at在返回给客户端时才由时间戳格式化。
+    存储按需增长到容量上限，达到上限后新记忆覆盖最旧的记忆（不移动其余元素）。
+    记忆ID按写入顺序递增，按ID查找使用二分查找。
+    """
+
+    __slots__ = ('capacity', 'ids', 'timestamps', 'contents', 'extras', '_head', '_size', '_content_bytes')
+
+    def __init__(self, capacity: int = 1000):
+        """
+        初始化空的记忆缓冲区
+
+        Args:
+            capacity: 最多保留的记忆数量
+        """
+        self.capacity = capacity
+        self.ids = array('q')
+        self.timestamps = array('d')
+        self.contents = []
+        self.extras = []
+        # 最旧记忆所在的槽位和当前记忆数量
+        self._head = 0
+        self._size = 0
+        # 内容和独立保存的其余字段占用的内存（用于估算）
+        self._content_bytes = 0
+
+    def __len__(self):
+        return self._size
+
+    @staticmethod
+    def _value_bytes(content, extra) -> int:
+        size = sys.getsizeof(content) if content is not None else 0
+        if isinstance(extra, dict):
+            size += sys.getsizeof(extra)
+        return size
+
+    def _slot(self, position: int) -> int:
+        """逻辑位置（0为最旧）对应的槽位"""
+        return (self._head + position) % len(self.ids)
+
+    def _grow(self):
+        """槽位已满但未达到容量上限时扩容（先把环展开为从槽位0开始）"""
+        if self._head:
+            for column in (self.ids, self.timestamps, self.contents, self.extras):
+                column[:] = column[self._head:] + column[:self._head]
+            self._head = 0
+
+    def append(self, memory_id: int, timestamp: float, memory: dict) -> Optional[int]:
+        """追加一条记忆（记忆ID必须大于已有的ID）
+
+        Args:
+            memory_id: 记忆ID
+            timestamp: 写入时间戳
+            memory: 客户端提交（或数据库中保存）的记忆字典
+
+        Returns:
+            达到容量上限时被覆盖的最旧记忆ID，否则为None
+        """
+        content = memory.get('content')
+        extra = compact_extra(memory)
+        self._content_bytes += self._value_bytes(content, extra)
+
+        slots = len(self.ids)
+        if self._size < slots:
+            # 有空闲槽位（之前有记忆过期）
+            slot = self._slot(self._size)
+            evicted = None
+        elif slots < self.capacity:
+            self._grow()
+            self.ids.append(memory_id)
+            self.timestamps.append(timestamp)
+            self.contents.append(content)
+            self.extras.append(extra)
+            self._size += 1
+            return None
+        else:
+            # 已满，覆盖最旧的记忆
+            slot = self._head
+            evicted = self.ids[slot]
+            self._content_bytes -= self._value_bytes(self.contents[slot], self.extras[slot])
+            self._head = (self._head + 1) % slots
+            self._size -= 1
+
+        self.ids[slot] = memory_id
+        self.timestamps[slot] = timestamp
+        self.contents[slot] = content
+        self.extras[slot] = extra
+        self._size += 1
+        return evicted
+
+    def oldest_timestamp(self) -> Optional[float]:
+        """最旧记忆的时间戳，没有记忆时返回None"""
+        return self.timestamps[self._head] if self._size else None
+
+    def pop_oldest(self) -> int:
+        """移除最旧的一条记忆
+
+        Returns:
+            被移除的记忆ID
+        """
+        slot = self._head
+        memory_id = self.ids[slot]
+        self._content_bytes -= self._value_bytes(self.contents[slot], self.extras[slot])
+        self.contents[slot] = None
+        self.extras[slot] = None
+        self._size -= 1
+        if self._size:
+            self._head = (slot + 1) % len(self.ids)
+        else:
+            # 全部移除后释放槽位
+            self.ids = array('q')
+            self.timestamps = array('d')
+            self.contents = []
+            self.extras = []
+            self._head = 0
+        return memory_id
+
+    def position(self, memory_id: int) -> Optional[int]:
+        """按记忆ID查找逻辑位置，不存在时返回None"""
+        low, high = 0, self._size
+        while low < high:
+            middle = (low + high) // 2
+            if self.ids[self._slot(middle)] < memory_id:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self._size and self.ids[self._slot(low)] == memory_id:
+            return low
+        return None
+
+    def __contains__(self, memory_id: int):
+        return self.position(memory_id) is not None
+
+    def text(self, position: int) -> str:
+        """用于索引的文本"""
+        content = self.contents[self._slot(position)]
+        return str(content) if content is not None else ''
+
+    def data(self, position: int) -> dict:
+        """持久化的字段（不含时间戳和创建时间）"""
+        slot = self._slot(position)
+        content = self.contents[slot]
+        data = {'content': content} if content is not None else {}
+        extra = self.extras[slot]
+        if extra:
+            data.update(extra)
+        return data
+
+    def to_dict(self, position: int) -> dict:
+        """返回给客户端的记忆字典（与旧版格式相同）"""
+        memory = self.data(position)
+        timestamp = self.timestamps[self._slot(position)]
+        memory['timestamp'] = timestamp
+        memory['created_at'] = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp))
+        return memory
+
+    def get(self, memory_ids: List[int]) -> List[dict]:
+        """按记忆ID读取记忆（忽略已不存在的ID）"""
+        memories = []
+        for memory_id in memory_ids:
+            position = self.position(memory_id)
+            if position is not None:
+                memories.append(self.to_dict(position))
+        return memories
+
+    def newest(self, limit: int) -> List[dict]:
+        """最新的记忆（从新到旧）"""
+        count = self._size
+        return [self.to_dict(position) for position in range(count - 1, max(count - limit, 0) - 1, -1)]
+
+    def texts(self) -> Iterator[Tuple[int, float, str]]:
+        """遍历 (记忆ID, 时间戳, 文本)"""
+        for position in range(self._size):
+            slot = self._slot(position)
+            yield self.ids[slot], self.timestamps[slot], self.text(position)
+
+    def nbytes(self) -> int:
+        """估算占用的内存（各列本身、内容和独立保存的其余字段，不含共享的其余字段）"""
+        return (sys.getsizeof(self) + sys.getsizeof(self.ids) + sys.getsizeof(self.timestamps)
+                + sys.getsizeof(self.contents) + sys.getsizeof(self.extras) + self._content_bytes)
@@ -0,0 +1,160 @@
+import heapq
+import math
+import re
+import time
+from typing import Dict, List, Optional
+
+# 英文单词/数字，以及连续的中文
+_TOKEN_PATTERN = re.compile(r'[a-z0-9_]+|[\u4e00-\u9fa5]+')
+
+# jieba分词器（首次分词时才导入，未安装时为False，改用中文二元切分）
+_jieba = None
+
+
+def _get_jieba():
+    global _jieba
+    if _jieba is None:
+        try:
+            import jieba
+            _jieba = jieba
+        except ImportError:
+            _jieba = False
+    return _jieba
+
+
+def tokenize(text: str) -> List[str]:
+    """分词：英文按单词，中文用jieba搜索引擎模式（未安装jieba时按二元切分）
+
+    Args:
+        text: 文本
+
+    Returns:
+        词列表（小写，可能重复）
+    """
+    tokens = []
+    for match in _TOKEN_PATTERN.findall(text.lower()):
+        if match[0] < '\u4e00':
+            tokens.append(match)
+            continue
+        jieba = _get_jieba()
+        if jieba:
+            tokens.extend(word for word in jieba.cut_for_search(match) if word.strip())
+        elif len(match) == 1:
+            tokens.append(match)
+        else:
+            tokens.extend(match[i:i + 2] for i in range(len(match) - 1))
+    return tokens
+
+
+class MemoryIndex:
+    """单个用户记忆的倒排索引，按BM25加时间衰减排序
+
+    写入时增量更新倒排表；检索只遍历查询词的倒排表，用堆取前k个，不扫描、不排序全部记忆。
+    """
+
+    __slots__ = ('k1', 'b', 'recency_weight', 'half_life', '_postings', '_docs', '_total_length')
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, recency_weight: float = 0.5,
+                 half_life: float = 7 * 86400):
+        """
+        初始化倒排索引
+
+        Args:
+            k1: BM25词频饱和参数
+            b: BM25文档长度归一化参数
+            recency_weight: 时间衰减分数的权重（加到BM25分数上）
+            half_life: 时间衰减的半衰期（秒）
+        """
+        self.k1 = k1
+        self.b = b
+        self.recency_weight = recency_weight
+        self.half_life = half_life
+        # 词 -> {记忆ID: 词频}
+        self._postings: Dict[str, Dict[int, int]] = {}
+        # 记忆ID -> (词数, 时间戳, 包含的词)
+        self._docs: Dict[int, tuple] = {}
+        self._total_length = 0
+
+    def __len__(self):
+        return len(self._docs)
+
+    def add(self, doc_id: int, text: str, timestamp: float):
+        """索引一条记忆
+
+        Args:
+            doc_id: 记忆ID
+            text: 记忆内容
+            timestamp: 记忆时间戳
+        """
+        if doc_id in self._docs:
+            self.remove(doc_id)
+        tokens = tokenize(text)
+        for token in tokens:
+            posting = self._postings.get(token)
+            if posting is None:
+                posting = self._postings[token] = {}
+            posting[doc_id] = posting.get(doc_id, 0) + 1
+        self._docs[doc_id] = (len(tokens), timestamp, tuple(set(tokens)))
+        self._total_length += len(tokens)
+
+    def remove(self, doc_id: int):
+        """从索引中移除一条记忆"""
+        doc = self._docs.pop(doc_id, None)
+        if doc is None:
+            return
+        length, _, terms = doc
+        self._total_length -= length
+        for term in terms:
+            posting = self._postings.get(term)
+            if posting is not None:
+                posting.pop(doc_id, None)
+                if not posting:
+                    del self._postings[term]
+
+    def search(self, query: str, limit: int, now: Optional[float] = None) -> List[int]:
+        """按BM25加时间衰减检索
+
+        Args:
+            query: 查询文本
+            limit: 返回数量
+            now: 当前时间（用于计算时间衰减）
+
+        Returns:
+            按分数从高到低排列的记忆ID（只包含至少命中一个查询词的记忆）
+        """
+        terms = set(tokenize(query))
+        if not terms or not self._docs:
+            return []
+
+        now = time.time() if now is None else now
+        total_docs = len(self._docs)
+        avg_length = self._total_length / total_docs or 1
+        scores: Dict[int, float] = {}
+        for term in terms:
+            posting = self._postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1 + (total_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+            for doc_id, tf in posting.items():
+                length = self._docs[doc_id][0]
+                norm = self.k1 * (1 - self.b + self.b * length / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        if self.recency_weight:
+            for doc_id in scores:
+                age = max(0.0, now - self._docs[doc_id][1])
+                scores[doc_id] += self.recency_weight * 0.5 ** (age / self.half_life)
+
+        return [doc_id for doc_id, _ in heapq.nlargest(limit, scores.items(), key=lambda item: item[1])]
+
+    def get_stats(self) -> dict:
+        """获取索引统计
+
+        Returns:
+            统计信息字典
+        """
+        return {
+            'documents': len(self._docs),
+            'terms': len(self._postings),
+            'postings': sum(len(posting) for posting in self._postings.values())
+        }
@@ -0,0 +1,258 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+
+class SqliteMemoryStore:
+    """记忆持久化存储：SQLite（WAL模式），每条记忆一行
+
+    写入一条记忆只追加一行并立即提交（WAL模式下是顺序追加日志，不重写已有数据），
+    进程崩溃不会丢失已确认的写入；启动时不加载数据，由调用方按用户按需读取。
+    内存中不保存按用户的状态；超出每用户上限的旧记忆由 compact() 批量裁剪（读取时只取最新的记录），
+    compact() 同时负责合并WAL和回收空间。
+    """
+
+    def __init__(self, path: str, max_per_user: int = 1000):
+        """
+        初始化记忆存储
+
+        Args:
+            path: 数据库文件路径
+            max_per_user: 每个用户保留的记忆数量
+        """
+        self.path = path
+        self.max_per_user = max_per_user
+        self._lock = threading.Lock()
+        self._conn = None
+        self.open()
+        # 统计
+        self.total_writes = 0
+        self.total_trimmed = 0
+        self.total_expired = 0
+        self.total_compactions = 0
+
+    def open(self):
+        """打开数据库并建表（已打开时直接返回）"""
+        with self._lock:
+            if self._conn is not None:
+                return
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # WAL模式下NORMAL只在检查点时同步磁盘，进程崩溃不丢数据，只有断电可能丢失最后几次提交
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS memories ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "user_id TEXT NOT NULL, "
+                "timestamp REAL NOT NULL, "
+                "data TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_memories_user ON memories (user_id, id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_memories_timestamp ON memories (timestamp)")
+            # 记忆的向量（float32字节串），与memories同ID
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "id INTEGER PRIMARY KEY, "
+                "model TEXT NOT NULL, "
+                "vector BLOB NOT NULL)"
+            )
+            conn.commit()
+            self._conn = conn
+
+    def migrate_json(self, json_path: str) -> int:
+        """导入旧版 memory_store.json（只在数据库为空时导入，导入后重命名原文件）
+
+        Args:
+            json_path: 旧版JSON文件路径
+
+        Returns:
+            导入的记忆条数
+        """
+        if not os.path.exists(json_path):
+            return 0
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM memories LIMIT 1").fetchone():
+                return 0
+        with open(json_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if not data:
+            return 0
+
+        rows = []
+        for user_id, memories in data.items():
+            for memory in memories[-self.max_per_user:]:
+                rows.append((user_id, memory.get('timestamp', 0), json.dumps(memory, ensure_ascii=False)))
+        with self._lock:
+            with self._conn:
+                self._conn.executemany("INSERT INTO memories (user_id, timestamp, data) VALUES (?, ?, ?)", rows)
+        os.replace(json_path, f"{json_path}.migrated")
+        return len(rows)
+
+    def append(self, user_id: str, timestamp: float, data: dict) -> int:
+        """追加一条记忆并提交
+
+        Args:
+            user_id: 用户ID
+            timestamp: 写入时间戳
+            data: 记忆数据字典（不含时间戳）
+
+        Returns:
+            记忆ID（按写入顺序递增）
+        """
+        data = json.dumps(data, ensure_ascii=False)
+        with self._lock:
+            with self._conn:
+                cursor = self._conn.execute(
+                    "INSERT INTO memories (user_id, timestamp, data) VALUES (?, ?, ?)",
+                    (user_id, timestamp, data)
+                )
+            self.total_writes += 1
+            return cursor.lastrowid
+
+    def _trim_user(self, user_id: str):
+        """删除用户超出上限的旧记忆（调用方需持有锁）"""
+        with self._conn:
+            params = (user_id, user_id, self.max_per_user)
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE id IN (SELECT id FROM memories WHERE user_id = ? AND id <= ("
+                "SELECT id FROM memories WHERE user_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?))",
+                params
+            )
+            cursor = self._conn.execute(
+                "DELETE FROM memories WHERE user_id = ? AND id <= ("
+                "SELECT id FROM memories WHERE user_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                params
+            )
+        self.total_trimmed += cursor.rowcount
+
+    def load_user(self, user_id: str, min_timestamp: Optional[float] = None) -> List[Tuple[int, float, dict]]:
+        """读取用户最新的记忆（按写入顺序从旧到新）
+
+        Args:
+            user_id: 用户ID
+            min_timestamp: 只读取该时间之后写入的记忆（跳过已过期但尚未删除的记忆）
+
+        Returns:
+            (记忆ID, 时间戳, 记忆数据字典) 列表
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, timestamp, data FROM ("
+                "SELECT id, timestamp, data FROM memories WHERE user_id = ? AND timestamp >= ? ORDER BY id DESC LIMIT ?) "
+                "ORDER BY id",
+                (user_id, min_timestamp or 0, self.max_per_user)
+            ).fetchall()
+        return [(memory_id, timestamp, json.loads(data)) for memory_id, timestamp, data in rows]
+
+    def delete_user(self, user_id: str):
+        """删除用户的所有记忆"""
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE id IN (SELECT id FROM memories WHERE user_id = ?)", (user_id,)
+                )
+                self._conn.execute("DELETE FROM memories WHERE user_id = ?", (user_id,))
+
+    def expire(self, before: float) -> int:
+        """删除指定时间之前写入的记忆
+
+        Args:
+            before: 时间戳
+
+        Returns:
+            删除的记忆条数
+        """
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE id IN (SELECT id FROM memories WHERE timestamp < ?)", (before,)
+                )
+                cursor = self._conn.execute("DELETE FROM memories WHERE timestamp < ?", (before,))
+            self.total_expired += cursor.rowcount
+            return cursor.rowcount
+
+    def save_embeddings(self, rows: List[Tuple[int, str, bytes]]):
+        """保存记忆的向量
+
+        Args:
+            rows: (记忆ID, 嵌入模型, float32向量字节串) 列表
+        """
+        with self._lock:
+            with self._conn:
+                # 只保存仍然存在的记忆的向量（计算期间记忆可能已被删除）
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (id, model, vector) "
+                    "SELECT ?, ?, ? WHERE EXISTS (SELECT 1 FROM memories WHERE id = ?)",
+                    [(memory_id, model, vector, memory_id) for memory_id, model, vector in rows]
+                )
+
+    def load_embeddings(self, user_id: str, model: str) -> Dict[int, bytes]:
+        """读取用户记忆用指定模型计算的向量
+
+        Args:
+            user_id: 用户ID
+            model: 嵌入模型
+
+        Returns:
+            {记忆ID: float32向量字节串}
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT e.id, e.vector FROM embeddings e JOIN memories m ON m.id = e.id "
+                "WHERE m.user_id = ? AND e.model = ?",
+                (user_id, model)
+            ).fetchall()
+        return dict(rows)
+
+    def user_counts(self) -> Dict[str, int]:
+        """各用户的记忆数量（只扫描索引，不读取记忆内容）"""
+        with self._lock:
+            rows = self._conn.execute("SELECT user_id, COUNT(*) FROM memories GROUP BY user_id").fetchall()
+        return {user_id: min(count, self.max_per_user) for user_id, count in rows}
+
+    def compact(self):
+        """压缩存储：裁剪所有用户超出上限的旧记忆，合并WAL，空闲页过多时回收空间"""
+        with self._lock:
+            over_limit = self._conn.execute(
+                "SELECT user_id FROM memories GROUP BY user_id HAVING COUNT(*) > ?", (self.max_per_user,)
+            ).fetchall()
+            for user_id, in over_limit:
+                self._trim_user(user_id)
+            with self._conn:
+                self._conn.execute("DELETE FROM embeddings WHERE id NOT IN (SELECT id FROM memories)")
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            page_count = self._conn.execute("PRAGMA page_count").fetchone()[0]
+            freelist_count = self._conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if page_count and freelist_count > page_count // 4:
+                self._conn.execute("VACUUM")
+                self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self.total_compactions += 1
+
+    def close(self):
+        """合并WAL并关闭数据库（可再次调用open()重新打开）"""
+        with self._lock:
+            if self._conn is None:
+                return
+            try:
+                self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            finally:
+                self._conn.close()
+                self._conn = None
+
+    def get_stats(self) -> dict:
+        """获取存储统计
+
+        Returns:
+            统计信息字典
+        """
+        wal_path = f"{self.path}-wal"
+        return {
+            'path': self.path,
+            'db_bytes': os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+            'wal_bytes': os.path.getsize(wal_path) if os.path.exists(wal_path) else 0,
+            'total_writes': self.total_writes,
+            'total_trimmed': self.total_trimmed,
+            'total_expired': self.total_expired,
+            'total_compactions': self.total_compactions
+        }
@@ -0,0 +1,149 @@
+import hashlib
+import json
+import threading
+import time
+from typing import Callable, List, Optional
+
+class ModelCatalog:
+    """模型目录：缓存Ollama模型列表，过期后在后台刷新（stale-while-revalidate）
+
+    读取时总是立即返回缓存的列表，过期时只触发一次后台刷新，不阻塞调用方；
+    刷新结果按模型名和digest计算指纹，只有指纹变化时才通知订阅者（如GUI下拉框）。
+    """
+
+    def __init__(self, fetch_fn: Callable[[], Optional[List[dict]]], ttl: float = 60,
+                 retry_interval: float = 5, fallback: Optional[List[str]] = None):
+        """
+        初始化模型目录
+
+        Args:
+            fetch_fn: 获取模型列表的函数，返回 /api/tags 格式的模型列表（name、digest），失败时返回None
+            ttl: 缓存有效期（秒）
+            retry_interval: 获取失败后的重试间隔（秒）
+            fallback: 尚未获取到模型列表时使用的默认列表
+        """
+        self.fetch_fn = fetch_fn
+        self.ttl = ttl
+        self.retry_interval = retry_interval
+        self.fallback = list(fallback or [])
+        self._models: Optional[List[str]] = None
+        self.version: Optional[str] = None
+        self._fetched_at = 0.0
+        self._next_refresh = 0.0
+        self._refreshing = False
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[List[str]], None]] = []
+        # 统计
+        self.total_refreshes = 0
+        self.total_changes = 0
+        self.total_failures = 0
+
+    @staticmethod
+    def fingerprint(entries: List[dict]) -> str:
+        """根据模型名和digest计算目录指纹（与顺序无关）"""
+        items = sorted((entry.get("name", ""), entry.get("digest", "")) for entry in entries)
+        return hashlib.sha256(json.dumps(items).encode("utf-8")).hexdigest()[:16]
+
+    @property
+    def models(self) -> List[str]:
+        """当前缓存的模型列表（不触发刷新）"""
+        models = self._models
+        return list(models) if models is not None else list(self.fallback)
+
+    def get(self, wait: bool = False) -> List[str]:
+        """获取模型列表，过期时在后台刷新
+
+        Args:
+            wait: 从未获取成功时是否同步等待一次获取（已有缓存时总是立即返回）
+
+        Returns:
+            模型名列表
+        """
+        with self._lock:
+            models = self._models
+            due = time.monotonic() >= self._next_refresh
+        if models is None and wait:
+            return self.refresh_now() or list(self.fallback)
+        if due:
+            self.refresh()
+        return list(models) if models is not None else list(self.fallback)
+
+    def subscribe(self, listener: Callable[[List[str]], None]):
+        """订阅模型列表变化（在刷新线程中回调，GUI需自行切换到主线程）"""
+        self._listeners.append(listener)
+
+    def invalidate(self):
+        """使缓存过期并立即在后台刷新（如拉取、删除模型或修改地址后）"""
+        with self._lock:
+            self._next_refresh = 0.0
+        self.refresh()
+
+    def refresh(self):
+        """在后台线程中刷新（已有刷新进行中时忽略）"""
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh_worker, daemon=True).start()
+
+    def _refresh_worker(self):
+        try:
+            self.refresh_now()
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def refresh_now(self) -> Optional[List[str]]:
+        """同步刷新模型列表
+
+        Returns:
+            最新的模型名列表，获取失败时返回None（保留原有缓存）
+        """
+        try:
+            entries = self.fetch_fn()
+        except Exception as e:
+            print(f"获取模型列表失败: {str(e)}")
+            entries = None
+
+        now = time.monotonic()
+        if entries is None:
+            with self._lock:
+                self.total_failures += 1
+                self._next_refresh = now + min(self.ttl, self.retry_interval)
+            return None
+
+        models = [entry["name"] for entry in entries if entry.get("name")]
+        version = self.fingerprint(entries)
+        with self._lock:
+            changed = version != self.version
+            self._models = models
+            self.version = version
+            self._fetched_at = now
+            self._next_refresh = now + self.ttl
+            self.total_refreshes += 1
+            if changed:
+                self.total_changes += 1
+
+        if changed:
+            for listener in list(self._listeners):
+                try:
+                    listener(list(models))
+                except Exception as e:
+                    print(f"模型列表变化通知失败: {str(e)}")
+        return list(models)
+
+    def get_stats(self) -> dict:
+        """获取模型目录统计
+
+        Returns:
+            统计信息字典
+        """
+        with self._lock:
+            return {
+                'models': len(self._models) if self._models is not None else 0,
+                'version': self.version,
+                'age': round(time.monotonic() - self._fetched_at, 1) if self._models is not None else None,
+                'total_refreshes': self.total_refreshes,
+                'total_changes': self.total_changes,
+                'total_failures': self.total_failures
+            }
@@ -0,0 +1,174 @@
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from utils.backend_pool import normalize_model_name
+
+class ModelResidencyManager:
+    """Ollama模型驻留管理：预加载、keep_alive保温、跟踪已加载模型、内存紧张时卸载冷模型
+
+    当前模型和最近使用过的模型视为热模型，请求时使用较长的keep_alive让其常驻；
+    其余模型使用较短的keep_alive，由Ollama到期自动卸载。
+    模型名按 normalize_model_name 规范化后比较（llama2 与 /api/ps 返回的 llama2:latest 视为同一模型）。
+    """
+
+    def __init__(self, http, base_url: Callable[[], str], keep_alive: str = "5m",
+                 pin_keep_alive: str = "60m", hot_window: float = 600):
+        """
+        初始化模型驻留管理器
+
+        Args:
+            http: HTTP客户端（PooledHttpClient）
+            base_url: 返回Ollama地址的函数（地址可在运行时修改）
+            keep_alive: 普通模型的keep_alive
+            pin_keep_alive: 热模型的keep_alive
+            hot_window: 最近多少秒内使用过的模型视为热模型
+        """
+        self.http = http
+        self.base_url = base_url
+        self.keep_alive = keep_alive
+        self.pin_keep_alive = pin_keep_alive
+        self.hot_window = hot_window
+        self.primary_model: Optional[str] = None
+        self._last_used: Dict[str, float] = {}
+        self._resident: List[dict] = []
+        self._lock = threading.Lock()
+        # 统计
+        self.total_preloads = 0
+        self.total_unloads = 0
+
+    def configure(self, keep_alive: str, pin_keep_alive: str, hot_window: float = 600):
+        """更新keep_alive配置"""
+        self.keep_alive = keep_alive
+        self.pin_keep_alive = pin_keep_alive
+        self.hot_window = hot_window
+
+    def set_primary(self, model: Optional[str]):
+        """设置当前主模型（始终视为热模型）"""
+        self.primary_model = model
+
+    def touch(self, model: str):
+        """记录模型被使用"""
+        with self._lock:
+            self._last_used[normalize_model_name(model)] = time.time()
+
+    def is_hot(self, model: str) -> bool:
+        """是否为热模型（主模型或最近使用过）"""
+        name = normalize_model_name(model)
+        if self.primary_model and name == normalize_model_name(self.primary_model):
+            return True
+        with self._lock:
+            last_used = self._last_used.get(name)
+        return last_used is not None and time.time() - last_used < self.hot_window
+
+    def keep_alive_for(self, model: str) -> str:
+        """获取请求该模型时应使用的keep_alive，并记录一次使用
+
+        只有主模型和在热度窗口内被再次使用的模型才会常驻，偶尔使用一次的模型按普通keep_alive到期卸载。
+        """
+        hot = self.is_hot(model)
+        self.touch(model)
+        return self.pin_keep_alive if hot else self.keep_alive
+
+    def preload(self, model: str) -> bool:
+        """预加载模型（空提示词请求只加载模型，不生成内容）
+
+        Returns:
+            是否加载成功
+        """
+        if not model:
+            return False
+        try:
+            response = self.http.post(
+                f"{self.base_url()}/api/generate",
+                json={"model": model, "keep_alive": self.keep_alive_for(model)},
+                timeout=300
+            )
+            if response.status_code == 200:
+                self.total_preloads += 1
+                print(f"模型已预加载: {model}")
+                return True
+            print(f"预加载模型失败: {model} ({response.status_code})")
+        except Exception as e:
+            print(f"预加载模型失败: {model} ({str(e)})")
+        return False
+
+    def preload_async(self, model: str):
+        """在后台线程中预加载模型"""
+        if model:
+            threading.Thread(target=self.preload, args=(model,), daemon=True).start()
+
+    def refresh_resident(self) -> List[dict]:
+        """通过 /api/ps 刷新当前已加载的模型列表
+
+        Returns:
+            已加载模型列表（name、size、size_vram、expires_at）
+        """
+        try:
+            response = self.http.get(f"{self.base_url()}/api/ps", timeout=5)
+            if response.status_code == 200:
+                models = response.json().get("models", [])
+                with self._lock:
+                    self._resident = models
+        except Exception as e:
+            print(f"获取已加载模型失败: {str(e)}")
+        with self._lock:
+            return list(self._resident)
+
+    def unload(self, model: str) -> bool:
+        """卸载模型（keep_alive为0时Ollama会立即释放显存）
+
+        Returns:
+            是否卸载成功
+        """
+        try:
+            response = self.http.post(
+                f"{self.base_url()}/api/generate",
+                json={"model": model, "keep_alive": 0},
+                timeout=30
+            )
+            if response.status_code == 200:
+                self.total_unloads += 1
+                print(f"已卸载模型: {model}")
+                return True
+        except Exception as e:
+            print(f"卸载模型失败: {model} ({str(e)})")
+        return False
+
+    def unload_cold(self) -> List[str]:
+        """卸载所有冷模型（按最近使用时间从旧到新）
+
+        Returns:
+            已卸载的模型名列表
+        """
+        resident = self.refresh_resident()
+        with self._lock:
+            last_used = dict(self._last_used)
+        cold = [model.get("name") for model in resident if model.get("name") and not self.is_hot(model["name"])]
+        cold.sort(key=lambda name: last_used.get(normalize_model_name(name), 0))
+        unloaded = [name for name in cold if self.unload(name)]
+        if unloaded:
+            self.refresh_resident()
+        return unloaded
+
+    def get_stats(self) -> dict:
+        """获取模型驻留统计
+
+        Returns:
+            统计信息字典
+        """
+        with self._lock:
+            resident = [
+                {
+                    "name": model.get("name"),
+                    "size_vram": model.get("size_vram", 0),
+                    "expires_at": model.get("expires_at")
+                }
+                for model in self._resident
+            ]
+        return {
+            'primary_model': self.primary_model,
+            'resident': resident,
+            'total_preloads': self.total_preloads,
+            'total_unloads': self.total_unloads
+        }
@@ -0,0 +1,146 @@
+import math
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+class TokenBucket:
+    """令牌桶：以固定速率补充令牌，容量决定允许的突发请求数"""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated_at')
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        初始化令牌桶
+
+        Args:
+            rate: 每秒补充的令牌数
+            capacity: 令牌桶容量
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def refill(self, now: float):
+        """按经过的时间补充令牌"""
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated_at = now
+
+    def wait_time(self) -> float:
+        """距离下一个令牌可用还需等待的秒数"""
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """线程安全的速率限制器，同时支持按API Key、按IP和全局三级配额
+
+    每一级都是令牌桶，不存在固定窗口在边界处放行两倍请求的问题。
+    一次请求需要三级都有令牌才会放行，且只有放行时才扣减令牌。
+    """
+
+    def __init__(self, per_key: int = 100, per_ip: int = 200, global_limit: int = 1000,
+                 window: int = 60, burst: Optional[int] = None):
+        """
+        初始化速率限制器
+
+        Args:
+            per_key: 每个API Key在窗口内允许的请求数（0表示不限制）
+            per_ip: 每个IP在窗口内允许的请求数（0表示不限制）
+            global_limit: 全局在窗口内允许的请求数（0表示不限制）
+            window: 配额窗口（秒）
+            burst: 每个API Key/IP允许的最大突发请求数，默认为配额的1/5
+        """
+        self._lock = threading.Lock()
+        self._key_buckets: Dict[str, TokenBucket] = {}
+        self._ip_buckets: Dict[str, TokenBucket] = {}
+        self._global_bucket = None
+        self._calls_since_cleanup = 0
+        self.configure(per_key, per_ip, global_limit, window, burst)
+
+    def configure(self, per_key: int, per_ip: int, global_limit: int,
+                  window: int = 60, burst: Optional[int] = None):
+        """更新配额配置（已有的令牌桶会被重置）"""
+        with self._lock:
+            self.per_key = per_key
+            self.per_ip = per_ip
+            self.global_limit = global_limit
+            self.window = window
+            self.burst = burst
+            self._key_buckets.clear()
+            self._ip_buckets.clear()
+            self._global_bucket = self._new_bucket(global_limit, global_limit)
+
+    def _new_bucket(self, limit: int, capacity: Optional[int] = None) -> Optional[TokenBucket]:
+        """按窗口配额创建令牌桶"""
+        if limit <= 0:
+            return None
+        if capacity is None:
+            capacity = self.burst or max(1, limit // 5)
+        return TokenBucket(limit / self.window, min(capacity, limit))
+
+    def check(self, api_key: Optional[str] = None, client_ip: Optional[str] = None) -> Tuple[bool, int]:
+        """检查并扣减配额
+
+        Args:
+            api_key: 调用方API Key（为空时跳过按Key限制）
+            client_ip: 调用方IP（为空时跳过按IP限制）
+
+        Returns:
+            (是否放行, 建议的Retry-After秒数)
+        """
+        now = time.monotonic()
+        with self._lock:
+            buckets = []
+            if api_key and self.per_key > 0:
+                bucket = self._key_buckets.get(api_key)
+                if bucket is None:
+                    bucket = self._key_buckets[api_key] = self._new_bucket(self.per_key)
+                buckets.append(bucket)
+            if client_ip and self.per_ip > 0:
+                bucket = self._ip_buckets.get(client_ip)
+                if bucket is None:
+                    bucket = self._ip_buckets[client_ip] = self._new_bucket(self.per_ip)
+                buckets.append(bucket)
+            if self._global_bucket is not None:
+                buckets.append(self._global_bucket)
+
+            wait = 0.0
+            for bucket in buckets:
+                bucket.refill(now)
+                wait = max(wait, bucket.wait_time())
+
+            if wait <= 0:
+                for bucket in buckets:
+                    bucket.tokens -= 1
+
+            # 被拒绝的请求也计数：受到攻击时大量新Key/IP被拒绝，同样需要清理为其创建的令牌桶
+            self._calls_since_cleanup += 1
+            if self._calls_since_cleanup >= 1000:
+                self._cleanup(now)
+
+            if wait > 0:
+                return False, max(1, math.ceil(wait))
+            return True, 0
+
+    def _cleanup(self, now: float):
+        """移除已补满的空闲令牌桶，避免大量不同Key/IP导致内存增长"""
+        self._calls_since_cleanup = 0
+        for buckets in (self._key_buckets, self._ip_buckets):
+            idle = []
+            for name, bucket in buckets.items():
+                bucket.refill(now)
+                if bucket.tokens >= bucket.capacity:
+                    idle.append(name)
+            for name in idle:
+                del buckets[name]
+
+    def reset(self):
+        """清空所有令牌桶"""
+        with self._lock:
+            self._key_buckets.clear()
+            self._ip_buckets.clear()
+            self._global_bucket = self._new_bucket(self.global_limit, self.global_limit)
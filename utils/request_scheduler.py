@@ -0,0 +1,183 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+# 优先级（数值越小越优先）
+PRIORITY_GUI = 0  # 本地控制台对话
+PRIORITY_API = 1  # API Key远程调用
+PRIORITY_BACKGROUND = 2  # 后台任务
+
+
+class SchedulerQueueFull(Exception):
+    """等待队列已满"""
+
+
+class SchedulerTimeout(Exception):
+    """排队等待超时"""
+
+
+class _Waiter:
+    """排队中的请求"""
+
+    __slots__ = ('key', 'priority', 'event', 'granted', 'enqueued_at')
+
+    def __init__(self, key: str, priority: int):
+        self.key = key
+        self.priority = priority
+        self.event = threading.Event()
+        self.granted = False
+        self.enqueued_at = time.monotonic()
+
+
+class FairRequestScheduler:
+    """Ollama请求准入调度器：有界等待队列、按优先级分级、同级按调用方轮询
+
+    并发槽位用完时请求进入队列等待而不是直接拒绝；槽位释放时先服务高优先级，
+    同一优先级内在不同调用方（API Key）之间轮流分配，避免突发调用方占满所有槽位。
+    """
+
+    def __init__(self, capacity: int = 5, max_queue: int = 50, max_wait: float = 30):
+        """
+        初始化调度器
+
+        Args:
+            capacity: 同时发往Ollama的最大请求数
+            max_queue: 最多排队的请求数，超出时直接拒绝
+            max_wait: 默认最长排队时间（秒）
+        """
+        self.capacity = capacity
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waiting = 0
+        # {priority: OrderedDict{key: deque[_Waiter]}}，OrderedDict的顺序即轮询顺序
+        self._queues: Dict[int, OrderedDict] = {}
+        # 统计
+        self.total_admitted = 0
+        self.total_rejected = 0
+        self.total_timeouts = 0
+
+    def acquire(self, key: Optional[str] = None, priority: int = PRIORITY_API,
+                timeout: Optional[float] = None):
+        """申请一个并发槽位，必要时排队等待
+
+        Args:
+            key: 调用方标识（API Key），用于同级轮询
+            priority: 优先级
+            timeout: 最长排队时间（秒），默认使用max_wait
+
+        Raises:
+            SchedulerQueueFull: 等待队列已满
+            SchedulerTimeout: 排队超时
+        """
+        key = key or ''
+        with self._lock:
+            if self._active < self.capacity and self._waiting == 0:
+                self._active += 1
+                self.total_admitted += 1
+                return
+
+            if self._waiting >= self.max_queue:
+                self.total_rejected += 1
+                raise SchedulerQueueFull("Request queue is full")
+
+            waiter = _Waiter(key, priority)
+            queue = self._queues.setdefault(priority, OrderedDict())
+            queue.setdefault(key, deque()).append(waiter)
+            self._waiting += 1
+
+        if waiter.event.wait(self.max_wait if timeout is None else timeout):
+            return
+
+        with self._lock:
+            # 超时与分配同时发生时以分配为准
+            if waiter.granted:
+                return
+            self._remove_waiter(waiter)
+            self.total_timeouts += 1
+        raise SchedulerTimeout("Request queue wait timeout")
+
+    def release(self):
+        """释放槽位，并分配给下一个等待中的请求"""
+        with self._lock:
+            self._active -= 1
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, key: Optional[str] = None, priority: int = PRIORITY_API,
+             timeout: Optional[float] = None):
+        """以上下文管理器方式占用槽位"""
+        self.acquire(key, priority, timeout)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def resize(self, capacity: int):
+        """调整并发槽位数（扩容时立即分配给等待中的请求）"""
+        with self._lock:
+            self.capacity = capacity
+            self._dispatch()
+
+    def _dispatch(self):
+        """在锁内调用：把空闲槽位分配给等待中的请求"""
+        while self._active < self.capacity and self._waiting > 0:
+            waiter = self._next_waiter()
+            if waiter is None:
+                break
+            waiter.granted = True
+            self._active += 1
+            self._waiting -= 1
+            self.total_admitted += 1
+            waiter.event.set()
+
+    def _next_waiter(self) -> Optional[_Waiter]:
+        """按优先级取出下一个请求，同级按调用方轮询"""
+        for priority in sorted(self._queues):
+            queue = self._queues[priority]
+            if not queue:
+                continue
+            key, waiters = next(iter(queue.items()))
+            waiter = waiters.popleft()
+            # 该调用方移到队尾，下次轮到其他调用方
+            del queue[key]
+            if waiters:
+                queue[key] = waiters
+            return waiter
+        return None
+
+    def _remove_waiter(self, waiter: _Waiter):
+        """在锁内调用：移除超时的等待请求"""
+        queue = self._queues.get(waiter.priority)
+        if queue is None:
+            return
+        waiters = queue.get(waiter.key)
+        if waiters is None:
+            return
+        try:
+            waiters.remove(waiter)
+            self._waiting -= 1
+        except ValueError:
+            return
+        if not waiters:
+            del queue[waiter.key]
+
+    def get_stats(self) -> dict:
+        """获取调度统计
+
+        Returns:
+            统计信息字典
+        """
+        with self._lock:
+            return {
+                'capacity': self.capacity,
+                'active': self._active,
+                'waiting': self._waiting,
+                'max_queue': self.max_queue,
+                'total_admitted': self.total_admitted,
+                'total_rejected': self.total_rejected,
+                'total_timeouts': self.total_timeouts
+            }
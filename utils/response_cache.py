@@ -0,0 +1,117 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+class ResponseCache:
+    """AI回复缓存：LRU + TTL淘汰，并限制缓存总字节数
+
+    以模型、规范化后的消息和生成参数为键，相同请求直接返回缓存的回复，
+    不再发送给Ollama。只适用于确定性或幂等的请求，由调用方决定是否启用。
+    """
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 16 * 1024 * 1024, ttl: float = 300):
+        """
+        初始化回复缓存
+
+        Args:
+            max_entries: 最多缓存的条数
+            max_bytes: 缓存回复的总字节数上限
+            ttl: 缓存有效期（秒）
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # {key: (过期时间, 回复, 字节数)}，顺序即LRU顺序
+        self._entries: OrderedDict = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # 统计
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def configure(self, max_entries: int, max_bytes: int, ttl: float):
+        """更新缓存配置（超出新上限的条目立即淘汰）"""
+        with self._lock:
+            self.max_entries = max_entries
+            self.max_bytes = max_bytes
+            self.ttl = ttl
+            self._evict()
+
+    @staticmethod
+    def make_key(model: str, messages: List[dict], options: Optional[dict] = None) -> str:
+        """根据模型、消息和生成参数计算缓存键
+
+        消息只保留角色和去掉首尾空白的内容，避免无关字段或空白差异导致缓存未命中。
+        """
+        normalized = [
+            [message.get("role", ""), (message.get("content") or "").strip()]
+            for message in messages
+        ]
+        payload = json.dumps([model, normalized, options or {}], ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """查找缓存的回复（过期条目会被移除）"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= now:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, response: str):
+        """缓存回复"""
+        size = len(response.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, response, size)
+            self._bytes += size
+            self._evict()
+
+    def _remove(self, key: str):
+        """在锁内调用：移除条目"""
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def _evict(self):
+        """在锁内调用：按LRU顺序淘汰，直到满足条数和字节数上限"""
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            key = next(iter(self._entries))
+            self._remove(key)
+            self.evictions += 1
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_stats(self) -> dict:
+        """获取缓存统计
+
+        Returns:
+            统计信息字典
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions
+            }
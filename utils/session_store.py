@@ -0,0 +1,158 @@
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+class ChatSession:
+    """单个API Key的对话会话
+
+    对话历史保存为不可变元组，提交时在会话锁内整体替换：
+    读取方直接拿到一致的快照而无需加锁，同一会话的并发请求也不会交错写入。
+    超出保留条数的旧消息不会直接丢弃，而是暂存起来等待合并进对话摘要。
+    """
+
+    __slots__ = ('key', 'lock', 'max_messages', '_history', 'last_active', 'summary', '_evicted')
+
+    def __init__(self, key: str, max_messages: int):
+        """
+        初始化会话
+
+        Args:
+            key: 会话标识（API Key）
+            max_messages: 最多保留的历史消息数
+        """
+        self.key = key
+        self.lock = threading.Lock()
+        self.max_messages = max_messages
+        self._history: Tuple[dict, ...] = ()
+        self.last_active = time.time()
+        # 已移出历史的旧对话的滚动摘要
+        self.summary: Optional[str] = None
+        # 已移出历史、尚未合并进摘要的消息
+        self._evicted: List[dict] = []
+
+    @property
+    def history(self) -> Tuple[dict, ...]:
+        """当前对话历史快照（无锁读取）"""
+        return self._history
+
+    def commit_turn(self, user_message: dict, assistant_message: dict) -> bool:
+        """原子地提交一轮对话（用户消息 + AI回复）
+
+        Returns:
+            是否有等待合并进摘要的旧消息
+        """
+        with self.lock:
+            history = self._history + (user_message, assistant_message)
+            if len(history) > self.max_messages:
+                self._evicted.extend(history[:-self.max_messages])
+                history = history[-self.max_messages:]
+            self._history = history
+            self.last_active = time.time()
+            return bool(self._evicted)
+
+    def take_evicted(self) -> Tuple[Optional[str], List[dict]]:
+        """取出等待合并的旧消息
+
+        Returns:
+            (当前摘要, 旧消息列表)
+        """
+        with self.lock:
+            evicted, self._evicted = self._evicted, []
+            return self.summary, evicted
+
+    def apply_summary(self, summary: str):
+        """更新滚动摘要"""
+        with self.lock:
+            self.summary = summary
+
+    def restore_evicted(self, messages: List[dict]):
+        """摘要失败时放回旧消息，等待下次合并（最多保留max_messages条，避免无限增长）"""
+        with self.lock:
+            self._evicted[:0] = messages
+            if len(self._evicted) > self.max_messages:
+                del self._evicted[:-self.max_messages]
+
+    def clear(self):
+        """清空对话历史和摘要"""
+        with self.lock:
+            self._history = ()
+            self.summary = None
+            self._evicted = []
+
+    def __len__(self):
+        return len(self._history)
+
+
+class SessionStore:
+    """按API Key隔离的会话存储"""
+
+    def __init__(self, max_messages: int = 20):
+        """
+        初始化会话存储
+
+        Args:
+            max_messages: 每个会话最多保留的历史消息数
+        """
+        self.max_messages = max_messages
+        self._sessions: Dict[str, ChatSession] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> ChatSession:
+        """获取会话，不存在时创建"""
+        session = self._sessions.get(key)
+        if session is not None:
+            return session
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = ChatSession(key, self.max_messages)
+                self._sessions[key] = session
+            return session
+
+    def peek(self, key: str) -> Optional[ChatSession]:
+        """获取会话，不存在时返回None（不创建）"""
+        return self._sessions.get(key)
+
+    def snapshot(self, key: str) -> Tuple[dict, ...]:
+        """获取会话历史快照（会话不存在时返回空元组）"""
+        session = self._sessions.get(key)
+        return session.history if session is not None else ()
+
+    def remove(self, key: str) -> Optional[ChatSession]:
+        """移除会话"""
+        with self._lock:
+            return self._sessions.pop(key, None)
+
+    def remove_idle(self, max_idle: float) -> int:
+        """移除长时间未活跃的会话
+
+        Args:
+            max_idle: 最长空闲时间（秒）
+
+        Returns:
+            移除的会话数
+        """
+        cutoff = time.time() - max_idle
+        with self._lock:
+            idle = [key for key, session in self._sessions.items() if session.last_active < cutoff]
+            for key in idle:
+                del self._sessions[key]
+        return len(idle)
+
+    def resize(self, max_messages: int):
+        """调整每个会话保留的历史消息数（新提交的对话生效）"""
+        with self._lock:
+            self.max_messages = max_messages
+            for session in self._sessions.values():
+                session.max_messages = max_messages
+
+    def clear(self):
+        """清空所有会话"""
+        with self._lock:
+            self._sessions.clear()
+
+    def __contains__(self, key):
+        return key in self._sessions
+
+    def __len__(self):
+        return len(self._sessions)
@@ -0,0 +1,116 @@
+import threading
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+class FlightAborted(Exception):
+    """发起请求的调用方中途放弃（断开或取消），跟随者需要自行重试"""
+
+
+class Flight:
+    """一次正在进行的上游请求，其回复片段会广播给所有跟随者"""
+
+    __slots__ = ('chunks', 'done', 'error', 'cond', 'followers')
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.cond = threading.Condition()
+        self.followers = 0
+
+    def publish(self, chunk: str):
+        """发布一个回复片段"""
+        with self.cond:
+            self.chunks.append(chunk)
+            self.cond.notify_all()
+
+    def finish(self):
+        """回复已完整生成"""
+        with self.cond:
+            self.done = True
+            self.cond.notify_all()
+
+    def fail(self, error: BaseException):
+        """上游请求失败"""
+        with self.cond:
+            self.error = error
+            self.done = True
+            self.cond.notify_all()
+
+    def follow(self, is_cancelled: Optional[Callable[[], bool]] = None) -> Iterator[str]:
+        """从头开始读取回复片段，直到生成结束
+
+        Args:
+            is_cancelled: 返回True时停止跟随（由调用方自行判断是否被取消）
+
+        Raises:
+            FlightAborted: 发起请求的调用方中途放弃
+            RuntimeError: 上游请求失败
+        """
+        index = 0
+        while True:
+            with self.cond:
+                while index >= len(self.chunks) and not self.done:
+                    if is_cancelled is not None and is_cancelled():
+                        return
+                    self.cond.wait(0.5)
+                chunks = self.chunks[index:]
+                index += len(chunks)
+                finished = self.done and index >= len(self.chunks)
+                error = self.error
+
+            for chunk in chunks:
+                yield chunk
+
+            if finished:
+                if isinstance(error, FlightAborted):
+                    raise FlightAborted("Upstream request aborted")
+                if error is not None:
+                    raise RuntimeError(str(error))
+                return
+
+
+class SingleFlight:
+    """相同请求的合并：同一时刻只有一个请求发往上游，其余相同请求跟随其回复"""
+
+    def __init__(self):
+        self._flights: Dict[str, Flight] = {}
+        self._lock = threading.Lock()
+        # 统计
+        self.total_leaders = 0
+        self.total_followers = 0
+
+    def join(self, key: str) -> Tuple[Flight, bool]:
+        """加入相同请求
+
+        Returns:
+            (Flight, 是否为发起者)；发起者负责请求上游并发布结果
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.followers += 1
+                self.total_followers += 1
+                return flight, False
+            flight = Flight()
+            self._flights[key] = flight
+            self.total_leaders += 1
+            return flight, True
+
+    def leave(self, key: str, flight: Flight):
+        """发起者结束请求后移除（之后的相同请求会重新发往上游）"""
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    def get_stats(self) -> dict:
+        """获取合并统计
+
+        Returns:
+            统计信息字典
+        """
+        with self._lock:
+            return {
+                'inflight': len(self._flights),
+                'total_leaders': self.total_leaders,
+                'total_followers': self.total_followers
+            }
@@ -0,0 +1,139 @@
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+
+class ApiKeyStatsStore:
+    """API Key调用统计存储：内存中累计，后台线程批量写盘（write-behind）
+
+    请求线程只在内存中更新计数；后台线程按时间间隔或累计的未保存次数批量写盘，
+    写入时先写临时文件再原子替换，避免文件被写坏。
+    """
+
+    def __init__(self, path: str, flush_interval: float = 5, dirty_threshold: int = 100):
+        """
+        初始化统计存储
+
+        Args:
+            path: 统计文件路径
+            flush_interval: 后台写盘间隔（秒）
+            dirty_threshold: 未保存的更新次数达到该值时立即写盘
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self.dirty_threshold = dirty_threshold
+        self._stats: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._dirty = 0
+        self._wake = threading.Event()
+        self.writer_thread = None
+        self.running = False
+
+        self.load()
+
+    def load(self):
+        """从文件加载统计数据"""
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, "r", encoding="utf-8") as f:
+                    stats = json.load(f)
+                with self._lock:
+                    self._stats = stats
+                    self._dirty = 0
+        except Exception as e:
+            print(f"加载API Key统计数据失败: {e}")
+
+    def record(self, api_key: str):
+        """记录一次API调用
+
+        Args:
+            api_key: 调用方的API Key
+        """
+        now = datetime.now()
+        today = now.strftime("%Y-%m-%d")
+        with self._lock:
+            stats = self._stats.get(api_key)
+            if stats is None:
+                stats = {
+                    "total_calls": 0,
+                    "last_call": None,
+                    "calls_today": 0,
+                    "today": today
+                }
+                self._stats[api_key] = stats
+
+            stats["total_calls"] += 1
+            stats["last_call"] = now.isoformat()
+
+            # 更新今日调用次数
+            if stats["today"] != today:
+                stats["today"] = today
+                stats["calls_today"] = 1
+            else:
+                stats["calls_today"] += 1
+
+            self._dirty += 1
+            if self._dirty >= self.dirty_threshold:
+                self._wake.set()
+
+    def delete(self, api_key: str):
+        """删除指定API Key的统计数据"""
+        with self._lock:
+            if self._stats.pop(api_key, None) is not None:
+                self._dirty += 1
+
+    def get(self, api_key: str) -> Optional[dict]:
+        """获取指定API Key统计数据的副本"""
+        with self._lock:
+            stats = self._stats.get(api_key)
+            return dict(stats) if stats is not None else None
+
+    def snapshot(self) -> Dict[str, dict]:
+        """获取所有统计数据的副本（用于仪表盘和导出）"""
+        with self._lock:
+            return {key: dict(stats) for key, stats in self._stats.items()}
+
+    def flush(self):
+        """将统计数据写入文件（临时文件 + 原子替换）"""
+        with self._flush_lock:
+            with self._lock:
+                if self._dirty == 0 and os.path.exists(self.path):
+                    return
+                data = {key: dict(stats) for key, stats in self._stats.items()}
+                dirty = self._dirty
+                self._dirty = 0
+
+            tmp_path = f"{self.path}.tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+            except Exception as e:
+                # 写入失败，保留未保存标记以便下次重试
+                with self._lock:
+                    self._dirty += dirty
+                print(f"保存API Key统计数据失败: {e}")
+
+    def start(self):
+        """启动后台写盘线程"""
+        if self.running:
+            return
+        self.running = True
+        self.writer_thread = threading.Thread(target=self._writer_loop, daemon=True)
+        self.writer_thread.start()
+
+    def stop(self):
+        """停止后台写盘线程并写入剩余数据"""
+        self.running = False
+        self._wake.set()
+        self.flush()
+
+    def _writer_loop(self):
+        """按间隔或未保存次数批量写盘"""
+        while self.running:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            if self._dirty:
+                self.flush()
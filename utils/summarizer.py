@@ -0,0 +1,126 @@
+import queue
+import threading
+from typing import Callable, List, Optional
+
+# 生成摘要的系统提示词
+SUMMARY_SYSTEM_PROMPT = (
+    "你是对话摘要助手。请把已有摘要和新的对话内容合并成一段简洁的摘要，"
+    "保留用户的身份信息、偏好、已确定的结论和尚未解决的问题，不超过300字。只输出摘要本身。"
+)
+
+# 摘要注入对话时使用的前缀
+SUMMARY_CONTEXT_PREFIX = "以下是之前对话的摘要，请结合摘要继续对话：\n"
+
+
+def build_summary_messages(summary: Optional[str], messages: List[dict], max_message_chars: int = 2000) -> List[dict]:
+    """构建请求摘要模型的消息
+
+    Args:
+        summary: 已有摘要
+        messages: 需要合并进摘要的旧消息
+        max_message_chars: 每条旧消息最多保留的字符数
+
+    Returns:
+        发送给摘要模型的消息列表
+    """
+    lines = []
+    for message in messages:
+        speaker = "用户" if message.get("role") == "user" else "AI"
+        lines.append(f"{speaker}: {message.get('content', '')[:max_message_chars]}")
+    content = f"已有摘要：\n{summary or '无'}\n\n新的对话：\n" + "\n".join(lines)
+    return [
+        {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+        {"role": "user", "content": content}
+    ]
+
+
+def summary_context_message(summary: str) -> dict:
+    """把摘要包装成放在历史之前的系统消息"""
+    return {"role": "system", "content": SUMMARY_CONTEXT_PREFIX + summary}
+
+
+class ConversationSummarizer:
+    """后台滚动摘要：把移出历史的旧对话逐步合并进会话摘要
+
+    对话提交时只把会话放入队列，由单个后台线程依次生成摘要，
+    不会增加请求本身的延迟；同一会话同时只会有一个摘要任务。
+    """
+
+    def __init__(self, summarize_fn: Callable[[Optional[str], List[dict]], str], max_summary_chars: int = 1000):
+        """
+        初始化摘要器
+
+        Args:
+            summarize_fn: 摘要函数，接收(已有摘要, 旧消息列表)，返回新摘要
+            max_summary_chars: 摘要最多保留的字符数
+        """
+        self.summarize_fn = summarize_fn
+        self.max_summary_chars = max_summary_chars
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self.worker_thread = None
+        self.running = False
+        # 统计
+        self.total_runs = 0
+        self.total_failures = 0
+
+    def schedule(self, session):
+        """把有待合并旧消息的会话加入摘要队列（已在队列中时忽略）"""
+        with self._lock:
+            if session.key in self._pending:
+                return
+            self._pending.add(session.key)
+        self._queue.put(session)
+
+    def start(self):
+        """启动后台摘要线程"""
+        if self.running:
+            return
+        self.running = True
+        self.worker_thread = threading.Thread(target=self._worker_loop, daemon=True)
+        self.worker_thread.start()
+
+    def stop(self):
+        """停止后台摘要线程"""
+        self.running = False
+        self._queue.put(None)
+
+    def _worker_loop(self):
+        """依次处理队列中的会话"""
+        while self.running:
+            session = self._queue.get()
+            if session is None:
+                break
+            with self._lock:
+                self._pending.discard(session.key)
+            self.compact(session)
+
+    def compact(self, session):
+        """把会话中待合并的旧消息合并进摘要"""
+        summary, evicted = session.take_evicted()
+        if not evicted:
+            return
+        try:
+            new_summary = self.summarize_fn(summary, evicted).strip()
+            if not new_summary:
+                raise ValueError("摘要为空")
+            session.apply_summary(new_summary[:self.max_summary_chars])
+            self.total_runs += 1
+        except Exception as e:
+            # 失败时放回旧消息，下次提交对话时重试
+            session.restore_evicted(evicted)
+            self.total_failures += 1
+            print(f"生成对话摘要失败: {str(e)}")
+
+    def get_stats(self) -> dict:
+        """获取摘要统计
+
+        Returns:
+            统计信息字典
+        """
+        return {
+            'pending': self._queue.qsize(),
+            'total_runs': self.total_runs,
+            'total_failures': self.total_failures
+        }
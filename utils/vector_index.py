@@ -0,0 +1,115 @@
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+class VectorIndex:
+    """单个用户记忆的向量矩阵，暴力计算余弦相似度取前k个
+
+    向量归一化后按行存放在连续的float32矩阵中（容量按倍数增长），
+    检索只需一次矩阵向量乘法加argpartition，1000条768维向量在1毫秒内完成。
+    """
+
+    __slots__ = ('dim', '_matrix', '_ids', '_positions')
+
+    def __init__(self, dim: Optional[int] = None, capacity: int = 64):
+        """
+        初始化向量矩阵
+
+        Args:
+            dim: 向量维度（为None时由第一条向量决定）
+            capacity: 初始容量（行数）
+        """
+        self.dim = dim
+        self._matrix = np.zeros((capacity, dim), dtype=np.float32) if dim else None
+        # 行号 -> 记忆ID，记忆ID -> 行号
+        self._ids: List[int] = []
+        self._positions: Dict[int, int] = {}
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, doc_id: int):
+        return doc_id in self._positions
+
+    @staticmethod
+    def normalize(vector) -> np.ndarray:
+        """转换为归一化的float32向量"""
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else vector
+
+    def add(self, doc_id: int, vector):
+        """添加或替换一条记忆的向量
+
+        Args:
+            doc_id: 记忆ID
+            vector: 向量（列表或numpy数组）
+        """
+        vector = self.normalize(vector)
+        if self._matrix is None or vector.shape[0] != self.dim:
+            # 维度变化（如更换了嵌入模型），丢弃旧向量
+            self.dim = vector.shape[0]
+            self._matrix = np.zeros((max(64, len(self._ids)), self.dim), dtype=np.float32)
+            self._ids = []
+            self._positions = {}
+
+        position = self._positions.get(doc_id)
+        if position is None:
+            position = len(self._ids)
+            if position >= self._matrix.shape[0]:
+                grown = np.zeros((self._matrix.shape[0] * 2, self.dim), dtype=np.float32)
+                grown[:position] = self._matrix[:position]
+                self._matrix = grown
+            self._ids.append(doc_id)
+            self._positions[doc_id] = position
+        self._matrix[position] = vector
+
+    def remove(self, doc_id: int):
+        """移除一条记忆的向量（用最后一行填补空位）"""
+        position = self._positions.pop(doc_id, None)
+        if position is None:
+            return
+        last = len(self._ids) - 1
+        if position != last:
+            last_id = self._ids[last]
+            self._matrix[position] = self._matrix[last]
+            self._ids[position] = last_id
+            self._positions[last_id] = position
+        self._ids.pop()
+
+    def search(self, vector, limit: int) -> List[Tuple[int, float]]:
+        """按余弦相似度检索
+
+        Args:
+            vector: 查询向量
+            limit: 返回数量
+
+        Returns:
+            按相似度从高到低排列的 (记忆ID, 相似度) 列表
+        """
+        size = len(self._ids)
+        if not size or limit <= 0:
+            return []
+        query = self.normalize(vector)
+        if query.shape[0] != self.dim:
+            return []
+
+        scores = self._matrix[:size] @ query
+        if size > limit:
+            top = np.argpartition(scores, size - limit)[size - limit:]
+        else:
+            top = np.arange(size)
+        top = top[np.argsort(scores[top])[::-1]]
+        return [(self._ids[position], float(scores[position])) for position in top]
+
+    def get_stats(self) -> dict:
+        """获取向量矩阵统计
+
+        Returns:
+            统计信息字典
+        """
+        return {
+            'vectors': len(self._ids),
+            'dim': self.dim,
+            'bytes': self._matrix.nbytes if self._matrix is not None else 0
+        }
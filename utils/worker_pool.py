@@ -0,0 +1,145 @@
+import socket
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Tuple
+
+class RequestCancelled(Exception):
+    """请求已被取消（超时或调用方断开）"""
+
+
+class CancelToken:
+    """请求取消令牌：取消时中断正在读取的Ollama响应"""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._response = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def bind(self, response):
+        """关联正在读取的上游响应；令牌已取消时立即中断"""
+        with self._lock:
+            self._response = response
+            if self._event.is_set():
+                self._abort(response)
+
+    def unbind(self):
+        """上游响应读取结束后解除关联"""
+        with self._lock:
+            self._response = None
+
+    def cancel(self):
+        """取消请求，并中断已关联的上游响应"""
+        with self._lock:
+            self._event.set()
+            if self._response is not None:
+                self._abort(self._response)
+
+    def raise_if_cancelled(self):
+        """已取消时抛出RequestCancelled"""
+        if self._event.is_set():
+            raise RequestCancelled("Request cancelled")
+
+    @staticmethod
+    def _abort(response):
+        """关闭底层socket，使阻塞在读取上的线程立即返回
+
+        只调用response.close()无法唤醒另一个线程中阻塞的recv，需要shutdown底层连接；
+        连接随后由读取线程关闭并从连接池中丢弃。
+        """
+        connection = getattr(getattr(response, 'raw', None), '_connection', None)
+        sock = getattr(connection, 'sock', None)
+        if sock is None:
+            return
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+class WorkerPool:
+    """常驻工作线程池，每个任务附带取消令牌
+
+    取代“每个请求新建线程 + 队列”的做法：线程复用，超时或调用方断开时
+    通过取消令牌中断上游调用，而不是丢下仍在占用Ollama的线程。
+    """
+
+    def __init__(self, workers: int = 5, thread_name_prefix: str = "ollama-worker"):
+        """
+        初始化工作线程池
+
+        Args:
+            workers: 工作线程数
+            thread_name_prefix: 线程名前缀
+        """
+        self.workers = workers
+        self.thread_name_prefix = thread_name_prefix
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=thread_name_prefix)
+        self._active = 0
+        self._pending = 0
+        # 统计
+        self.total_completed = 0
+        self.total_cancelled = 0
+
+    def submit(self, fn, *args, **kwargs) -> Tuple[Future, CancelToken]:
+        """提交任务，任务函数通过关键字参数cancel_token接收取消令牌
+
+        Returns:
+            (Future, CancelToken)
+        """
+        token = CancelToken()
+        with self._lock:
+            future = self._executor.submit(self._run, token, fn, args, kwargs)
+            self._pending += 1
+        return future, token
+
+    def _run(self, token: CancelToken, fn, args, kwargs):
+        """在工作线程中执行任务并记录统计"""
+        with self._lock:
+            self._pending -= 1
+            self._active += 1
+        try:
+            token.raise_if_cancelled()
+            return fn(*args, cancel_token=token, **kwargs)
+        except RequestCancelled:
+            with self._lock:
+                self.total_cancelled += 1
+            raise
+        finally:
+            with self._lock:
+                self._active -= 1
+                self.total_completed += 1
+
+    def resize(self, workers: int):
+        """调整线程数（新任务使用新线程池，旧线程池中的任务继续执行完毕）"""
+        with self._lock:
+            if workers == self.workers:
+                return
+            old_executor = self._executor
+            self.workers = workers
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=self.thread_name_prefix)
+        old_executor.shutdown(wait=False)
+
+    def shutdown(self):
+        """关闭线程池，丢弃尚未开始的任务"""
+        with self._lock:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def get_stats(self) -> dict:
+        """获取线程池统计
+
+        Returns:
+            统计信息字典
+        """
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'active': self._active,
+                'pending': self._pending,
+                'total_completed': self.total_completed,
+                'total_cancelled': self.total_cancelled
+            }